@@ -118,3 +118,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # To customize the User, instead of default Django User should use the one defined in `core` app
 AUTH_USER_MODEL = 'core.User'
+
+# Profits calculation
+# Replays operations with integer fixed-point arithmetic (`FixedPointProfitCalculator`) instead of `Decimal`
+PROFITS_FIXED_POINT_ARITHMETIC = False
+# Tickers with at least this number of operations are matched with the vectorized FIFO matcher (`None` to disable)
+PROFITS_VECTORIZED_THRESHOLD = 5000
+# Number of processes to calculate the tickers of a total details report in parallel (`None` to calculate them serially)
+PROFITS_PARALLEL_WORKERS = None
+# Number of tickers of a total details report whose operations are loaded per query by a background thread while the previous ones 
+# are calculated (`None` to load them all at once before calculating)
+PROFITS_PIPELINE_CHUNK_SIZE = None
+# Number of chunks loaded ahead of the one being calculated
+PROFITS_PIPELINE_PREFETCH_CHUNKS = 2
+# Persists the lots open of each ticker at yearly boundaries to resume the FIFO replay from them (`LotCheckpointService`)
+PROFITS_LOT_CHECKPOINTS = False
+# (month, day) of the checkpoints: start of 6 April, after each UK tax year end
+PROFITS_LOT_CHECKPOINT_BOUNDARY = (4, 6)
+# Reads the reports from the persisted realized gains, calculated again only for the tickers with operations changed (`RealizedGainProfitService`)
+PROFITS_REALIZED_GAINS = False
+# (month, day) on which the periods of the period totals report start: 6 April, start of the UK tax year
+PROFITS_REPORT_YEAR_START = (4, 6)
+# Loads only the lots open at the start of the period, calculated with window functions, instead of the operations before it
+PROFITS_LOAD_OPEN_LOTS_ONLY = False
+# Merges BUYs of the same day, price and currency into a single lot before matching them (not used with fixed-point arithmetic)
+PROFITS_COALESCE_LOTS = False
+# With the lots coalesced, keeps a profit details row per BUY operation merging the lots only for the totals
+PROFITS_COALESCE_LOTS_PRESERVE_DETAILS = False
+# Adjusts the quantities and prices of the operations to the units after the last split of their ticker (`SplitIndex`)
+PROFITS_SPLIT_ADJUSTMENT = True
+# Seconds the lots open after all the operations of a ticker are kept in the cache for the simulations (`None` for no expiry)
+PROFITS_OPEN_LOTS_CACHE_TIMEOUT = 24 * 60 * 60
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProfitsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profits'
+
+    def ready(self):
+        # Registers the signal receivers
+        from profits import signals
+        signals.connect_operation_receivers()
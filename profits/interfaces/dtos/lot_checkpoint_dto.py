@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+
+@dataclass(slots=True)
+class LotCheckpointDTO:
+    # Lots open after all the operations previous to this date
+    date: datetime
+    open_lots: list[OpenLotDTO]
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+
+@dataclass(slots=True)
+class OpenLotDTO:
+    buy: OperationDTO
+    # Quantity of the BUY not yet matched with a SELL
+    quantity: Decimal
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from decimal import Decimal
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class OperationDTO:
     type: str
     date: datetime
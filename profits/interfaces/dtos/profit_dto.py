@@ -3,7 +3,7 @@ from decimal import Decimal
 from datetime import datetime
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class ProfitDTO:
     buy_date: datetime
     buy_amount_total: Decimal
@@ -14,7 +14,7 @@ class ProfitDTO:
     sell_currency: str
     profit: Optional[Decimal]
 
-@dataclass
+@dataclass(slots=True)
 class ProfitExchangeDTO(ProfitDTO):
     currency_exchange: str
     buy_exchange: Decimal
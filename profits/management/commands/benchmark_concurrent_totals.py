@@ -0,0 +1,51 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures throughput and latency of a report endpoint under concurrent requests, for each of the given URLs. "
+        "Run against the same report served by WSGI (e.g. gunicorn, `/total/`) and by ASGI (`make run-asgi`, `/total-async/`) to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs of the reports to request, e.g. http://127.0.0.1:8001/profits/account/1/total-async/')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of requests in flight at the same time.')
+        parser.add_argument('--requests', type=int, default=500, help='Number of requests sent to each URL.')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for each response.')
+
+    @staticmethod
+    def _request(url: str, timeout: float) -> tuple[float, bool]:
+        """
+        Returns the seconds the response took, read to the end, and if it was successful.
+        """
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                response.read()
+                succeeded = response.status == 200
+        except (urllib.error.URLError, TimeoutError):
+            succeeded = False
+
+        return time.perf_counter() - started, succeeded
+
+    def handle(self, *args, **options):
+        for url in options['urls']:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                started = time.perf_counter()
+                results = list(executor.map(lambda _: self._request(url, options['timeout']), range(options['requests'])))
+                seconds = time.perf_counter() - started
+
+            latencies = sorted(latency for latency, _ in results)
+            errors = sum(1 for _, succeeded in results if not succeeded)
+            self.stdout.write(url)
+            self.stdout.write(f'  Requests: {len(results)} ({errors} errors) with concurrency {options["concurrency"]}')
+            self.stdout.write(f'  Throughput: {len(results) / seconds:.1f} requests/s')
+            self.stdout.write(
+                f'  Latency: p50 {statistics.median(latencies) * 1000:.0f} ms, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms')
@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+
+
+class WeekdayRatesCurrencyRepository:
+    """
+    Exchange rates for the weekdays of the benchmark years without database, so only the calculation is measured.
+    """
+    def get_currency_exchanges(self, origin_currency_code, target_currency_code, date_start, date_end) -> dict:
+        dates = (date(2020, 1, 1) + timedelta(days=day) for day in range(366 * 50))
+        return {date_exchange: Decimal('0.781234') for date_exchange in dates if date_exchange.weekday() < 5}
+
+
+class Command(BaseCommand):
+    help = "Measures time and memory allocated per match calculating the profits of a ticker with the given number of matches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=100_000, help='Number of SELL/BUY matches of the ticker.')
+        parser.add_argument('--repeat', type=int, default=3, help='Times the calculation is repeated, reporting the fastest.')
+
+    @staticmethod
+    def _create_operations(matches: int) -> list[OperationDTO]:
+        """
+        Each BUY is sold by two SELLs, so there are as many matches as SELLs.
+        """
+        date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        operations = []
+        for index in range(matches // 2):
+            date += timedelta(hours=1)
+            operations.append(OperationDTO(type='BUY', date=date, quantity=Decimal(2), currency='USD', price_avg=Decimal('10.5') + index % 7))
+            for _ in range(2):
+                date += timedelta(hours=1)
+                operations.append(OperationDTO(type='SELL', date=date, quantity=Decimal(1), currency='GBP', price_avg=Decimal('12.25')))
+        return operations
+
+    def handle(self, *args, **options):
+        operations = self._create_operations(options['matches'])
+        currency_service = CurrencyService(WeekdayRatesCurrencyRepository(), None, None)   # type: ignore
+        profit_calculator = ProfitCalculator(ProfitExchanger(currency_service))
+
+        seconds = min(self._time(profit_calculator, operations) for _ in range(options['repeat']))
+
+        tracemalloc.start()
+        profits = profit_calculator.calculate_ticker_profits(operations)
+        memory_current, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        matches = len(profits)
+        self.stdout.write(f'Matches: {matches}')
+        self.stdout.write(f'Time: {seconds:.3f} s ({seconds / matches * 1e6:.2f} us per match)')
+        self.stdout.write(f'Memory retained: {memory_current / 2**20:.1f} MiB ({memory_current / matches:.0f} bytes per match)')
+        self.stdout.write(f'Memory peak: {memory_peak / 2**20:.1f} MiB')
+
+    @staticmethod
+    def _time(profit_calculator: ProfitCalculator, operations: list[OperationDTO]) -> float:
+        time_start = time.perf_counter()
+        profit_calculator.calculate_ticker_profits(operations)
+        return time.perf_counter() - time_start
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date', models.DateTimeField()),
+                ('lots', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='profits.account')),
+            ],
+            options={
+                'unique_together': {('account', 'ticker', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profits', '0002_lotcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealizedGain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('sell_date', models.DateTimeField()),
+                ('sell_quantity', models.DecimalField(decimal_places=7, max_digits=15)),
+                ('sell_amount_total', models.DecimalField(decimal_places=7, max_digits=17)),
+                ('sell_currency', models.CharField(max_length=3)),
+                ('buy_date', models.DateTimeField()),
+                ('buy_amount_total', models.DecimalField(decimal_places=7, max_digits=17)),
+                ('buy_currency', models.CharField(max_length=3)),
+                ('profit', models.DecimalField(decimal_places=7, max_digits=17, null=True)),
+                ('currency_exchange', models.CharField(max_length=3)),
+                ('buy_exchange', models.DecimalField(decimal_places=12, max_digits=20)),
+                ('buy_amount_total_exchange', models.DecimalField(decimal_places=7, max_digits=17)),
+                ('sell_exchange', models.DecimalField(decimal_places=12, max_digits=20)),
+                ('sell_amount_total_exchange', models.DecimalField(decimal_places=7, max_digits=17)),
+                ('profit_exchange', models.DecimalField(decimal_places=7, max_digits=17)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='profits.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'sell_date'], name='profits_rea_account_4d0e06_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RealizedGainTicker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='profits.account')),
+            ],
+            options={
+                'unique_together': {('account', 'ticker')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profits', '0003_realizedgain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lotcheckpoint',
+            name='operations_stamp',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='realizedgainticker',
+            name='operations_stamp',
+            field=models.CharField(default='', max_length=64),
+        ),
+    ]
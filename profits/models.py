@@ -116,6 +116,8 @@ class Operation(models.Model):
     exchange = models.DecimalField(max_digits=10, decimal_places=6)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the operations stamp (see `OperationRepository.get_operations_stamps`), so saving an operation changes it
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('account', 'date', 'ticker')
@@ -130,3 +132,63 @@ class Operation(models.Model):
         )        
 
 
+class LotCheckpoint(models.Model):
+    """
+    BUY lots of a ticker still open in an account at a date, so profits after the date can be calculated 
+    without replaying the operations before it.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    ticker = models.CharField(max_length=10)
+    # Lots open after all the operations previous to this date
+    date = models.DateTimeField()
+    # List of open lots: BUY `date`, `quantity`, `currency` and `price_avg` with the `open` quantity not yet sold
+    lots = models.JSONField()
+    # Stamp of the operations previous to the date when the lots were calculated, the checkpoint is not used if it changed
+    operations_stamp = models.CharField(max_length=64, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('account', 'ticker', 'date')
+
+class RealizedGain(models.Model):
+    """
+    Match of a SELL with a BUY of a ticker by FIFO, with the amounts exchanged to the target currency,
+    so reports are a range scan of the sell date instead of replaying the operations.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    ticker = models.CharField(max_length=10)
+    sell_date = models.DateTimeField()
+    sell_quantity = models.DecimalField(max_digits=15, decimal_places=7)
+    sell_amount_total = models.DecimalField(max_digits=17, decimal_places=7)
+    sell_currency = models.CharField(max_length=3)
+    buy_date = models.DateTimeField()
+    buy_amount_total = models.DecimalField(max_digits=17, decimal_places=7)
+    buy_currency = models.CharField(max_length=3)
+    # Only when BUY and SELL are in the same currency
+    profit = models.DecimalField(max_digits=17, decimal_places=7, null=True)
+    currency_exchange = models.CharField(max_length=3)
+    # Inverse rates of the stored exchanges have more decimal places than `CurrencyExchange.rate`
+    buy_exchange = models.DecimalField(max_digits=20, decimal_places=12)
+    buy_amount_total_exchange = models.DecimalField(max_digits=17, decimal_places=7)
+    sell_exchange = models.DecimalField(max_digits=20, decimal_places=12)
+    sell_amount_total_exchange = models.DecimalField(max_digits=17, decimal_places=7)
+    profit_exchange = models.DecimalField(max_digits=17, decimal_places=7)
+
+    class Meta:
+        indexes = [models.Index(fields=['account', 'sell_date'])]
+
+class RealizedGainTicker(models.Model):
+    """
+    Tickers of an account whose `RealizedGain` rows are up to date with its operations.
+    Rows are deleted when the operations of the ticker change, so its gains are calculated again.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    ticker = models.CharField(max_length=10)
+    # Stamp of the operations of the ticker when the gains were calculated, the gains are stale if it changed
+    operations_stamp = models.CharField(max_length=64, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('account', 'ticker')
@@ -20,6 +20,33 @@ class CurrencyRepository:
                 "origin-target", where origin and target are the ISO codes of the
                 currencies, and the values are the exchange rates.
         """
+        exchange_dict = {}
+        for date, rate in CurrencyRepository._currency_exchanges(origin_currency_code, target_currency_code, date_start, date_end):
+            exchange_dict[date] = rate
+
+        return exchange_dict
+
+    @staticmethod
+    async def aget_currency_exchanges(
+            origin_currency_code: Optional[str], 
+            target_currency_code: Optional[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> dict:
+        """
+        Async version of `get_currency_exchanges`.
+        """
+        exchange_dict = {}
+        async for date, rate in CurrencyRepository._currency_exchanges(origin_currency_code, target_currency_code, date_start, date_end):
+            exchange_dict[date] = rate
+
+        return exchange_dict
+
+    @staticmethod
+    def _currency_exchanges(
+            origin_currency_code: Optional[str], 
+            target_currency_code: Optional[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]):
         exchanges= CurrencyExchange.objects
         if origin_currency_code:
             exchanges = exchanges.filter(origin__iso_code=origin_currency_code)
@@ -30,10 +57,4 @@ class CurrencyRepository:
         if date_end:
             exchanges = exchanges.filter(date__lte=date_end)
 
-        exchanges = exchanges.order_by('date')
-
-        exchange_dict = {}
-        for exchange in exchanges:
-            exchange_dict[exchange.date] = exchange.rate
-
-        return exchange_dict
\ No newline at end of file
+        return exchanges.order_by('date').values_list('date', 'rate')
\ No newline at end of file
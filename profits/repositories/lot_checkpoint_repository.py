@@ -0,0 +1,109 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Optional
+
+from django.db import transaction
+
+from profits.interfaces.dtos.lot_checkpoint_dto import LotCheckpointDTO
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.models import Account, LotCheckpoint
+from profits.repositories.operation_lock_repository import OperationLockRepository
+from profits.repositories.operation_repository import OperationRepository
+
+
+class LotCheckpointRepository:
+    @staticmethod
+    def _lots_to_json(open_lots: list[OpenLotDTO]) -> list[dict]:
+        return [
+            {
+                'date': open_lot.buy.date.isoformat(),
+                'quantity': str(open_lot.buy.quantity),
+                'currency': open_lot.buy.currency,
+                'price_avg': str(open_lot.buy.price_avg),
+                'open': str(open_lot.quantity),
+            }
+            for open_lot in open_lots
+        ]
+
+    @staticmethod
+    def _lots_from_json(lots: list[dict]) -> list[OpenLotDTO]:
+        return [
+            OpenLotDTO(
+                buy=OperationDTO(
+                    type='BUY',
+                    date=datetime.fromisoformat(lot['date']),
+                    quantity=Decimal(lot['quantity']),
+                    currency=lot['currency'],
+                    price_avg=Decimal(lot['price_avg'])
+                ),
+                quantity=Decimal(lot['open'])
+            )
+            for lot in lots
+        ]
+
+    def get_latest_checkpoints(self, account: Account, tickers: list[str], date_before: datetime) -> dict[str, LotCheckpointDTO]:
+        """
+        For each ticker returns the checkpoint with the latest date not after `date_before`, if any.
+        Checkpoints whose operations changed without the signals deleting them (e.g. created in bulk) are not returned,
+        so the replay starts from the first operation and saves them again.
+        """
+        checkpoints = list(LotCheckpoint.objects \
+            .filter(account=account, ticker__in=tickers, date__lte=date_before) \
+            .order_by('ticker', '-date') \
+            .distinct('ticker'))
+        operations_stamps = OperationRepository.get_operations_stamps(
+            account.id, [(checkpoint.ticker, checkpoint.date) for checkpoint in checkpoints])   # type: ignore
+
+        return {
+            checkpoint.ticker: LotCheckpointDTO(date=checkpoint.date, open_lots=self._lots_from_json(checkpoint.lots))
+            for checkpoint, operations_stamp in zip(checkpoints, operations_stamps)
+            if checkpoint.operations_stamp == operations_stamp
+        }
+
+    def save_checkpoints(self, account: Account, ticker: str, checkpoints: list[LotCheckpointDTO], is_current: Callable[[], bool]) -> bool:
+        """
+        Saves the checkpoints, replacing the ones already saved for the same date, if `is_current` confirms 
+        the data they were calculated from did not change. It is called holding the lock of the account operations, 
+        so operations can not change until the checkpoints are saved, and the ones changed before are seen.
+        Returns if the checkpoints were saved.
+        """
+        with transaction.atomic():
+            OperationLockRepository.lock_account(account.id)   # type: ignore
+            # Before checking them, so operations changed afterwards change the stamp saved
+            operations_stamps = OperationRepository.get_operations_stamps(
+                account.id, [(ticker, checkpoint.date) for checkpoint in checkpoints])   # type: ignore
+            if not is_current():
+                return False
+
+            LotCheckpoint.objects.bulk_create(
+                [
+                    LotCheckpoint(
+                        account=account, ticker=ticker, date=checkpoint.date, lots=self._lots_to_json(checkpoint.open_lots), 
+                        operations_stamp=operations_stamp) 
+                    for checkpoint, operations_stamp in zip(checkpoints, operations_stamps)
+                ],
+                update_conflicts=True,
+                unique_fields=['account', 'ticker', 'date'],
+                update_fields=['lots', 'operations_stamp']
+            )
+        return True
+
+    def delete_checkpoints_after(self, ticker: str, date: datetime, account_id: Optional[int] = None) -> int:
+        """
+        Deletes checkpoints of the ticker after the date, as an operation on that date changes the lots open after it.
+        If `account_id` is not given deletes checkpoints for all the accounts.
+        """
+        checkpoints = LotCheckpoint.objects.filter(ticker=ticker, date__gt=date)
+        if account_id is not None:
+            checkpoints = checkpoints.filter(account_id=account_id)
+
+        deleted_count, _ = checkpoints.delete()
+        return deleted_count
+
+    def delete_ticker_checkpoints(self, ticker: str) -> int:
+        """
+        Deletes all the checkpoints of the ticker for all the accounts.
+        """
+        deleted_count, _ = LotCheckpoint.objects.filter(ticker=ticker).delete()
+        return deleted_count
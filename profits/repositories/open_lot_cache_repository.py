@@ -0,0 +1,35 @@
+from typing import Optional
+import uuid
+
+from django.core.cache import cache
+
+from profits.interfaces.dtos.lot_checkpoint_dto import LotCheckpointDTO
+
+# Token in the keys of the cached lots, changed to invalidate at once the lots of all the accounts
+OPEN_LOTS_GENERATION_CACHE_KEY = 'profits:open_lots_generation'
+
+
+class OpenLotCacheRepository:
+    """
+    Lots open after all the operations of an account ticker, kept in the Django cache (shared by the processes).
+    The `date` of the cached `LotCheckpointDTO` is the date of the last operation replayed.
+    Lots are cached with the stamp of the operations they were replayed from (see `OperationRepository.get_operations_stamps`),
+    so once the operations change they are not found, and they expire after `timeout`.
+    """
+    def __init__(self, timeout: Optional[int] = None):
+        self.timeout = timeout
+
+    @staticmethod
+    def _key(account_id: int, ticker: str, operations_stamp: str) -> str:
+        generation = cache.get(OPEN_LOTS_GENERATION_CACHE_KEY, '')
+        return f'profits:open_lots:{generation}:{account_id}:{ticker}:{operations_stamp}'
+
+    def get_open_lots(self, account_id: int, ticker: str, operations_stamp: str) -> Optional[LotCheckpointDTO]:
+        return cache.get(self._key(account_id, ticker, operations_stamp))
+
+    def set_open_lots(self, account_id: int, ticker: str, operations_stamp: str, open_lots: LotCheckpointDTO) -> None:
+        cache.set(self._key(account_id, ticker, operations_stamp), open_lots, self.timeout)
+
+    @staticmethod
+    def delete_all_open_lots() -> None:
+        cache.set(OPEN_LOTS_GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,17 @@
+from django.db import connection
+
+
+class OperationLockRepository:
+    """
+    Lock of the data calculated from the operations of an account (lot checkpoints and realized gains).
+    Taken by the signals invalidating the data when operations change, and by the writers of the data while they check it is still current,
+    so data calculated from operations changed meanwhile is not saved after the signal invalidated it.
+    A single lock per account, so writers of several tickers take only one lock and can not deadlock with the signals.
+    """
+    @staticmethod
+    def lock_account(account_id: int) -> None:
+        """
+        Waits for the lock of the account and holds it until the end of the transaction, so it has to be called inside one.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))', [f'profits:operations:{account_id}'])
@@ -1,14 +1,81 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, time, timezone
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.db.models import Case, Count, DecimalField, Exists, F, Max, OuterRef, Q, Sum, Value, When, Window
+from django.db.models.functions import Coalesce
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
 from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.models import Account, Operation
+from profits.repositories.split_repository import SplitRepository
+from profits.utils.split_utils import SplitIndex
+
+# Columns needed to build an `OperationDTO`. Currency is read through the join so no query per row is needed to get its code.
+OPERATION_DTO_COLUMNS = ('type', 'date', 'quantity', 'amount_total', 'currency__iso_code')
 
 
 class OperationRepository:
-    def get_account_tickers_sold_period(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[str]:
+    def __init__(self, split_repository: Optional[SplitRepository] = None):
         """
-        Returns the list of tickers that were sold within the given time period for the given account.
+        With a `split_repository` the operations loaded are adjusted to the units after the last split of their ticker.
         """
+        self.split_repository = split_repository
+
+    def _get_split_index(self) -> Optional[SplitIndex]:
+        return self.split_repository.get_split_index() if self.split_repository is not None else None
+
+    @staticmethod
+    def _to_dto(type: str, date: datetime, quantity: Decimal, amount_total: Decimal, currency: str) -> OperationDTO:
+        """
+        Builds an `OperationDTO` from the projected columns, without instantiating the `Operation` model.
+        """
+        return OperationDTO(
+            type=type,
+            date=date,
+            quantity=quantity,
+            currency=currency,
+            price_avg=amount_total / quantity if quantity != 0 else Decimal('0')
+        )
+
+    @staticmethod
+    def _quantity_split_adjusted(split_index: SplitIndex, tickers: list[str]):
+        """
+        Expression of the quantity of the operations adjusted as `SplitIndex.adjust` does, so it can be added up in the database.
+        Factors are finite decimals, so the database multiplies them exactly as Python does.
+        """
+        split_whens = [
+            When(ticker=ticker, date__lt=datetime.combine(split_date, time.min, tzinfo=timezone.utc), then=F('quantity') * Value(factor))
+            for ticker in tickers
+            for split_date, factor in split_index.ticker_factors(ticker)
+        ]
+        # Operations after the last split, only multiplied for tickers with quantities in fractions of share
+        split_whens += [
+            When(ticker=ticker, then=F('quantity') * Value(split_index.scale(ticker)))
+            for ticker in tickers
+            if split_index.scale(ticker) != 1
+        ]
+        if not split_whens:
+            return F('quantity')
+
+        return Case(*split_whens, default=F('quantity'), output_field=DecimalField())
+
+    def get_quantity_scales(self, tickers: Iterable[str]) -> dict[str, Decimal]:
+        """
+        Returns, for the tickers whose operations are loaded with quantities in fractions of share so they are exact after the splits,
+        the number of them per share (see `SplitIndex`). Quantities of these tickers are divided by it when they are reported.
+        """
+        split_index = self._get_split_index()
+        if split_index is None:
+            return {}
+
+        return {ticker: split_index.scale(ticker) for ticker in tickers if split_index.scale(ticker) != 1}
+
+    @staticmethod
+    def _tickers_sold_period(account: Account, date_start: Optional[datetime], date_end: Optional[datetime]):
         operations = Operation.objects.filter(account=account)
         if date_start:
             operations = operations.filter(date__gte=date_start)
@@ -17,9 +84,65 @@ class OperationRepository:
 
         operations = operations.filter(type='SELL')
 
-        tickers = operations.values_list('ticker', flat=True).distinct()
+        return operations.values_list('ticker', flat=True).distinct()
+
+    def get_account_tickers_sold_period(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[str]:
+        """
+        Returns the list of tickers that were sold within the given time period for the given account.
+        """
+        return list(self._tickers_sold_period(account, date_start, date_end))
+
+    async def aget_account_tickers_sold_period(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[str]:
+        """
+        Async version of `get_account_tickers_sold_period`.
+        """
+        return [ticker async for ticker in self._tickers_sold_period(account, date_start, date_end)]
+
+    def get_account_tickers(self, account: Account, date_end: Optional[datetime]) -> list[str]:
+        """
+        Returns the list of tickers operated by the account up to the given date, in alphabetical order.
+        """
+        operations = Operation.objects.filter(account=account)
+        if date_end:
+            operations = operations.filter(date__lte=date_end)
+
+        return list(operations.order_by('ticker').values_list('ticker', flat=True).distinct())
+
+    def get_account_currencies(self, account: Account, tickers: list[str]) -> list[str]:
+        """
+        Returns the codes of the currencies the given tickers were operated in by the account, at any date.
+        """
+        operations = Operation.objects.filter(account=account, ticker__in=tickers)
+
+        return list(operations.order_by('currency__iso_code').values_list('currency__iso_code', flat=True).distinct())
 
-        return list(tickers)
+    @staticmethod
+    def get_operations_stamps(account_id: int, tickers_dates: list[tuple[str, Optional[datetime]]]) -> list[str]:
+        """
+        For each ticker and date returns the stamp of the operations of the ticker before the date (all of them if `None`),
+        which changes when any of them is created, saved or deleted, even in bulk without sending signals
+        (except with `QuerySet.update`, which does not set `updated_at`).
+        Data calculated from the operations is saved with their stamp, so it is not used if they changed. Calculated in a single query.
+        """
+        if not tickers_dates:
+            return []
+
+        aggregates = {}
+        for index, (ticker, date_before) in enumerate(tickers_dates):
+            operations_filter = Q(ticker=ticker) if date_before is None else Q(ticker=ticker, date__lt=date_before)
+            aggregates[f'count_{index}'] = Count('id', filter=operations_filter)
+            aggregates[f'id_{index}'] = Max('id', filter=operations_filter)
+            aggregates[f'updated_{index}'] = Max('updated_at', filter=operations_filter)
+        values = Operation.objects \
+            .filter(account_id=account_id, ticker__in={ticker for ticker, _ in tickers_dates}) \
+            .aggregate(**aggregates)
+
+        stamps = []
+        for index in range(len(tickers_dates)):
+            updated_at = values[f'updated_{index}']
+            stamps.append(f"{values[f'count_{index}']}:{values[f'id_{index}'] or ''}:{updated_at.isoformat() if updated_at else ''}")
+
+        return stamps
 
     def get_account_ticker_operations(self, account: Account, ticker: str, date_end: Optional[datetime]) -> list[OperationDTO]:
         """
@@ -33,5 +156,151 @@ class OperationRepository:
 
         operations = operations.order_by('date', 'type')  # Order by type so 'BUY' come before 'SELL' and no error if on same date
 
-        return [operation.to_dto() for operation in operations]
+        ticker_operations = [self._to_dto(*row) for row in operations.values_list(*OPERATION_DTO_COLUMNS)]
+        split_index = self._get_split_index()
+        if split_index is not None and ticker in split_index:
+            ticker_operations = [split_index.adjust(ticker, operation) for operation in ticker_operations]
+
+        return ticker_operations
+
+    def get_account_operations(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_end: Optional[datetime], 
+            tickers_date_start: Optional[dict[str, datetime]] = None) -> dict[str, list[OperationDTO]]:
+        """
+        Obtains operations for the account for all the given tickers before given date in a single query.
+        Same as `get_account_ticker_operations` but avoiding a database round trip per ticker.
+        For the tickers in `tickers_date_start` only operations from their date are loaded (e.g. when resuming from a checkpoint).
+        Returns a dictionary with the tickers (in the given order) as keys and their operations ordered by date as values.
+        """
+        rows = self._account_operations(account, tickers, date_end, tickers_date_start).values_list('ticker', *OPERATION_DTO_COLUMNS)
+        return self._group_tickers_operations(tickers, rows, self._get_split_index())
+
+    async def aget_account_operations(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_end: Optional[datetime]) -> dict[str, list[OperationDTO]]:
+        """
+        Async version of `get_account_operations`. 
+        The split index is read in a thread as it is cached by the process and loaded with the synchronous ORM when stale.
+        """
+        split_index = await sync_to_async(self._get_split_index)()
+        rows = [row async for row in self._account_operations(account, tickers, date_end, None).values_list('ticker', *OPERATION_DTO_COLUMNS)]
+        return self._group_tickers_operations(tickers, rows, split_index)
+
+    @staticmethod
+    def _account_operations(
+            account: Account, 
+            tickers: list[str], 
+            date_end: Optional[datetime], 
+            tickers_date_start: Optional[dict[str, datetime]]):
+        tickers_date_start = tickers_date_start or {}
+        tickers_filter = Q(ticker__in=[ticker for ticker in tickers if ticker not in tickers_date_start])
+        for ticker, date_start in tickers_date_start.items():
+            tickers_filter |= Q(ticker=ticker, date__gte=date_start)
+
+        operations = Operation.objects.filter(account=account).filter(tickers_filter)
+        if date_end:
+            operations = operations.filter(date__lte=date_end)
+
+        return operations.order_by('ticker', 'date', 'type')  # Order by type so 'BUY' come before 'SELL' and no error if on same date
+
+    def _group_tickers_operations(self, tickers: list[str], rows: Iterable[tuple], split_index: Optional[SplitIndex]) -> dict[str, list[OperationDTO]]:
+        tickers_operations: dict[str, list[OperationDTO]] = {ticker: [] for ticker in tickers}
+        for ticker, *row in rows:
+            operation = self._to_dto(*row)
+            if split_index is not None:
+                operation = split_index.adjust(ticker, operation)
+            tickers_operations[ticker].append(operation)
+
+        return tickers_operations
+
+    def get_account_operations_open_at(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: datetime, 
+            date_end: Optional[datetime]) -> dict[str, tuple[list[OpenLotDTO], list[OperationDTO]]]:
+        """
+        Same as `get_account_operations` but, instead of the operations before `date_start`, returns the BUY lots still open 
+        at `date_start` with their quantity not sold yet, so BUYs fully sold before the period are not transferred.
+        With FIFO the n-th unit sold comes from the n-th unit bought, so a BUY is still open if the quantity bought up to it 
+        (running sum per ticker) is bigger than the quantity sold before `date_start`; both are calculated with window functions.
+        Returns a dictionary with the tickers (in the given order) as keys and their open lots and operations from `date_start` as values.
+        Raises `ValueError` if a ticker sold before `date_start` more than bought.
+        """
+        operations = Operation.objects.filter(account=account).filter(ticker__in=tickers)
+        if date_end:
+            operations = operations.filter(date__lte=date_end)
+
+        split_index = self._get_split_index()
+        operations = operations.annotate(
+            quantity_adjusted=self._quantity_split_adjusted(split_index, tickers) if split_index is not None else F('quantity')
+        ).annotate(
+            bought_cumulative=Coalesce(
+                Window(Sum('quantity_adjusted', filter=Q(type='BUY')), partition_by=[F('ticker')], order_by=[F('date'), F('type')]), 
+                Decimal(0)),
+            bought_before=Coalesce(
+                Window(Sum('quantity_adjusted', filter=Q(type='BUY', date__lt=date_start)), partition_by=[F('ticker')]), 
+                Decimal(0)),
+            sold_before=Coalesce(
+                Window(Sum('quantity_adjusted', filter=Q(type='SELL', date__lt=date_start)), partition_by=[F('ticker')]), 
+                Decimal(0)),
+        ).filter(
+            Q(date__gte=date_start) | Q(type='BUY', bought_cumulative__gt=F('sold_before'))
+        ).order_by('ticker', 'date', 'type')  # Order by type so 'BUY' come before 'SELL' and no error if on same date
+
+        tickers_operations: dict[str, tuple[list[OpenLotDTO], list[OperationDTO]]] = {ticker: ([], []) for ticker in tickers}
+        rows = operations.values_list('ticker', 'bought_cumulative', 'bought_before', 'sold_before', *OPERATION_DTO_COLUMNS)
+        for ticker, bought_cumulative, bought_before, sold_before, *row in rows:
+            if sold_before > bought_before:
+                raise ValueError(f'For ticker {ticker}, {sold_before - bought_before} stocks sold before {date_start} without corresponding buys.')
+
+            operation = self._to_dto(*row)
+            if split_index is not None:
+                operation = split_index.adjust(ticker, operation)
+            open_lots, operations_period = tickers_operations[ticker]
+            if operation.date < date_start:
+                # Only the first lot open can be partially sold
+                open_lots.append(OpenLotDTO(buy=operation, quantity=min(operation.quantity, bought_cumulative - sold_before)))
+            else:
+                operations_period.append(operation)
+
+        return tickers_operations
+
+    def get_accounts_sold_operations(
+            self, 
+            accounts: list[Account], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> Iterator[tuple[int, dict[str, list[OperationDTO]]]]:
+        """
+        Obtains, in a single query, the operations before `date_end` of the tickers sold in the period for each of the accounts.
+        Yields the account id with a dictionary of its tickers sold and their operations ordered by date,
+        one account at a time as rows are read, so the operations of all the accounts are not held in memory at once.
+        Accounts without tickers sold in the period are not yielded.
+        """
+        sells_period = Operation.objects.filter(account_id=OuterRef('account_id'), ticker=OuterRef('ticker'), type='SELL')
+        if date_start:
+            sells_period = sells_period.filter(date__gte=date_start)
+        if date_end:
+            sells_period = sells_period.filter(date__lte=date_end)
+
+        operations = Operation.objects.filter(account__in=accounts).filter(Exists(sells_period))
+        if date_end:
+            operations = operations.filter(date__lte=date_end)
+
+        operations = operations.order_by('account_id', 'ticker', 'date', 'type')  # Order by type so 'BUY' come before 'SELL' and no error if on same date
 
+        split_index = self._get_split_index()
+        rows = operations.values_list('account_id', 'ticker', *OPERATION_DTO_COLUMNS).iterator()
+        for account_id, account_rows in groupby(rows, key=itemgetter(0)):
+            tickers_operations: dict[str, list[OperationDTO]] = {}
+            for _, ticker, *row in account_rows:
+                operation = self._to_dto(*row)
+                if split_index is not None:
+                    operation = split_index.adjust(ticker, operation)
+                tickers_operations.setdefault(ticker, []).append(operation)
+            yield account_id, tickers_operations
@@ -0,0 +1,117 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Optional
+
+from django.db import transaction
+from django.db.models import Sum
+
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.models import Account, RealizedGain, RealizedGainTicker
+from profits.repositories.operation_lock_repository import OperationLockRepository
+from profits.repositories.operation_repository import OperationRepository
+
+# Fields of `RealizedGain` with the same name and in the same order as in `ProfitExchangeDTO`
+PROFIT_EXCHANGE_DTO_COLUMNS = (
+    'buy_date', 'buy_amount_total', 'buy_currency', 'sell_date', 'sell_quantity', 'sell_amount_total', 'sell_currency', 'profit',
+    'currency_exchange', 'buy_exchange', 'buy_amount_total_exchange', 'sell_exchange', 'sell_amount_total_exchange', 'profit_exchange'
+)
+
+
+class RealizedGainRepository:
+    @staticmethod
+    def _filter_period(account: Account, date_start: Optional[datetime], date_end: Optional[datetime]):
+        realized_gains = RealizedGain.objects.filter(account=account)
+        if date_start:
+            realized_gains = realized_gains.filter(sell_date__gte=date_start)
+        if date_end:
+            realized_gains = realized_gains.filter(sell_date__lte=date_end)
+
+        return realized_gains
+
+    def get_tickers_up_to_date(self, account: Account, tickers: list[str]) -> set[str]:
+        """
+        Returns which of the given tickers have their realized gains up to date with their operations.
+        Gains of tickers whose operations changed without the signals making them stale (e.g. created in bulk) are not up to date.
+        """
+        tickers_stamps = list(RealizedGainTicker.objects.filter(account=account, ticker__in=tickers).values_list('ticker', 'operations_stamp'))
+        operations_stamps = OperationRepository.get_operations_stamps(account.id, [(ticker, None) for ticker, _ in tickers_stamps])   # type: ignore
+
+        return {ticker for (ticker, stamp), operations_stamp in zip(tickers_stamps, operations_stamps) if stamp == operations_stamp}
+
+    def replace_tickers_gains(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            calculate_tickers_gains: Callable[[list[str]], dict[str, list[ProfitExchangeDTO]]]) -> None:
+        """
+        Replaces the realized gains of the tickers still stale with the ones returned by `calculate_tickers_gains` for them,
+        and marks them as up to date. 
+        Holds the lock of the account operations, which the signals making tickers stale also take, so the gains are calculated 
+        from operations that can not change until they are saved, and tickers refreshed meanwhile by another request are skipped.
+        """
+        with transaction.atomic():
+            OperationLockRepository.lock_account(account.id)   # type: ignore
+            tickers_up_to_date = self.get_tickers_up_to_date(account, tickers)
+            tickers_stale = [ticker for ticker in tickers if ticker not in tickers_up_to_date]
+            if not tickers_stale:
+                return
+
+            # Before calculating them, so operations changed afterwards change the stamp saved
+            operations_stamps = OperationRepository.get_operations_stamps(account.id, [(ticker, None) for ticker in tickers_stale])   # type: ignore
+            tickers_gains = calculate_tickers_gains(tickers_stale)
+            RealizedGain.objects.filter(account=account, ticker__in=tickers_stale).delete()
+            RealizedGain.objects.bulk_create([
+                RealizedGain(account=account, ticker=ticker, **{column: getattr(profit, column) for column in PROFIT_EXCHANGE_DTO_COLUMNS})
+                for ticker, profits in tickers_gains.items()
+                for profit in profits
+            ])
+            RealizedGainTicker.objects.filter(account=account, ticker__in=tickers_stale).delete()
+            RealizedGainTicker.objects.bulk_create([
+                RealizedGainTicker(account=account, ticker=ticker, operations_stamp=operations_stamp) 
+                for ticker, operations_stamp in zip(tickers_stale, operations_stamps)
+            ])
+
+    def set_ticker_stale(self, account_id: int, ticker: str) -> None:
+        """
+        Deletes the realized gains of the ticker, so they are not reported until calculated again.
+        """
+        with transaction.atomic():
+            RealizedGainTicker.objects.filter(account_id=account_id, ticker=ticker).delete()
+            RealizedGain.objects.filter(account_id=account_id, ticker=ticker).delete()
+
+    def set_ticker_stale_all_accounts(self, ticker: str) -> None:
+        with transaction.atomic():
+            RealizedGainTicker.objects.filter(ticker=ticker).delete()
+            RealizedGain.objects.filter(ticker=ticker).delete()
+
+    def set_all_stale(self) -> None:
+        with transaction.atomic():
+            RealizedGainTicker.objects.all().delete()
+            RealizedGain.objects.all().delete()
+
+    def get_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
+        """
+        Adds up the profits exchanged of the SELLs in the period.
+        """
+        profit_total = self._filter_period(account, date_start, date_end).aggregate(profit_total=Sum('profit_exchange'))['profit_total']
+        return profit_total or Decimal(0)
+
+    def get_tickers_gains(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> dict[str, list[ProfitExchangeDTO]]:
+        """
+        Returns the realized gains of the SELLs in the period for the given tickers (in the given order),
+        in the same order as the FIFO replay finds them.
+        """
+        realized_gains = self._filter_period(account, date_start, date_end) \
+            .filter(ticker__in=tickers) \
+            .order_by('ticker', 'sell_date', 'id')
+
+        tickers_gains: dict[str, list[ProfitExchangeDTO]] = {ticker: [] for ticker in tickers}
+        for ticker, *row in realized_gains.values_list('ticker', *PROFIT_EXCHANGE_DTO_COLUMNS):
+            tickers_gains[ticker].append(ProfitExchangeDTO(*row))
+
+        return tickers_gains
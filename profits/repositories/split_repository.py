@@ -0,0 +1,35 @@
+from typing import Optional
+import uuid
+
+from django.core.cache import cache
+
+from profits.models import Split
+from profits.utils.split_utils import SplitIndex
+
+# Token changed each time splits change, so other processes know their cached index is stale
+SPLIT_INDEX_VERSION_CACHE_KEY = 'profits:split_index_version'
+
+_split_index: Optional[SplitIndex] = None
+_split_index_version: Optional[str] = None
+
+
+class SplitRepository:
+    @staticmethod
+    def get_split_index() -> SplitIndex:
+        """
+        Returns the `SplitIndex` of all the tickers. It is loaded with a single query and cached by the process
+        until splits are saved or deleted (see `profits.signals`).
+        """
+        global _split_index, _split_index_version
+        version = cache.get(SPLIT_INDEX_VERSION_CACHE_KEY)
+        if _split_index is None or version != _split_index_version:
+            _split_index = SplitIndex(Split.objects.values_list('ticker', 'date', 'origin', 'target'))
+            _split_index_version = version
+
+        return _split_index
+
+    @staticmethod
+    def invalidate_split_index() -> None:
+        global _split_index
+        _split_index = None
+        cache.set(SPLIT_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
@@ -1,3 +1,6 @@
+import re
+from decimal import Decimal
+
 from rest_framework import serializers
 
 from profits.models import Account, Broker, Currency, CurrencyExchange, Dividend, Operation, Split
@@ -63,3 +66,27 @@ class OperationSerializer(serializers.ModelSerializer):
         fields = ['id', 'account', 'date', 'type', 'ticker', 'quantity', 'currency', 'amount_total', 'exchange', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+
+
+class SimulationOperationSerializer(serializers.Serializer):
+    """
+    Hypothetical operation to simulate, not saved.
+    """
+    type = serializers.ChoiceField(choices=Operation.TYPE_CHOICES)
+    date = serializers.DateTimeField()
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=7, min_value=Decimal(0))
+    price = serializers.DecimalField(max_digits=17, decimal_places=7, min_value=Decimal(0))
+    currency = serializers.CharField(max_length=3, default='GBP')
+
+class SimulationSerializer(serializers.Serializer):
+    ticker = serializers.CharField(max_length=10)
+    operations = SimulationOperationSerializer(many=True, allow_empty=False)
+
+    def validate_ticker(self, value: str) -> str:
+        """
+        Tickers are saved in upper case when the operations are uploaded, so the ticker is matched with them in upper case.
+        """
+        ticker = value.upper()
+        if not re.fullmatch(r'[A-Z0-9.\-]+', ticker):
+            raise serializers.ValidationError("Ticker can only contain letters, digits, '.' and '-'.")
+        return ticker
@@ -1,6 +1,7 @@
+import bisect
 from datetime import datetime, timedelta, date
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, Optional
 
 from profits.services.exceptions import CurrencyConversionException, CurrencyExchangeNotFoundException
 from profits.repositories.currency_repository import CurrencyRepository
@@ -11,6 +12,8 @@ class CurrencyService:
         self.date_start = date_start
         self.date_end = date_end
         self.currencies_exchanges_cache = {}
+        # Sorted dates of the rates of each pair in `currencies_exchanges_cache`, for `get_currency_exchanges`
+        self.currencies_exchanges_dates_cache: dict[str, list[date]] = {}
     
     @staticmethod
     def is_currency_conversion(ticker: str) -> bool:
@@ -49,6 +52,39 @@ class CurrencyService:
 
         return currency_pair_exchanges
 
+    def load_exchanges(self, origin_currency_codes: Iterable[str], target_currency_code: str) -> None:
+        """
+        Loads up front the exchange rates from the given currencies to the target currency,
+        so afterwards `get_currency_exchange` does not need to access the database for them.
+        """
+        target_currency_code = target_currency_code.upper()
+        for origin_currency_code in {code.upper() for code in origin_currency_codes}:
+            if origin_currency_code != target_currency_code:
+                self._load_exchanges(origin_currency_code, target_currency_code)
+
+    async def aload_exchanges(self, origin_currency_codes: Iterable[str], target_currency_code: str) -> None:
+        """
+        Async version of `load_exchanges`, so the rates are loaded without blocking and the calculation does not access the database.
+        Pairs without rates are not loaded, `get_currency_exchange` raises the error if their rates are requested.
+        """
+        target_currency_code = target_currency_code.upper()
+        for origin_currency_code in {code.upper() for code in origin_currency_codes}:
+            currency_pair_key= f"{origin_currency_code}-{target_currency_code}"
+            if origin_currency_code == target_currency_code or self.currencies_exchanges_cache.get(currency_pair_key):
+                continue
+
+            currency_pair_exchanges= await self.currency_repository.aget_currency_exchanges(
+                origin_currency_code, target_currency_code, self.date_start, self.date_end)
+            if not currency_pair_exchanges:
+                currency_pair_inverse_exchanges= await self.currency_repository.aget_currency_exchanges(
+                    target_currency_code, origin_currency_code, self.date_start, self.date_end)
+                if not currency_pair_inverse_exchanges:
+                    continue
+                self.currencies_exchanges_cache[f"{target_currency_code}-{origin_currency_code}"]= currency_pair_inverse_exchanges
+                currency_pair_exchanges= { date: Decimal(1) / rate for date, rate in currency_pair_inverse_exchanges.items()}
+
+            self.currencies_exchanges_cache[currency_pair_key] = currency_pair_exchanges
+
     def get_currency_exchange(self, origin_currency_code: str, target_currency_code: str, date_request: datetime) -> Decimal:
         """
         Gets exchange rate between 2 given currencies and date.
@@ -74,3 +110,31 @@ class CurrencyService:
             return exchange_rate
 
         raise CurrencyConversionException(f"Exchange for {origin_currency_code}-{target_currency_code} could not be found for date {date_request}")
+
+    def get_currency_exchanges(self, origin_currency_code: str, target_currency_code: str, dates_request: Iterable[date]) -> dict[date, Decimal]:
+        """
+        Same as `get_currency_exchange` for many dates at once, finding the rate of each date (or the latest previous one)
+        by binary search on the dates of the rates loaded instead of decreasing the date by one day at a time.
+        Dates without a rate on or before them are not returned, `get_currency_exchange` raises the error if they are requested.
+        As in `get_currency_exchange`, rates of 0 are missing rates, so the latest previous rate is returned instead.
+        """
+        origin_currency_code = origin_currency_code.upper()
+        target_currency_code = target_currency_code.upper()
+
+        if origin_currency_code == target_currency_code:
+            return {date_request: Decimal(1) for date_request in dates_request}
+
+        currency_pair_exchanges= self._load_exchanges(origin_currency_code, target_currency_code)
+        currency_pair_key= f"{origin_currency_code}-{target_currency_code}"
+        exchange_dates = self.currencies_exchanges_dates_cache.get(currency_pair_key)
+        if exchange_dates is None:
+            exchange_dates = sorted(date_exchange for date_exchange, rate in currency_pair_exchanges.items() if rate)
+            self.currencies_exchanges_dates_cache[currency_pair_key] = exchange_dates
+
+        exchanges = {}
+        for date_request in dates_request:
+            index = bisect.bisect_right(exchange_dates, date_request)
+            if index > 0:
+                exchanges[date_request] = currency_pair_exchanges[exchange_dates[index - 1]]
+
+        return exchanges
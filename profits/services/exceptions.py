@@ -17,3 +17,7 @@ class CurrencyExchangeNotFoundException(CurrencyRepositoryException):
 class ProfitServiceBuySellMissmatch(ServiceException):
     """Raised when a required there are more stocks sold that bought"""
     pass
+
+class ProfitServiceInvalidOperations(ServiceException):
+    """Raised when operations to simulate can not be applied on top of the operations saved"""
+    pass
@@ -0,0 +1,155 @@
+from decimal import Decimal
+from typing import Optional
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.utils.fixed_point_utils import AMOUNT_PLACES, QUANTITY_PLACES, RATE_PLACES, from_fixed, round_div, to_fixed, to_fixed_exact
+
+
+class FixedPointProfitCalculator(ProfitCalculator):
+    """
+    Same FIFO matching as `ProfitCalculator` but with the arithmetic done on integers.
+    Quantities and amounts are scaled to the precision of the `Operation` fields and rates to the precision of `CurrencyExchange.rate`.
+    Each output value is calculated exactly and rounded once, so it matches the `Decimal` calculation rounded to the field precision.
+    Values are converted back to `Decimal` only when building the output DTOs.
+    """
+    def __init__(self, profit_exchanger: ProfitExchanger):
+        super().__init__(profit_exchanger)
+        self._rate_fractions: dict[Decimal, tuple[int, int]] = {}
+
+    def _rate_fraction(self, rate: Decimal) -> tuple[int, int]:
+        """
+        Rates loaded from the database fit in `RATE_PLACES`, but rates calculated as the inverse of a stored rate do not,
+        so those are kept as an exact fraction.
+        """
+        rate_fraction = self._rate_fractions.get(rate)
+        if rate_fraction is None:
+            rate_scaled = to_fixed_exact(rate, RATE_PLACES)
+            if rate_scaled is not None:
+                rate_fraction = (rate_scaled, 10 ** RATE_PLACES)
+            else:
+                rate_fraction = rate.as_integer_ratio()
+            self._rate_fractions[rate] = rate_fraction
+
+        return rate_fraction
+
+    @staticmethod
+    def _amount_total(operation: OperationDTO) -> int:
+        """
+        `OperationDTO` only carries the average price, the amount total stored in the database is recovered rounding to its precision.
+        """
+        return to_fixed(operation.price_avg * operation.quantity, AMOUNT_PLACES)
+
+    def _calculate_profit_match_fixed(
+            self,
+            quantity_line: int,
+            sell: OperationDTO,
+            sell_fixed: tuple[int, int],
+            buy: OperationDTO,
+            buy_fixed: tuple[int, int],
+            target_currency: str) -> ProfitExchangeDTO:
+        """
+        Calculate profit for a match between a SELL and a BUY operation.
+        `sell_fixed` and `buy_fixed` are the (quantity, amount total) of the operations as scaled integers.
+        """
+        sell_quantity, sell_amount = sell_fixed
+        buy_quantity, buy_amount = buy_fixed
+        # Operations with zero quantity have zero average price
+        if not buy_quantity:
+            buy_quantity, buy_amount = 1, 0
+
+        sell_amount_total = round_div(quantity_line * sell_amount, sell_quantity)
+        buy_amount_total = round_div(quantity_line * buy_amount, buy_quantity)
+
+        profit = None
+        if sell.currency == buy.currency:
+            profit = from_fixed(
+                round_div(quantity_line * (sell_amount * buy_quantity - buy_amount * sell_quantity), sell_quantity * buy_quantity),
+                AMOUNT_PLACES)
+
+        buy_exchange = self.profit_exchanger.get_exchange(buy.currency, target_currency, buy.date)
+        buy_rate_numerator, buy_rate_denominator = self._rate_fraction(buy_exchange)
+        sell_exchange = self.profit_exchanger.get_exchange(sell.currency, target_currency, sell.date)
+        sell_rate_numerator, sell_rate_denominator = self._rate_fraction(sell_exchange)
+
+        buy_numerator = quantity_line * buy_amount * buy_rate_numerator
+        buy_denominator = buy_quantity * buy_rate_denominator
+        sell_numerator = quantity_line * sell_amount * sell_rate_numerator
+        sell_denominator = sell_quantity * sell_rate_denominator
+
+        return ProfitExchangeDTO(
+            sell_date= sell.date,
+            sell_quantity= from_fixed(quantity_line, QUANTITY_PLACES),
+            sell_amount_total= from_fixed(sell_amount_total, AMOUNT_PLACES),
+            sell_currency= sell.currency,
+            buy_date= buy.date,
+            buy_amount_total= from_fixed(buy_amount_total, AMOUNT_PLACES),
+            buy_currency= buy.currency,
+            profit= profit,
+            currency_exchange= target_currency,
+            buy_exchange= buy_exchange,
+            buy_amount_total_exchange= from_fixed(round_div(buy_numerator, buy_denominator), AMOUNT_PLACES),
+            sell_exchange= sell_exchange,
+            sell_amount_total_exchange= from_fixed(round_div(sell_numerator, sell_denominator), AMOUNT_PLACES),
+            profit_exchange= from_fixed(
+                round_div(sell_numerator * buy_denominator - buy_numerator * sell_denominator, sell_denominator * buy_denominator),
+                AMOUNT_PLACES)
+        )
+
+    def calculate_ticker_profits(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> list[ProfitExchangeDTO]:
+        """
+        Replays the operations of a ticker matching SELLs with previous BUYs using the FIFO method.
+        If a `lot_ledger` is given the replay starts from its open lots, and after the replay it holds the lots still open.
+        """
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+
+        # Ledger with quantities as scaled integers, and (quantity, amount total) scaled for each BUY in the ledger
+        fixed_ledger = LotLedger()
+        buys_fixed: dict[int, tuple[int, int]] = {}
+        if lot_ledger is not None:
+            for open_lot in lot_ledger.open_lots():
+                buys_fixed[id(open_lot.buy)] = (to_fixed(open_lot.buy.quantity, QUANTITY_PLACES), self._amount_total(open_lot.buy))
+                fixed_ledger.add(open_lot.buy, to_fixed(open_lot.quantity, QUANTITY_PLACES))
+
+        profits: list[ProfitExchangeDTO] = []
+        for operation in ticker_operations:
+            operation_fixed = (to_fixed(operation.quantity, QUANTITY_PLACES), self._amount_total(operation))
+            if operation.type == 'BUY':
+                buys_fixed[id(operation)] = operation_fixed
+                fixed_ledger.add(operation, operation_fixed[0])
+            elif operation.type == 'SELL':
+                matches, quantity_sell = fixed_ledger.consume(operation_fixed[0])
+                if quantity_sell > 0:
+                    raise ValueError(
+                        f'On date {operation.date}, {from_fixed(quantity_sell, QUANTITY_PLACES)} stocks left to sell without corresponding buys.')
+
+                for buy, quantity_line in matches:
+                    profits.append(
+                        self._calculate_profit_match_fixed(quantity_line, operation, operation_fixed, buy, buys_fixed[id(buy)], target_currency))
+            else:
+                raise ValueError(f"Unexpected operation type {operation.type}")
+
+        if lot_ledger is not None:
+            lot_ledger.clear()
+            for open_lot in fixed_ledger.open_lots():
+                lot_ledger.add(open_lot.buy, from_fixed(open_lot.quantity, QUANTITY_PLACES))
+
+        return profits
+
+    def calculate_ticker_profit_total(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> Decimal:
+        """
+        Adds up the profits of `calculate_ticker_profits` so the total is consistent with the rounded details.
+        """
+        profits = self.calculate_ticker_profits(ticker_operations, target_currency, lot_ledger)
+        return sum((profit.profit_exchange for profit in profits), Decimal(0))
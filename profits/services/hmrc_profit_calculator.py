@@ -0,0 +1,176 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import groupby
+from typing import Optional
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.services.lot_ledger import LotLedger
+from profits.services.section104_profit_calculator import Section104ProfitCalculator
+
+
+class _BuysLeft:
+    """
+    Quantities left to match of the BUYs, in date order, to match them with SELLs by ranges of dates.
+    BUYs fully matched are skipped with a "next BUY with quantity left" pointer per BUY, compressed as it is followed,
+    so matching a SELL costs the bisection of its range plus the BUYs it matches, not the BUYs already fully matched.
+    """
+    def __init__(self, buys: list[OperationDTO]):
+        self.buys = buys
+        self.days = [buy.date.date() for buy in buys]
+        self.quantities = [buy.quantity for buy in buys]
+        self._next = [index if quantity > 0 else index + 1 for index, quantity in enumerate(self.quantities)] + [len(buys)]
+
+    def _find(self, index: int) -> int:
+        """
+        First BUY from `index` with quantity left, or the number of BUYs if none.
+        """
+        root = index
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[index] != root:
+            self._next[index], index = root, self._next[index]
+        return root
+
+    def match(self, quantity: Decimal, day_first: date, day_last: date) -> tuple[list[tuple[OperationDTO, Decimal]], Decimal]:
+        """
+        Matches the quantity with the BUYs between the days (both included), earliest first.
+        Returns the BUYs matched with the quantity taken from each of them, and the quantity left to match.
+        """
+        matches = []
+        index_last = bisect_right(self.days, day_last)
+        index = self._find(bisect_left(self.days, day_first))
+        while quantity > 0 and index < index_last:
+            quantity_line = min(quantity, self.quantities[index])
+            self.quantities[index] -= quantity_line
+            quantity -= quantity_line
+            matches.append((self.buys[index], quantity_line))
+            if self.quantities[index] == 0:
+                self._next[index] = index + 1
+            index = self._find(index)
+
+        return matches, quantity
+
+
+class HmrcProfitCalculator(Section104ProfitCalculator):
+    """
+    Matches SELLs with BUYs following the HMRC share identification rules, in this order:
+    1. Same day: BUYs of the same day as the SELL.
+    2. Bed and breakfast: BUYs of the 30 days after the SELL, earliest first.
+    3. Section 104: the quantity left at the average cost of the pool of the BUYs left before the SELL (see `Section104ProfitCalculator`).
+    As HMRC requires, all the BUYs (and all the SELLs) of a day in the same currency are taken as a single operation at their average price.
+    SELLs are matched with BUYs after them, so the operations up to 30 days after the last SELL reported must be given.
+    """
+    MATCHING_DAYS = 30
+    lookahead_days = MATCHING_DAYS
+
+    @staticmethod
+    def _aggregate_day_operations(ticker_operations: list[OperationDTO]) -> list[OperationDTO]:
+        """
+        Operations of each day grouped by type and currency into a single operation dated as the first one, with the average price.
+        BUYs of the day come before its SELLs.
+        """
+        operations_aggregated = []
+        for _, day_operations in groupby(ticker_operations, key=lambda operation: operation.date.date()):
+            day_groups: dict[tuple[str, str], list[OperationDTO]] = {}
+            for operation in day_operations:
+                if operation.type not in ('BUY', 'SELL'):
+                    raise ValueError(f"Unexpected operation type {operation.type}")
+                day_groups.setdefault((operation.type, operation.currency), []).append(operation)
+
+            for (type, currency), operations in sorted(day_groups.items(), key=lambda item: item[0][0] != 'BUY'):
+                if len(operations) == 1:
+                    operations_aggregated.append(operations[0])
+                    continue
+                quantity = sum((operation.quantity for operation in operations), Decimal(0))
+                amount_total = sum((operation.quantity * operation.price_avg for operation in operations), Decimal(0))
+                operations_aggregated.append(OperationDTO(
+                    type=type,
+                    date=operations[0].date,
+                    quantity=quantity,
+                    currency=currency,
+                    price_avg=amount_total / quantity if quantity != 0 else Decimal(0)))
+
+        return operations_aggregated
+
+    def _match_ticker_operations(
+            self,
+            ticker_operations: list[OperationDTO],
+            lot_ledger: LotLedger,
+            target_currency: str) -> list[tuple[OperationDTO, list[tuple[OperationDTO, Decimal]], Optional[tuple[OperationDTO, Decimal, datetime]]]]:
+        """
+        Returns each SELL with the BUYs matched by the same day and bed and breakfast rules and the quantity taken from each of them,
+        and the part of the SELL left taken from the pool, with the cost taken and the date of the pool, if any.
+        The pool held in `lot_ledger` only takes the quantities left, and after the matching it holds the pool left.
+        """
+        buys = [operation for operation in ticker_operations if operation.type == 'BUY']
+        sells = [operation for operation in ticker_operations if operation.type == 'SELL']
+        buys_left = _BuysLeft(buys)
+        sells_matches: list[list[tuple[OperationDTO, Decimal]]] = [[] for _ in sells]
+        sells_left = [sell.quantity for sell in sells]
+
+        # Same day, then bed and breakfast for what is left of each SELL
+        for index, sell in enumerate(sells):
+            day = sell.date.date()
+            matches, sells_left[index] = buys_left.match(sells_left[index], day, day)
+            sells_matches[index].extend(matches)
+        for index, sell in enumerate(sells):
+            day = sell.date.date()
+            matches, sells_left[index] = buys_left.match(sells_left[index], day + timedelta(days=1), day + timedelta(days=self.MATCHING_DAYS))
+            sells_matches[index].extend(matches)
+
+        # Section 104 pool with the quantities left, in the order of the operations
+        buys_quantity_left = {id(buy): quantity for buy, quantity in zip(buys, buys_left.quantities)}
+        sells_quantity_left = {id(sell): quantity for sell, quantity in zip(sells, sells_left)}
+        operations_left = [
+            replace(operation, quantity=quantity_left)
+            for operation in ticker_operations
+            if (quantity_left := (buys_quantity_left if operation.type == 'BUY' else sells_quantity_left)[id(operation)]) > 0
+        ]
+        sells_pool: list[Optional[tuple[OperationDTO, Decimal, datetime]]] = [None for _ in sells]
+        sells_pool_indexes = [index for index, quantity in enumerate(sells_left) if quantity > 0]
+        # Listed before zipping, so the pool left is kept in `lot_ledger` once all the SELLs are taken
+        for index, sell_pool in zip(sells_pool_indexes, list(self._iter_pool_sells(operations_left, lot_ledger, target_currency))):
+            sells_pool[index] = sell_pool
+
+        return list(zip(sells, sells_matches, sells_pool))
+
+    def replay_ticker_operations(self, ticker_operations: list[OperationDTO], lot_ledger: LotLedger, target_currency: str = "GBP") -> None:
+        """
+        Matches the operations only to update the pool in `lot_ledger`. The cost of the BUYs is exchanged, so rates are needed.
+        """
+        ticker_operations = self._aggregate_day_operations(ticker_operations)
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+        self._match_ticker_operations(ticker_operations, lot_ledger, target_currency)
+
+    def calculate_ticker_profits(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> list[ProfitExchangeDTO]:
+        """
+        Matches the operations of a ticker with the HMRC rules, returning the profits of each SELL in date order.
+        If a `lot_ledger` is given the replay starts from its pool, and after the matching it holds the pool left.
+        """
+        if lot_ledger is None:
+            lot_ledger = LotLedger()
+        ticker_operations = self._aggregate_day_operations(ticker_operations)
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+
+        profits: list[ProfitExchangeDTO] = []
+        for sell, matches, sell_pool in self._match_ticker_operations(ticker_operations, lot_ledger, target_currency):
+            profits.extend(self._calculate_profit_match(quantity_line, sell, buy, target_currency) for buy, quantity_line in matches)
+            if sell_pool is not None:
+                profits.append(self._calculate_profit_pool(*sell_pool, target_currency))
+
+        return profits
+
+    def calculate_ticker_profit_total(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> Decimal:
+        profits = self.calculate_ticker_profits(ticker_operations, target_currency, lot_ledger)
+        return sum((profit.profit_exchange for profit in profits), Decimal(0))
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.utils import timezone
+
+from profits.interfaces.dtos.lot_checkpoint_dto import LotCheckpointDTO
+from profits.models import Account
+from profits.repositories.lot_checkpoint_repository import LotCheckpointRepository
+from profits.utils import datetime_utils
+
+
+class LotCheckpointService:
+    """
+    Keeps the lots open of each ticker of an account at a yearly boundary (by default the start of the UK tax year, 6 April), 
+    so the FIFO replay can resume from the latest checkpoint instead of from the first operation.
+    Checkpoints are deleted when operations or splits dated before them change (see `profits.signals`).
+    """
+    def __init__(self, lot_checkpoint_repository: LotCheckpointRepository, boundary_month: int = 4, boundary_day: int = 6):
+        """
+        Raises `ValueError` if the boundary month and day do not exist in every year.
+        """
+        datetime_utils.check_year_start(boundary_month, boundary_day)
+        self.lot_checkpoint_repository = lot_checkpoint_repository
+        self.boundary_month = boundary_month
+        self.boundary_day = boundary_day
+
+    def get_checkpoints(self, account: Account, tickers: list[str], date_start: datetime) -> dict[str, LotCheckpointDTO]:
+        """
+        Returns for each ticker the latest checkpoint from which the replay can resume to calculate profits from `date_start`.
+        """
+        return self.lot_checkpoint_repository.get_latest_checkpoints(account, tickers, date_start)
+
+    def get_boundaries(self, date_from: datetime, date_to: Optional[datetime]) -> list[datetime]:
+        """
+        Returns the dates of the checkpoints after `date_from` up to `date_to`. 
+        Checkpoints can not be in the future as operations could still be added before them.
+        """
+        now = timezone.now()
+        date_to = min(date_to, now) if date_to else now
+        return datetime_utils.yearly_dates(self.boundary_month, self.boundary_day, date_from, date_to)
+
+    def save_checkpoints(self, account: Account, ticker: str, checkpoints: list[LotCheckpointDTO], is_current: Callable[[], bool]) -> bool:
+        """
+        Saves the checkpoints unless `is_current` finds that the operations they were calculated from changed since loaded,
+        as the signal invalidating the checkpoints could have run before they are saved.
+        """
+        if not checkpoints:
+            return False
+        return self.lot_checkpoint_repository.save_checkpoints(account, ticker, checkpoints, is_current)
@@ -0,0 +1,100 @@
+from collections import deque
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
+
+
+class LotLedger:
+    """
+    Open BUY lots of a ticker in the order they were bought, to be consumed by SELLs using the FIFO method.
+    Consuming from the head of the ledger is O(1) and the remaining quantity of a partially sold lot is tracked
+    in the ledger so the BUY operations given are never modified.
+    """
+    def __init__(self, open_lots: Optional[Iterable[OpenLotDTO]] = None):
+        self._lots: deque[OpenLotDTO] = deque(OpenLotDTO(buy=lot.buy, quantity=lot.quantity) for lot in open_lots or [])
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    @property
+    def quantity(self) -> Decimal:
+        """
+        Total quantity still open.
+        """
+        return sum((lot.quantity for lot in self._lots), Decimal(0))
+
+    def add(self, buy: OperationDTO, quantity: Optional[Decimal] = None, coalesce: bool = False) -> None:
+        """
+        Opens a lot for the BUY operation, by default with all the quantity bought.
+        With `coalesce` the BUY is merged into the newest open lot when both were bought the same day, at the same price
+        and in the same currency, so SELLs match a single lot instead of one per operation.
+        Lots are only merged while no SELL has consumed them, the same rule as `ProfitCalculator._match_vectorized`,
+        so both replays return the same profit details.
+        """
+        quantity = buy.quantity if quantity is None else quantity
+        if (coalesce and self._lots and self._lots[-1].quantity == self._lots[-1].buy.quantity
+                and self.can_coalesce(self._lots[-1].buy, buy)):
+            last_lot = self._lots[-1]
+            last_lot.buy = self.coalesce_buys(last_lot.buy, buy)
+            last_lot.quantity += quantity
+            return
+
+        self._lots.append(OpenLotDTO(buy=buy, quantity=quantity))
+
+    @staticmethod
+    def can_coalesce(lot_buy: OperationDTO, buy: OperationDTO) -> bool:
+        """
+        Whether the BUY can be merged into the lot of `lot_buy`: same day, same price and same currency.
+        """
+        return (
+            lot_buy.date.date() == buy.date.date()
+            and lot_buy.price_avg == buy.price_avg
+            and lot_buy.currency == buy.currency)
+
+    @staticmethod
+    def coalesce_buys(lot_buy: OperationDTO, buy: OperationDTO) -> OperationDTO:
+        """
+        BUY with the quantity of both operations, dated as the first one.
+        As both have the same price, the weighted average price is that same price.
+        """
+        return OperationDTO(
+            type=lot_buy.type,
+            date=lot_buy.date,
+            quantity=lot_buy.quantity + buy.quantity,
+            currency=lot_buy.currency,
+            price_avg=lot_buy.price_avg)
+
+    def clear(self) -> None:
+        self._lots.clear()
+
+    def consume(self, quantity: Decimal) -> tuple[list[tuple[OperationDTO, Decimal]], Decimal]:
+        """
+        Consumes the given quantity from the oldest open lots.
+        Returns the BUY operations matched with the quantity taken from each of them, and the quantity 
+        that could not be matched because there were no more open lots.
+        """
+        matches = []
+        while quantity > 0 and self._lots:
+            current_lot = self._lots[0]
+
+            if current_lot.quantity > quantity:
+                # Can use the lot to offset all the quantity
+                quantity_line = quantity
+                current_lot.quantity -= quantity_line
+            else:
+                # Only part of the quantity can be offset with the lot
+                quantity_line = current_lot.quantity
+                self._lots.popleft()
+
+            quantity -= quantity_line
+            matches.append((current_lot.buy, quantity_line))
+
+        return matches, quantity
+
+    def open_lots(self) -> list[OpenLotDTO]:
+        """
+        Returns a copy of the lots still open, oldest first.
+        """
+        return [OpenLotDTO(buy=lot.buy, quantity=lot.quantity) for lot in self._lots]
@@ -0,0 +1,162 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, TypedDict
+
+import numpy as np
+from django.utils import timezone
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.models import Account
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import CurrencyExchangeNotFoundException
+from profits.utils.fixed_point_utils import QUANTITY_PLACES, to_fixed
+
+TARGET_CURRENCY = 'GBP'
+# Keys of the operations are the index of their ticker in the high bits and the ordinal of their day in the low ones
+TICKER_KEY_SHIFT = 32
+VALUE_PLACES = 2
+
+class TickerPositionHistory(TypedDict):
+    ticker: str
+    quantities: list[Decimal]
+    values: Optional[list[Optional[Decimal]]]
+
+class PositionHistory(TypedDict):
+    dates: list[date]
+    positions: list[TickerPositionHistory]
+
+
+def _from_fixed_list(values: list[int], places: int) -> list[Decimal]:
+    """
+    Same as `from_fixed` for a list of values, building a single `Decimal` per distinct value (positions only change on operations).
+    """
+    decimals: dict[int, Decimal] = {}
+    unit = Decimal(1).scaleb(-places)
+    for value in values:
+        if value not in decimals:
+            decimals[value] = Decimal(value) * unit if value else Decimal(0)
+    return [decimals[value] for value in values]
+
+
+class PositionHistoryService:
+    FREQUENCIES = {'daily': 1, 'weekly': 7}
+
+    def __init__(self, operation_repository: OperationRepository, currency_service: CurrencyService):
+        self.operation_repository = operation_repository
+        self.currency_service = currency_service
+
+    def _get_rates(self, currencies: list[str], dates: list[date]) -> dict[str, list[Optional[Decimal]]]:
+        """
+        Rates from each currency to GBP on each date (or the latest previous one), `None` if there is none.
+        Currencies without any rate are `None` on every date, so their positions are not valued instead of failing.
+        """
+        rates = {}
+        for currency in currencies:
+            try:
+                exchanges = self.currency_service.get_currency_exchanges(currency, TARGET_CURRENCY, dates)
+            except CurrencyExchangeNotFoundException:
+                rates[currency] = [None] * len(dates)
+                continue
+            rates[currency] = [exchanges.get(day) for day in dates]
+
+        return rates
+
+    @staticmethod
+    def _get_values(
+            quantities: list[Decimal],
+            last_operations: list[int],
+            operations: list[tuple[int, OperationDTO]],
+            rates: dict[str, list[Optional[Decimal]]]) -> list[Optional[Decimal]]:
+        """
+        Values in GBP of the quantities of a ticker held each day, at the price of the last operation up to the day,
+        in `Decimal` and rounded to the penny as the amounts exchanged for the profits. `None` if the quantity held has no rate.
+        Quantities and prices only change on operations and rates are repeated on days without one,
+        so each value is calculated once per last operation and rate.
+        """
+        unit = Decimal(1).scaleb(-VALUE_PLACES)
+        values_calculated: dict[tuple[int, Decimal], Decimal] = {}
+        values: list[Optional[Decimal]] = []
+        for day_index, (quantity, last_operation) in enumerate(zip(quantities, last_operations)):
+            operation = operations[last_operation][1]
+            rate = rates[operation.currency][day_index]
+            if not quantity:
+                values.append(Decimal(0))
+            elif rate is None:
+                values.append(None)
+            else:
+                key = (last_operation, rate)
+                if key not in values_calculated:
+                    values_calculated[key] = (quantity * operation.price_avg * rate).quantize(unit)
+                values.append(values_calculated[key])
+
+        return values
+
+    def get_position_history(
+            self,
+            account: Account,
+            date_start: Optional[datetime],
+            date_end: Optional[datetime],
+            frequency: str = 'daily',
+            valued: bool = False) -> PositionHistory:
+        """
+        Quantity held of each ticker at the end of each day (or of each 7 days with `weekly` frequency) between the dates.
+        Without `date_start` starts on the day of the first operation, and without `date_end` ends today.
+        With `valued` each quantity is also valued in GBP at the price of the last operation of the ticker up to that day,
+        exchanged at the rate of that day and rounded to the penny; values without a rate are `None`.
+        All the operations are loaded at once and the positions of all the tickers and days are looked up in their cumulative sum,
+        so the cost does not grow with a query or a loop per day (only the values are calculated per day, in `Decimal`).
+        Tickers never held in the period are not returned.
+        """
+        tickers = [
+            ticker
+            for ticker in self.operation_repository.get_account_tickers(account, date_end)
+            if not self.currency_service.is_currency_conversion(ticker)
+        ]
+        tickers_operations = self.operation_repository.get_account_operations(account, tickers, date_end)
+        operations = [
+            (index, operation)
+            for index, ticker in enumerate(tickers)
+            for operation in tickers_operations[ticker]
+        ]
+        if not operations:
+            return PositionHistory(dates=[], positions=[])
+
+        day_start = date_start.date().toordinal() if date_start else min(operation.date.date().toordinal() for _, operation in operations)
+        day_end = date_end.date().toordinal() if date_end else timezone.now().date().toordinal()
+        days = np.arange(day_start, day_end + 1, self.FREQUENCIES[frequency], dtype=np.int64)
+
+        keys = np.array([(index << TICKER_KEY_SHIFT) | operation.date.date().toordinal() for index, operation in operations], dtype=np.int64)
+        quantities = np.array(
+            [to_fixed(operation.quantity if operation.type == 'BUY' else -operation.quantity, QUANTITY_PLACES) for _, operation in operations],
+            dtype=np.int64)
+        quantities_cumulative = np.cumsum(quantities)
+
+        # First operation of each ticker, and quantity added up before it by the tickers before
+        ticker_indexes = np.arange(len(tickers), dtype=np.int64)
+        ticker_starts = np.searchsorted(keys, ticker_indexes << TICKER_KEY_SHIFT, side='left')
+        quantities_before = np.where(ticker_starts > 0, quantities_cumulative[ticker_starts - 1], 0)
+
+        # Last operation of each ticker up to each day, a row per ticker and a column per day
+        last_operations = np.searchsorted(keys, (ticker_indexes[:, None] << TICKER_KEY_SHIFT) | days[None, :], side='right') - 1
+        held = last_operations >= ticker_starts[:, None]
+        last_operations_valid = np.where(held, last_operations, 0)
+        positions = np.where(held, quantities_cumulative[last_operations_valid] - quantities_before[:, None], 0)
+
+        dates = [date.fromordinal(int(day)) for day in days]
+        rates = None
+        if valued:
+            rates = self._get_rates(sorted({operation.currency for _, operation in operations}), dates)
+
+        quantity_scales = self.operation_repository.get_quantity_scales(tickers)
+        positions_held: list[TickerPositionHistory] = []
+        for index in np.flatnonzero(positions.any(axis=1)).tolist():
+            quantities_held = _from_fixed_list(positions[index].tolist(), QUANTITY_PLACES)
+            values = self._get_values(quantities_held, last_operations_valid[index].tolist(), operations, rates) if rates is not None else None
+            # Valued before, as the prices are in the same units as the quantities loaded
+            scale = quantity_scales.get(tickers[index])
+            if scale is not None:
+                quantities_held = [quantity / scale for quantity in quantities_held]
+            positions_held.append(TickerPositionHistory(ticker=tickers[index], quantities=quantities_held, values=values))
+
+        return PositionHistory(dates=dates, positions=positions_held)
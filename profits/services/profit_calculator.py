@@ -1,12 +1,52 @@
+import itertools
 from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+
 from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.interfaces.dtos.profit_dto import ProfitDTO, ProfitExchangeDTO
+from profits.services.lot_ledger import LotLedger
 from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.vectorized_matcher import SellWithoutBuysError, match_fifo
+from profits.utils.fixed_point_utils import QUANTITY_PLACES, from_fixed, to_fixed_exact
+
+# Cumulative quantities are added up as 64 bits integers
+VECTORIZED_QUANTITY_MAX = 2 ** 63 - 1
 
 
 class ProfitCalculator():
-    def __init__(self, profit_exchanger: ProfitExchanger):
+    # Days after a SELL whose BUYs can be matched with it, so operations after the period reported have to be replayed too
+    lookahead_days = 0
+
+    def __init__(
+            self, 
+            profit_exchanger: ProfitExchanger, 
+            vectorized_threshold: Optional[int] = None, 
+            coalesce_lots: bool = False, 
+            preserve_lot_details: bool = False):
+        """
+        Tickers with at least `vectorized_threshold` operations are matched with the vectorized FIFO matcher.
+        With `coalesce_lots` BUYs of the same day, price and currency are merged into a single lot (see `LotLedger.add`).
+        With `preserve_lot_details` the lots are only merged to calculate totals, so the profit details keep a row per BUY operation.
+        """
         self.profit_exchanger = profit_exchanger
+        self.vectorized_threshold = vectorized_threshold
+        self.coalesce_lots = coalesce_lots
+        self.preserve_lot_details = preserve_lot_details
+
+    def _coalesce_details_lots(self) -> bool:
+        """
+        Whether lots are merged in replays whose open lots can end up in the profit details.
+        """
+        return self.coalesce_lots and not self.preserve_lot_details
+
+    def _plan_exchanges(self, ticker_operations: list[OperationDTO], lot_ledger: Optional[LotLedger], target_currency: str) -> None:
+        """
+        Resolves the rates of the operations and the lots already open before matching them.
+        """
+        open_lots_buys = [open_lot.buy for open_lot in lot_ledger.open_lots()] if lot_ledger is not None else []
+        self.profit_exchanger.plan_exchanges(itertools.chain(open_lots_buys, ticker_operations), target_currency)
 
     def _calculate_profit_match(self, sell_quantity_line: Decimal, sell: OperationDTO, buy: OperationDTO, target_currency: str) -> ProfitExchangeDTO:
         """
@@ -29,46 +69,187 @@ class ProfitCalculator():
 
         return self.profit_exchanger.exchange_currencies(profit_dto, target_currency)
                     
-    def _calculate_profits_sell(self, sell_operation: OperationDTO, buys: list[OperationDTO], target_currency: str) -> list[ProfitExchangeDTO]:
+    @staticmethod
+    def _consume_sell(sell_operation: OperationDTO, lot_ledger: LotLedger) -> list[tuple[OperationDTO, Decimal]]:
+        """
+        Consumes the quantity sold from the open lots, returning the BUYs matched and the quantity taken from each of them.
+        """
+        matches, quantity_sell = lot_ledger.consume(sell_operation.quantity)
+
+        if quantity_sell > 0:
+            raise ValueError(f'On date {sell_operation.date}, {quantity_sell} stocks left to sell without corresponding buys.')
+
+        return matches
+
+    def _calculate_profits_sell(self, sell_operation: OperationDTO, lot_ledger: LotLedger, target_currency: str) -> list[ProfitExchangeDTO]:
         """
         Calculate profits for a given SELL operation using the FIFO method.
         """
-        quantity_sell = sell_operation.quantity
-        profits_sell = []
+        matches = self._consume_sell(sell_operation, lot_ledger)
+
+        return [
+            self._calculate_profit_match(quantity_line_sell, sell_operation, buy, target_currency) 
+            for buy, quantity_line_sell in matches
+        ]
+    
+    def _match_vectorized(
+            self, 
+            ticker_operations: list[OperationDTO], 
+            lot_ledger: LotLedger,
+            coalesce: bool) -> Optional[list[tuple[OperationDTO, OperationDTO, Decimal]]]:
+        """
+        Finds the matches of the SELLs with `match_fifo`, which processes all the operations at once as arrays,
+        returning the SELL, the BUY and the quantity of each match, and leaving the lots still open in `lot_ledger`.
+        Returns `None` if quantities can not be represented as 64 bits fixed-point integers, so the scalar replay has to be used.
+        """
+        lots: list[tuple[OperationDTO, Decimal]] = [(open_lot.buy, open_lot.quantity) for open_lot in lot_ledger.open_lots()]
+        sells: list[OperationDTO] = []
+        sell_lots_available: list[int] = []
+        quantity_bought = sum((quantity for _, quantity in lots), Decimal(0))
+        quantity_sold = Decimal(0)
+        for operation in ticker_operations:
+            if operation.type == 'BUY':
+                # Same rule as `LotLedger.add`: lots are only merged while no SELL has consumed them.
+                # With FIFO the newest lot is untouched while the SELLs fit in the lots before it
+                if (coalesce and lots and lots[-1][1] == lots[-1][0].quantity and quantity_sold <= quantity_bought - lots[-1][1]
+                        and LotLedger.can_coalesce(lots[-1][0], operation)):
+                    lots[-1] = (LotLedger.coalesce_buys(lots[-1][0], operation), lots[-1][1] + operation.quantity)
+                else:
+                    lots.append((operation, operation.quantity))
+                quantity_bought += operation.quantity
+            elif operation.type == 'SELL':
+                sells.append(operation)
+                sell_lots_available.append(len(lots))
+                quantity_sold += operation.quantity
+            else:
+                raise ValueError(f"Unexpected operation type {operation.type}")
+
+        buy_quantities = [to_fixed_exact(quantity, QUANTITY_PLACES) for _, quantity in lots]
+        sell_quantities = [to_fixed_exact(sell.quantity, QUANTITY_PLACES) for sell in sells]
+        if None in buy_quantities or None in sell_quantities:
+            return None
+        if sum(buy_quantities) > VECTORIZED_QUANTITY_MAX or sum(sell_quantities) > VECTORIZED_QUANTITY_MAX:
+            return None
+
+        try:
+            matches = match_fifo(
+                np.array(buy_quantities, dtype=np.int64), 
+                np.array(sell_quantities, dtype=np.int64), 
+                np.array(sell_lots_available, dtype=np.int64))
+        except SellWithoutBuysError as e:
+            raise ValueError(
+                f'On date {sells[e.sell_index].date}, {from_fixed(e.quantity_left, QUANTITY_PLACES)} stocks left to sell without corresponding buys.') from e
+
+        lot_ledger.clear()
+        for (buy, _), quantity_open in zip(lots, matches.lots_open_quantities.tolist()):
+            if quantity_open > 0:
+                lot_ledger.add(buy, from_fixed(quantity_open, QUANTITY_PLACES))
 
-        while quantity_sell > 0 and buys:
-            current_buy = buys[0]
+        return [
+            (sells[sell_index], lots[buy_index][0], from_fixed(quantity, QUANTITY_PLACES))
+            for buy_index, sell_index, quantity in zip(matches.buy_indexes.tolist(), matches.sell_indexes.tolist(), matches.quantities.tolist())
+        ]
 
-            if current_buy.quantity > quantity_sell:
-                # Can use the buy to offset all sold
-                quantity_line_sell = quantity_sell
-                current_buy.quantity -= quantity_line_sell
-                quantity_sell = Decimal(0)
+    def _is_vectorized(self, ticker_operations: list[OperationDTO]) -> bool:
+        return self.vectorized_threshold is not None and len(ticker_operations) >= self.vectorized_threshold
+
+    def _exchange_profit_match(self, sell_quantity_line: Decimal, sell: OperationDTO, buy: OperationDTO, target_currency: str) -> Decimal:
+        """
+        Profit exchanged of a match between a SELL and a BUY operation, without creating its DTO.
+        """
+        return self.profit_exchanger.exchange_profit(
+            sell_quantity_line * buy.price_avg, buy.currency, buy.date,
+            sell_quantity_line * sell.price_avg, sell.currency, sell.date,
+            target_currency)
+
+    def replay_ticker_operations(self, ticker_operations: list[OperationDTO], lot_ledger: LotLedger) -> None:
+        """
+        Replays the operations only to update the open lots in `lot_ledger`, without calculating the profits of the SELLs.
+        Used for the operations before the period reported, as no DTOs are created and no exchange rates are needed.
+        """
+        coalesce = self._coalesce_details_lots()
+        for operation in ticker_operations:
+            if operation.type == 'BUY':
+                lot_ledger.add(operation, coalesce=coalesce)
+            elif operation.type == 'SELL':
+                self._consume_sell(operation, lot_ledger)
             else:
-                # Only part of the buy can be used for the sell
-                quantity_line_sell = current_buy.quantity
-                quantity_sell -= quantity_line_sell
-                buys.pop(0)
+                raise ValueError(f"Unexpected operation type {operation.type}")
 
-            profit_dto= self._calculate_profit_match(quantity_line_sell, sell_operation, current_buy, target_currency)
-            profits_sell.append(profit_dto)
+    def calculate_ticker_profits(
+            self, 
+            ticker_operations: list[OperationDTO], 
+            target_currency: str =  "GBP", 
+            lot_ledger: Optional[LotLedger] = None) -> list[ProfitExchangeDTO]:
+        """
+        Replays the operations of a ticker matching SELLs with previous BUYs using the FIFO method.
+        If a `lot_ledger` is given the replay starts from its open lots, and after the replay it holds the lots still open.
+        """
+        if lot_ledger is None:
+            lot_ledger = LotLedger()
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
 
-        if quantity_sell > 0:
-            raise ValueError(f'On date {sell_operation.date}, {quantity_sell} stocks left to sell without corresponding buys.')
+        if self._is_vectorized(ticker_operations):
+            matches = self._match_vectorized(ticker_operations, lot_ledger, self._coalesce_details_lots())
+            if matches is not None:
+                return [self._calculate_profit_match(quantity, sell, buy, target_currency) for sell, buy, quantity in matches]
 
-        return profits_sell
-    
-    def calculate_ticker_profits(self, ticker_operations: list[OperationDTO], target_currency: str =  "GBP") -> list[ProfitExchangeDTO]:
-        buys: list[OperationDTO] = []
         profits: list[ProfitExchangeDTO] = []
-        
+        coalesce = self._coalesce_details_lots()
+
         for operation in ticker_operations:
             if operation.type == 'BUY':
-                buys.append(operation)
+                lot_ledger.add(operation, coalesce=coalesce)
             elif operation.type == 'SELL':
-                profits_sell= self._calculate_profits_sell(operation, buys, target_currency)
+                profits_sell= self._calculate_profits_sell(operation, lot_ledger, target_currency)
                 profits.extend(profits_sell)
             else:
                 raise ValueError(f"Unexpected operation type {operation.type}")
 
-        return profits    
\ No newline at end of file
+        return profits
+
+    def calculate_ticker_profit_total(
+            self, 
+            ticker_operations: list[OperationDTO], 
+            target_currency: str = "GBP", 
+            lot_ledger: Optional[LotLedger] = None) -> Decimal:
+        """
+        Same replay as `calculate_ticker_profits` but only adding up the profits exchanged as matches are found,
+        without creating a DTO per match, so memory does not depend on the number of matches.
+        Tickers with at least `vectorized_threshold` operations are matched with the vectorized FIFO matcher too.
+        """
+        if lot_ledger is None:
+            lot_ledger = LotLedger()
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+
+        if self._is_vectorized(ticker_operations):
+            matches = self._match_vectorized(ticker_operations, lot_ledger, self.coalesce_lots)
+            if matches is not None:
+                return sum(
+                    (self._exchange_profit_match(quantity, sell, buy, target_currency) for sell, buy, quantity in matches), 
+                    Decimal(0))
+
+        profit_total = Decimal(0)
+
+        for operation in ticker_operations:
+            if operation.type == 'BUY':
+                lot_ledger.add(operation, coalesce=self.coalesce_lots)
+            elif operation.type == 'SELL':
+                for buy, quantity_line_sell in self._consume_sell(operation, lot_ledger):
+                    profit_total += self._exchange_profit_match(quantity_line_sell, operation, buy, target_currency)
+            else:
+                raise ValueError(f"Unexpected operation type {operation.type}")
+
+        return profit_total
+
+    def calculate_cost_basis(self, lot_ledger: LotLedger, target_currency: str = "GBP") -> Decimal:
+        """
+        Cost of the lots open in `lot_ledger`, each exchanged at the rate of the date it was bought.
+        After a replay of the ticker its rates are already planned, as the BUYs of the lots left open were replayed or open before it.
+        """
+        return sum(
+            (
+                open_lot.quantity * open_lot.buy.price_avg * self.profit_exchanger.get_exchange(open_lot.buy.currency, target_currency, open_lot.buy.date)
+                for open_lot in lot_ledger.open_lots()
+            ), 
+            Decimal(0))
@@ -1,21 +1,68 @@
-import dataclasses
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+
 from profits.interfaces.dtos.profit_dto import ProfitDTO, ProfitExchangeDTO
 from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import CurrencyExchangeNotFoundException
 
 
 class ProfitExchanger:
     def __init__(self, currency_service: CurrencyService):
         self.currency_service = currency_service
+        # Rates resolved by `plan_exchanges` by (currency, target currency, date)
+        self.exchanges_planned: dict[tuple[str, str, date], Decimal] = {}
+
+    def plan_exchanges(self, operations: Iterable[OperationDTO], target_currency: str) -> None:
+        """
+        Resolves up front, with one lookup per currency, the rates of all the distinct (currency, date) of the operations,
+        so matching a BUY with many SELLs does not look up its rate once per match.
+        Replaces the rates planned for previous operations.
+        """
+        currencies_dates: dict[str, set[date]] = defaultdict(set)
+        for operation in operations:
+            currencies_dates[operation.currency].add(operation.date.date())
+
+        self.exchanges_planned = {}
+        for currency, dates in currencies_dates.items():
+            try:
+                exchanges = self.currency_service.get_currency_exchanges(currency, target_currency, dates)
+            except CurrencyExchangeNotFoundException:
+                # Only an error if a match needs the rate, then raised by `get_exchange`
+                continue
+            for date_exchange, exchange in exchanges.items():
+                self.exchanges_planned[(currency, target_currency, date_exchange)] = exchange
+
+    def get_exchange(self, origin_currency: str, target_currency: str, date_exchange: datetime) -> Decimal:
+        """
+        Rate planned by `plan_exchanges`, or from the currency service if it was not planned.
+        """
+        exchange = self.exchanges_planned.get((origin_currency, target_currency, date_exchange.date()))
+        if exchange is None:
+            exchange = self.currency_service.get_currency_exchange(origin_currency, target_currency, date_exchange)
+
+        return exchange
 
     def exchange_currencies(self, profit_dto: ProfitDTO, target_currency: str) -> ProfitExchangeDTO:
-        buy_exchange= self.currency_service.get_currency_exchange(profit_dto.buy_currency, target_currency, profit_dto.buy_date)
+        buy_exchange= self.get_exchange(profit_dto.buy_currency, target_currency, profit_dto.buy_date)
         buy_amount_total_exchange = profit_dto.buy_amount_total * buy_exchange
 
-        sell_exchange= self.currency_service.get_currency_exchange(profit_dto.sell_currency, target_currency, profit_dto.sell_date)
+        sell_exchange= self.get_exchange(profit_dto.sell_currency, target_currency, profit_dto.sell_date)
         sell_amount_total_exchange = profit_dto.sell_amount_total * sell_exchange
         
+        # Fields copied one by one, `dataclasses.asdict` would deep copy them through an intermediate dictionary
         profit_exchange_dto= ProfitExchangeDTO(
-            **dataclasses.asdict(profit_dto),
+            buy_date= profit_dto.buy_date,
+            buy_amount_total= profit_dto.buy_amount_total,
+            buy_currency= profit_dto.buy_currency,
+            sell_date= profit_dto.sell_date,
+            sell_quantity= profit_dto.sell_quantity,
+            sell_amount_total= profit_dto.sell_amount_total,
+            sell_currency= profit_dto.sell_currency,
+            profit= profit_dto.profit,
             currency_exchange=target_currency,
             buy_exchange= buy_exchange,
             buy_amount_total_exchange= buy_amount_total_exchange,
@@ -24,4 +71,21 @@ class ProfitExchanger:
             profit_exchange = sell_amount_total_exchange - buy_amount_total_exchange
         )
 
-        return profit_exchange_dto
\ No newline at end of file
+        return profit_exchange_dto
+
+    def exchange_profit(
+            self,
+            buy_amount_total: Decimal,
+            buy_currency: str,
+            buy_date: datetime,
+            sell_amount_total: Decimal,
+            sell_currency: str,
+            sell_date: datetime,
+            target_currency: str) -> Decimal:
+        """
+        Same calculation as `exchange_currencies` but only returning the profit exchanged, so no DTOs are created.
+        """
+        buy_exchange= self.get_exchange(buy_currency, target_currency, buy_date)
+        sell_exchange= self.get_exchange(sell_currency, target_currency, sell_date)
+
+        return sell_amount_total * sell_exchange - buy_amount_total * buy_exchange
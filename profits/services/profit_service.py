@@ -1,72 +1,691 @@
-from datetime import datetime
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Optional, TypedDict
+from typing import AsyncIterator, Callable, Iterable, Iterator, NamedTuple, Optional, TypedDict
+
+from asgiref.sync import sync_to_async
+from django.db import connections
 
 from profits.models import Account
+from profits.repositories.open_lot_cache_repository import OpenLotCacheRepository
 from profits.repositories.operation_repository import OperationRepository
 from profits.services.currency_service import CurrencyService
+from profits.services.lot_checkpoint_service import LotCheckpointService
+from profits.services.lot_ledger import LotLedger
 from profits.services.profit_calculator import ProfitCalculator
+from profits.interfaces.dtos.lot_checkpoint_dto import LotCheckpointDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
-from profits.services.exceptions import ProfitServiceBuySellMissmatch
+from profits.services.exceptions import ProfitServiceBuySellMissmatch, ProfitServiceInvalidOperations, ServiceException
+from profits.utils import datetime_utils
 
 import logging
 logger = logging.getLogger('profits.services')
 
+TARGET_CURRENCY = 'GBP'
+
 class ProfitDetails(TypedDict):
     ticker: str
     profit_details: list[ProfitExchangeDTO]
 
+class PeriodTotal(TypedDict):
+    date_start: datetime
+    date_end: datetime
+    profit_total: Decimal
+
+class AccountTotal(TypedDict):
+    id: int
+    profit_total: Optional[Decimal]
+    error: Optional[str]
+
+class Position(TypedDict):
+    ticker: str
+    quantity: Decimal
+    average_cost: Decimal
+    cost_basis: Decimal
+
+class TotalPositions(TypedDict):
+    profit_total: Decimal
+    positions: list[Position]
+
+class TickerReplay(NamedTuple):
+    # Lots open before the period and operations in the period
+    lot_ledger: LotLedger
+    operations: list[OperationDTO]
+    # If set, profits of SELLs out of these dates are not reported, as operations out of the period are replayed
+    sells_date_start: Optional[datetime] = None
+    sells_date_end: Optional[datetime] = None
+
+def _profits_sold_in_period(profits: list[ProfitExchangeDTO], ticker_replay: TickerReplay) -> list[ProfitExchangeDTO]:
+    if ticker_replay.sells_date_start is None and ticker_replay.sells_date_end is None:
+        return profits
+
+    return [
+        profit for profit in profits
+        if (ticker_replay.sells_date_start is None or profit.sell_date >= ticker_replay.sells_date_start)
+        and (ticker_replay.sells_date_end is None or profit.sell_date <= ticker_replay.sells_date_end)
+    ]
+
+# Calculator used by the processes of the pool in `ProfitService.get_total_details` parallel mode
+_worker_profit_calculator: Optional[ProfitCalculator] = None
+
+def _init_worker(profit_calculator: ProfitCalculator) -> None:
+    global _worker_profit_calculator
+    _worker_profit_calculator = profit_calculator
+
+def _calculate_ticker_profits_worker(ticker_replay: TickerReplay) -> list[ProfitExchangeDTO]:
+    assert _worker_profit_calculator is not None
+    profits = _worker_profit_calculator.calculate_ticker_profits(ticker_replay.operations, TARGET_CURRENCY, ticker_replay.lot_ledger)
+    return _profits_sold_in_period(profits, ticker_replay)
+
 class ProfitService:
     def __init__(
             self, 
             operation_repository: OperationRepository, 
             currency_service: CurrencyService,
-            profit_calculator: ProfitCalculator):
+            profit_calculator: ProfitCalculator,
+            max_workers: Optional[int] = None,
+            lot_checkpoint_service: Optional[LotCheckpointService] = None,
+            load_open_lots_only: bool = False,
+            open_lot_cache_repository: Optional[OpenLotCacheRepository] = None,
+            pipeline_chunk_size: Optional[int] = None,
+            pipeline_prefetch_chunks: int = 2):
+        """
+        If `max_workers` is given, `get_total_details` calculates the tickers in parallel using a pool of that number of processes.
+        If `lot_checkpoint_service` is given, the replay of the operations before the period resumes from the latest checkpoint
+        and saves new checkpoints for the boundaries it goes through.
+        If `load_open_lots_only`, instead of the operations before the period only the lots open at its start are loaded,
+        calculated by the database, so checkpoints are not used.
+        Sells before the period without corresponding buys are then only detected in total, not for each sell.
+        If `open_lot_cache_repository` is given, the lots open after all the operations of a ticker are cached for the simulations.
+        If `pipeline_chunk_size` is given, `get_total_details` loads the operations in chunks of that number of tickers 
+        in a background thread, up to `pipeline_prefetch_chunks` chunks ahead of the one being calculated.
+        """
         self.operation_repository = operation_repository
         self.currency_service = currency_service        
         self.profit_calculator = profit_calculator        
+        self.max_workers = max_workers
+        self.lot_checkpoint_service = lot_checkpoint_service
+        self.load_open_lots_only = load_open_lots_only
+        self.open_lot_cache_repository = open_lot_cache_repository
+        self.pipeline_chunk_size = pipeline_chunk_size
+        self.pipeline_prefetch_chunks = pipeline_prefetch_chunks
 
-    def get_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
-        amount_total = Decimal(0)
+    def _get_tickers_sold(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[str]:
+        """
+        Tickers sold in the period. Currency conversions are not stocks so are excluded.
+        """
         account_tickers_sold = self.operation_repository.get_account_tickers_sold_period(account, date_start, date_end)
-        for ticker_sold in account_tickers_sold:
-            if self.currency_service.is_currency_conversion(ticker_sold):
-                continue
+        return [
+            ticker_sold for ticker_sold in account_tickers_sold 
+            if not self.currency_service.is_currency_conversion(ticker_sold)
+        ]
+
+    def _get_tickers_sold_operations(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> dict[str, TickerReplay]:
+        """
+        Loads, with a fixed number of queries, the operations of the tickers sold in the period,
+        and replays the ones before the period so only the operations in the period are left to calculate.
+        """
+        return self._get_tickers_operations(account, self._get_tickers_sold(account, date_start, date_end), date_start, date_end)
+
+    def _get_tickers_operations(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> dict[str, TickerReplay]:
+        """
+        Same as `_get_tickers_sold_operations` for the given tickers.
+        """
+        return self._load_tickers_operations(account, tickers, date_start, date_end)()
+
+    def _load_tickers_operations(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> Callable[[], dict[str, TickerReplay]]:
+        """
+        Queries the operations of the tickers, returning the function that replays the ones before the period,
+        so the loading and the replay can run in different threads.
+        """
+        if self.profit_calculator.lookahead_days:
+            tickers_replay = self._get_tickers_operations_lookahead(account, tickers, date_start, date_end)
+            return lambda: tickers_replay
+
+        if date_start and self.load_open_lots_only:
+            try:
+                tickers_operations_open = self.operation_repository.get_account_operations_open_at(
+                    account, tickers, date_start, date_end)
+            except ValueError as e:
+                logger.exception(f'Error loading lots open at {date_start}')
+                raise ProfitServiceBuySellMissmatch(str(e)) from e
+            return lambda: {
+                ticker: TickerReplay(LotLedger(open_lots), operations_period) 
+                for ticker, (open_lots, operations_period) in tickers_operations_open.items()
+            }
+
+        checkpoints: dict[str, LotCheckpointDTO] = {}
+        if date_start and self.lot_checkpoint_service:
+            checkpoints = self.lot_checkpoint_service.get_checkpoints(account, tickers, date_start)
+
+        tickers_operations = self.operation_repository.get_account_operations(
+            account, tickers, date_end, {ticker: checkpoint.date for ticker, checkpoint in checkpoints.items()})
 
-            ticker_operations= self.operation_repository.get_account_ticker_operations(account, ticker_sold, date_end)
+        return lambda: self._replay_tickers_before_period(account, tickers_operations, date_start, checkpoints)
 
+    def _iter_tickers_operations_pipelined(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> Iterator[dict[str, TickerReplay]]:
+        """
+        Yields the replays of the tickers in chunks of `pipeline_chunk_size` tickers, in the same order as the tickers.
+        A background thread queries the operations of the next chunks while the caller calculates the current one, 
+        so the time waiting for the database overlaps with the calculation. The replay before the period runs in the caller's thread.
+        The queue holds up to `pipeline_prefetch_chunks` chunks loaded, so memory is bounded if the calculation is slower.
+        """
+        assert self.pipeline_chunk_size
+        chunks = [tickers[index:index + self.pipeline_chunk_size] for index in range(0, len(tickers), self.pipeline_chunk_size)]
+        chunks_loaded: queue.Queue = queue.Queue(maxsize=self.pipeline_prefetch_chunks)
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            # Waits for room in the queue unless the caller stopped iterating
+            while not stopped.is_set():
+                try:
+                    chunks_loaded.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def load_chunks() -> None:
             try:
-                ticker_profits = self.profit_calculator.calculate_ticker_profits(ticker_operations)
+                for chunk in chunks:
+                    if not put(self._load_tickers_operations(account, chunk, date_start, date_end)):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                # Connections are per thread, so the one opened by this thread would not be closed otherwise
+                connections.close_all()
+
+        loader = threading.Thread(target=load_chunks, name='profits-operations-prefetch', daemon=True)
+        loader.start()
+        try:
+            for _ in chunks:
+                item = chunks_loaded.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item()
+        finally:
+            stopped.set()
+            loader.join()
+
+    def _get_tickers_operations_lookahead(
+            self, 
+            account: Account, 
+            tickers: list[str], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> dict[str, TickerReplay]:
+        """
+        For calculators matching SELLs with later BUYs: SELLs before the period can take BUYs of the period and SELLs of the period
+        BUYs after it, so all the operations up to `lookahead_days` after the period are replayed and only the period SELLs reported.
+        """
+        date_end_loaded = date_end + timedelta(days=self.profit_calculator.lookahead_days) if date_end else None
+        tickers_operations = self.operation_repository.get_account_operations(account, tickers, date_end_loaded)
+
+        return {
+            ticker: TickerReplay(LotLedger(), ticker_operations, date_start, date_end) 
+            for ticker, ticker_operations in tickers_operations.items()
+        }
+
+    def _replay_tickers_before_period(
+            self, 
+            account: Account, 
+            tickers_operations: dict[str, list[OperationDTO]], 
+            date_start: Optional[datetime], 
+            checkpoints: dict[str, LotCheckpointDTO]) -> dict[str, TickerReplay]:
+        """
+        Replays for each ticker the operations before the period, resuming from its checkpoint if any.
+        """
+        tickers_replay: dict[str, TickerReplay] = {}
+        for ticker, ticker_operations in tickers_operations.items():
+            checkpoint = checkpoints.get(ticker)
+            lot_ledger = LotLedger(checkpoint.open_lots if checkpoint else None)
+            try:
+                operations_period = self._replay_before_period(account, ticker, ticker_operations, lot_ledger, date_start, checkpoint)
             except ValueError as e:
-                logger.exception(f'Error calculating profits for ticker {ticker_sold}')
-                raise ProfitServiceBuySellMissmatch(f'For ticker {ticker_sold} there is error: {e}') from e
-            
-            amount_total += sum(ticker_profit.profit_exchange for ticker_profit in ticker_profits)
+                raise self._ticker_error(ticker, e) from e
+            tickers_replay[ticker] = TickerReplay(lot_ledger, operations_period)
+
+        return tickers_replay
+
+    def _replay_before_period(
+            self, 
+            account: Account,
+            ticker: str,
+            ticker_operations: list[OperationDTO], 
+            lot_ledger: LotLedger, 
+            date_start: Optional[datetime],
+            checkpoint: Optional[LotCheckpointDTO]) -> list[OperationDTO]:
+        """
+        Replays in `lot_ledger` the operations before `date_start`, which are needed for FIFO but whose profits are not reported.
+        Saves a checkpoint for each boundary after the one of `checkpoint` that the replay goes through.
+        Returns the operations in the period.
+        """
+        if date_start is None:
+            return ticker_operations
+
+        index_start = bisect.bisect_left(ticker_operations, date_start, key=lambda operation: operation.date)
+        operations_before = ticker_operations[:index_start]
+
+        if self.lot_checkpoint_service and operations_before:
+            date_from = checkpoint.date if checkpoint else operations_before[0].date
+            checkpoints = []
+            index = 0
+            for boundary in self.lot_checkpoint_service.get_boundaries(date_from, date_start):
+                index_boundary = bisect.bisect_left(operations_before, boundary, lo=index, key=lambda operation: operation.date)
+                self.profit_calculator.replay_ticker_operations(operations_before[index:index_boundary], lot_ledger)
+                checkpoints.append(LotCheckpointDTO(date=boundary, open_lots=lot_ledger.open_lots()))
+                index = index_boundary
+            operations_replayed = operations_before[:index]
+            if checkpoints:
+                self.lot_checkpoint_service.save_checkpoints(
+                    account, ticker, checkpoints, 
+                    lambda: self._is_replay_current(account, ticker, checkpoint, operations_replayed, checkpoints[-1].date))
+            operations_before = operations_before[index:]
+
+        if operations_before:
+            self.profit_calculator.replay_ticker_operations(operations_before, lot_ledger)
+
+        return ticker_operations[index_start:]
+
+    def _is_replay_current(
+            self, 
+            account: Account, 
+            ticker: str, 
+            checkpoint: Optional[LotCheckpointDTO], 
+            operations_replayed: list[OperationDTO], 
+            date_to: datetime) -> bool:
+        """
+        Whether the checkpoint the replay resumed from is still saved, and the operations replayed from it up to `date_to` 
+        are still the ones of the ticker. Operations changed before it would have deleted the checkpoint.
+        """
+        assert self.lot_checkpoint_service
+        if checkpoint is not None and self.lot_checkpoint_service.get_checkpoints(account, [ticker], checkpoint.date).get(ticker) != checkpoint:
+            return False
+
+        ticker_operations = self.operation_repository.get_account_operations(
+            account, [ticker], date_to, {ticker: checkpoint.date} if checkpoint else None)[ticker]
+        return [operation for operation in ticker_operations if operation.date < date_to] == operations_replayed
+
+    def _calculate_ticker_profits(self, ticker: str, ticker_replay: TickerReplay) -> list[ProfitExchangeDTO]:
+        try:
+            profits = self.profit_calculator.calculate_ticker_profits(ticker_replay.operations, TARGET_CURRENCY, ticker_replay.lot_ledger)
+        except ValueError as e:
+            raise self._ticker_error(ticker, e) from e
+
+        return _profits_sold_in_period(profits, ticker_replay)
+
+    @staticmethod
+    def _profits_in_shares(profits: list[ProfitExchangeDTO], scale: Optional[Decimal]) -> list[ProfitExchangeDTO]:
+        """
+        Profits with the quantity sold in shares, for tickers loaded in fractions of share (see `OperationRepository.get_quantity_scales`).
+        """
+        if scale is None:
+            return profits
+
+        return [replace(profit, sell_quantity=profit.sell_quantity / scale) for profit in profits]
+
+    @staticmethod
+    def _ticker_error(ticker: str, error: ValueError) -> ProfitServiceBuySellMissmatch:
+        logger.exception(f'Error calculating profits for ticker {ticker}')
+        return ProfitServiceBuySellMissmatch(f'For ticker {ticker} there is error: {error}')
+
+    @contextmanager
+    def _tickers_profits_pool(self, tickers_count: int, get_currencies: Callable[[], Iterable[str]]) -> Iterator[Optional[ProcessPoolExecutor]]:
+        """
+        Pool of processes to calculate the tickers in parallel, `None` without `max_workers` or for a single ticker.
+        The processes do not access the database, so the exchange rates of the currencies are loaded before they are started
+        and shipped with the calculator. They are started when the pool is created, so a pool created once per request,
+        before the thread loading the operations, does not fork the process while that thread holds locks.
+        If the caller stops iterating the profits early, the tickers still pending are cancelled instead of waited for.
+        """
+        if not self.max_workers or tickers_count <= 1:
+            yield None
+            return
+
+        self.currency_service.load_exchanges(get_currencies(), TARGET_CURRENCY)
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.profit_calculator,))
+        try:
+            # With the fork start method the first task starts all the processes
+            executor.submit(int).result()
+            yield executor
+        except GeneratorExit:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            # No-op if already shut down
+            executor.shutdown()
+
+    @staticmethod
+    def _get_tickers_replay_currencies(tickers_replay: dict[str, TickerReplay]) -> set[str]:
+        return {
+            operation.currency 
+            for ticker_replay in tickers_replay.values() 
+            for operation in [*ticker_replay.operations, *(open_lot.buy for open_lot in ticker_replay.lot_ledger.open_lots())]
+        }
+
+    def _iter_tickers_profits_parallel(self, tickers_replay: dict[str, TickerReplay], executor: ProcessPoolExecutor) -> Iterator[list[ProfitExchangeDTO]]:
+        """
+        Calculates the profits of each ticker in the pool of processes, yielding them in the same order as the tickers.
+        Operations are already loaded and replayed up to the period, and the rates shipped with the calculator when the pool was created.
+        """
+        tickers = list(tickers_replay.keys())
+        results = executor.map(_calculate_ticker_profits_worker, tickers_replay.values())
+        for ticker in tickers:
+            try:
+                ticker_profits = next(results)
+            except ValueError as e:
+                raise self._ticker_error(ticker, e) from e
+            yield ticker_profits
+
+    def _calculate_tickers_total(self, tickers_replay: dict[str, TickerReplay]) -> Decimal:
+        amount_total = Decimal(0)
+        for ticker_sold, ticker_replay in tickers_replay.items():
+            if ticker_replay.sells_date_start or ticker_replay.sells_date_end:
+                amount_total += sum((profit.profit_exchange for profit in self._calculate_ticker_profits(ticker_sold, ticker_replay)), Decimal(0))
+                continue
+            try:
+                amount_total += self.profit_calculator.calculate_ticker_profit_total(
+                    ticker_replay.operations, TARGET_CURRENCY, ticker_replay.lot_ledger)
+            except ValueError as e:
+                raise self._ticker_error(ticker_sold, e) from e
 
         return amount_total
 
-    def get_total_details(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[ProfitDetails]:        
-        account_tickers_sold = self.operation_repository.get_account_tickers_sold_period(account, date_start, date_end)
-        tickers_profit = []
-        for ticker_sold in account_tickers_sold:
-            if self.currency_service.is_currency_conversion(ticker_sold):
+    def get_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
+        tickers_replay = self._get_tickers_sold_operations(account, date_start, date_end)
+        return self._calculate_tickers_total(tickers_replay)
+
+    async def _aget_tickers_sold_operations(
+            self, 
+            account: Account, 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> dict[str, TickerReplay]:
+        """
+        Async version of `_get_tickers_sold_operations`: operations and their rates are loaded with the async ORM, 
+        and the replay before the period, which only uses the CPU, runs in a thread.
+        Checkpoints and lots open at the start of the period are loaded, in a thread, with the synchronous path.
+        """
+        if self.lot_checkpoint_service or (date_start and self.load_open_lots_only):
+            return await sync_to_async(self._get_tickers_sold_operations)(account, date_start, date_end)
+
+        tickers = [
+            ticker_sold for ticker_sold in await self.operation_repository.aget_account_tickers_sold_period(account, date_start, date_end)
+            if not self.currency_service.is_currency_conversion(ticker_sold)
+        ]
+        lookahead_days = self.profit_calculator.lookahead_days
+        date_end_loaded = date_end + timedelta(days=lookahead_days) if lookahead_days and date_end else date_end
+        tickers_operations = await self.operation_repository.aget_account_operations(account, tickers, date_end_loaded)
+        await self.currency_service.aload_exchanges(
+            {operation.currency for ticker_operations in tickers_operations.values() for operation in ticker_operations}, TARGET_CURRENCY)
+
+        if lookahead_days:
+            return {
+                ticker: TickerReplay(LotLedger(), ticker_operations, date_start, date_end) 
+                for ticker, ticker_operations in tickers_operations.items()
+            }
+        return await sync_to_async(self._replay_tickers_before_period)(account, tickers_operations, date_start, {})
+
+    async def aget_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
+        """
+        Async version of `get_total`, so the request does not hold a worker while waiting for the database.
+        """
+        tickers_replay = await self._aget_tickers_sold_operations(account, date_start, date_end)
+        return await sync_to_async(self._calculate_tickers_total)(tickers_replay)
+
+    def get_total_positions(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> TotalPositions:
+        """
+        Profit total in the period and positions open at `date_end`, with their cost basis in the target currency.
+        The positions are the lots left open by the same replay that calculates the total, so all the tickers held are replayed
+        (tickers not sold in the period add nothing to the total) and the rates planned for the replay are used for the cost basis.
+        """
+        tickers = [
+            ticker for ticker in self.operation_repository.get_account_tickers(account, date_end) 
+            if not self.currency_service.is_currency_conversion(ticker)
+        ]
+        tickers_replay = self._get_tickers_operations(account, tickers, date_start, date_end)
+
+        quantity_scales = self.operation_repository.get_quantity_scales(tickers)
+
+        profit_total = Decimal(0)
+        positions: list[Position] = []
+        for ticker, ticker_replay in tickers_replay.items():
+            profit_total += self._calculate_tickers_total({ticker: ticker_replay})
+            quantity = ticker_replay.lot_ledger.quantity / quantity_scales.get(ticker, Decimal(1))
+            if quantity == 0:
                 continue
 
-            ticker_operations= self.operation_repository.get_account_ticker_operations(account, ticker_sold, date_end)
+            cost_basis = self.profit_calculator.calculate_cost_basis(ticker_replay.lot_ledger, TARGET_CURRENCY)
+            positions.append({
+                'ticker': ticker,
+                'quantity': quantity,
+                'average_cost': cost_basis / quantity,
+                'cost_basis': cost_basis
+            })
+
+        return {
+            'profit_total': profit_total,
+            'positions': positions
+        }
+
+    def _get_open_lots_after_operations(self, account: Account, ticker: str) -> LotCheckpointDTO:
+        """
+        Lots open after all the operations of the ticker, dated as its last operation.
+        They are replayed the first time they are needed and then read from the cache, until an operation of the ticker changes.
+        """
+        operations_stamp = ''
+        if self.open_lot_cache_repository:
+            # Before loading the operations, so operations changed afterwards change the stamp of the lots cached
+            operations_stamp = self.operation_repository.get_operations_stamps(account.id, [(ticker, None)])[0]   # type: ignore
+            open_lots = self.open_lot_cache_repository.get_open_lots(account.id, ticker, operations_stamp)   # type: ignore
+            if open_lots is not None:
+                return open_lots
+
+        ticker_operations = self.operation_repository.get_account_ticker_operations(account, ticker, None)
+        lot_ledger = LotLedger()
+        try:
+            self.profit_calculator.replay_ticker_operations(ticker_operations, lot_ledger)
+        except ValueError as e:
+            raise self._ticker_error(ticker, e) from e
+
+        open_lots = LotCheckpointDTO(
+            date=ticker_operations[-1].date if ticker_operations else datetime.min.replace(tzinfo=timezone.utc), 
+            open_lots=lot_ledger.open_lots())
+        if self.open_lot_cache_repository:
+            self.open_lot_cache_repository.set_open_lots(account.id, ticker, operations_stamp, open_lots)   # type: ignore
+
+        return open_lots
 
+    def simulate_ticker_operations(self, account: Account, ticker: str, operations: list[OperationDTO]) -> list[ProfitExchangeDTO]:
+        """
+        Profits of hypothetical operations of the ticker done after all its operations, without saving them.
+        Only the hypothetical operations are matched, from the lots left open by the operations saved.
+        Raises `ProfitServiceInvalidOperations` if any of them is not after the last operation saved.
+        """
+        open_lots = self._get_open_lots_after_operations(account, ticker)
+
+        operations = sorted(operations, key=lambda operation: (operation.date, operation.type))
+        if operations and operations[0].date <= open_lots.date:
+            raise ProfitServiceInvalidOperations(f'Operations to simulate must be after the last operation of {ticker}, on {open_lots.date}.')
+
+        # Open lots are in the units of the operations loaded, so the operations to simulate are converted to them
+        scale = self.operation_repository.get_quantity_scales([ticker]).get(ticker)
+        if scale is not None:
+            operations = [replace(operation, quantity=operation.quantity * scale, price_avg=operation.price_avg / scale) for operation in operations]
+
+        return self._profits_in_shares(self._calculate_ticker_profits(ticker, TickerReplay(LotLedger(open_lots.open_lots), operations)), scale)
+
+    def get_accounts_totals(self, accounts: list[Account], date_start: Optional[datetime], date_end: Optional[datetime]) -> list[AccountTotal]:
+        """
+        Profit totals of several accounts in the same period. 
+        Operations of all the accounts are loaded with a single query and the exchange rates loaded are shared,
+        so per account there is only the replay of its operations.
+        An error calculating an account is returned in its total, not raised, so the other accounts are still calculated.
+        """
+        accounts_total: dict[int, AccountTotal] = {
+            account.id: {'id': account.id, 'profit_total': Decimal(0), 'error': None}   # type: ignore
+            for account in accounts
+        }
+        accounts_by_id = {account.id: account for account in accounts}   # type: ignore
+
+        def set_account_total(account_id: int, get_tickers_replay: Callable[[], dict[str, TickerReplay]]) -> None:
             try:
-                ticker_profits = self.profit_calculator.calculate_ticker_profits(ticker_operations)
-            except ValueError as e:
-                logger.exception(f'Error calculating profits for ticker {ticker_sold}')
-                raise ProfitServiceBuySellMissmatch(f'For ticker {ticker_sold} there is error: {e}') from e
+                accounts_total[account_id]['profit_total'] = self._calculate_tickers_total(get_tickers_replay())
+            except ServiceException as e:
+                logger.exception(f'Error calculating total for account {account_id}')
+                accounts_total[account_id]['profit_total'] = None
+                accounts_total[account_id]['error'] = str(e)
+
+        if self.profit_calculator.lookahead_days:
+            # Operations after the period are needed too, so each account is loaded on its own
+            for account in accounts:
+                set_account_total(account.id, lambda: self._get_tickers_sold_operations(account, date_start, date_end))   # type: ignore
+            return list(accounts_total.values())
 
-            tickers_profit.append(
-                {
+        for account_id, tickers_operations in self.operation_repository.get_accounts_sold_operations(accounts, date_start, date_end):
+            tickers_operations = {
+                ticker: ticker_operations for ticker, ticker_operations in tickers_operations.items()
+                if not self.currency_service.is_currency_conversion(ticker)
+            }
+            set_account_total(
+                account_id, lambda: self._replay_tickers_before_period(accounts_by_id[account_id], tickers_operations, date_start, {}))
+
+        return list(accounts_total.values())
+
+    def _iter_tickers_profits(
+            self, 
+            tickers_replay: dict[str, TickerReplay], 
+            executor: Optional[ProcessPoolExecutor] = None) -> Iterator[list[ProfitExchangeDTO]]:
+        """
+        Yields the profits of each ticker in the same order as the tickers, calculating them as they are requested,
+        in the pool of processes of `executor` if given.
+        """
+        quantity_scales = self.operation_repository.get_quantity_scales(tickers_replay.keys())
+        if executor is not None and len(tickers_replay) > 1:
+            for ticker_sold, ticker_profits in zip(tickers_replay.keys(), self._iter_tickers_profits_parallel(tickers_replay, executor)):
+                yield self._profits_in_shares(ticker_profits, quantity_scales.get(ticker_sold))
+            return
+
+        for ticker_sold, ticker_replay in tickers_replay.items():
+            yield self._profits_in_shares(self._calculate_ticker_profits(ticker_sold, ticker_replay), quantity_scales.get(ticker_sold))
+
+    @staticmethod
+    def _get_period_totals(
+            profits: Iterable[ProfitExchangeDTO], 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime], 
+            year_start: tuple[int, int]) -> list[PeriodTotal]:
+        """
+        Adds up the profits in yearly periods starting on `year_start` (month, day), from the period including `date_start` 
+        (or the first SELL) to the period including `date_end` (or the last SELL).
+        Periods are clipped to `date_start` and `date_end`.
+        """
+        profits = list(profits)
+        if not profits and not (date_start and date_end):
+            return []
+        
+        period_first = date_start or min(profit.sell_date for profit in profits)
+        period_last = date_end or max(profit.sell_date for profit in profits)
+        periods = datetime_utils.yearly_periods(*year_start, period_first, period_last)
+        periods_start = [period_start for period_start, _ in periods]
+
+        totals = [Decimal(0)] * len(periods)
+        for profit in profits:
+            totals[bisect.bisect_right(periods_start, profit.sell_date) - 1] += profit.profit_exchange
+
+        return [
+            {
+                'date_start': max(period_start, date_start) if date_start else period_start,
+                'date_end': min(period_end, date_end) if date_end else period_end,
+                'profit_total': total
+            }
+            for (period_start, period_end), total in zip(periods, totals)
+        ]
+
+    def get_period_totals(
+            self, 
+            account: Account, 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime], 
+            year_start: tuple[int, int] = (4, 6)) -> list[PeriodTotal]:
+        """
+        Profit totals of each yearly period (UK tax years by default) between the dates.
+        Each ticker is replayed once for all the periods.
+        """
+        tickers_replay = self._get_tickers_sold_operations(account, date_start, date_end)
+        with self._tickers_profits_pool(len(tickers_replay), lambda: self._get_tickers_replay_currencies(tickers_replay)) as executor:
+            tickers_profits = self._iter_tickers_profits(tickers_replay, executor)
+
+            return self._get_period_totals(
+                (profit for ticker_profits in tickers_profits for profit in ticker_profits), date_start, date_end, year_start)
+
+    def iter_total_details(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Iterator[ProfitDetails]:
+        """
+        Same as `get_total_details` but yielding the profits ticker by ticker as they are calculated,
+        so only the profits of one ticker are held at a time.
+        Operations are loaded, and errors before calculating the first ticker raised, when the first ticker is requested.
+        """
+        if self.pipeline_chunk_size:
+            tickers = self._get_tickers_sold(account, date_start, date_end)
+            # A single pool for all the chunks, created before the thread loading them is started
+            pool = self._tickers_profits_pool(len(tickers), lambda: self.operation_repository.get_account_currencies(account, tickers))
+            with pool as executor:
+                chunks_replay = self._iter_tickers_operations_pipelined(account, tickers, date_start, date_end)
+                yield from self._iter_chunks_details(chunks_replay, executor)
+            return
+
+        tickers_replay = self._get_tickers_sold_operations(account, date_start, date_end)
+        with self._tickers_profits_pool(len(tickers_replay), lambda: self._get_tickers_replay_currencies(tickers_replay)) as executor:
+            yield from self._iter_chunks_details([tickers_replay], executor)
+
+    def _iter_chunks_details(
+            self, 
+            chunks_replay: Iterable[dict[str, TickerReplay]], 
+            executor: Optional[ProcessPoolExecutor]) -> Iterator[ProfitDetails]:
+        for tickers_replay in chunks_replay:
+            for ticker_sold, ticker_profits in zip(tickers_replay.keys(), self._iter_tickers_profits(tickers_replay, executor)):
+                yield {
                     'ticker': ticker_sold,
                     'profit_details': ticker_profits
                 }
-            )
-        
-        return tickers_profit
 
+    async def aiter_total_details(
+            self, 
+            account: Account, 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> AsyncIterator[ProfitDetails]:
+        """
+        Async version of `iter_total_details`, calculating each ticker in a thread as it is requested. 
+        Tickers are calculated one after the other, neither in parallel nor pipelined.
+        """
+        tickers_replay = await self._aget_tickers_sold_operations(account, date_start, date_end)
+        quantity_scales = await sync_to_async(self.operation_repository.get_quantity_scales)(list(tickers_replay.keys()))
+        for ticker_sold, ticker_replay in tickers_replay.items():
+            ticker_profits = await sync_to_async(self._calculate_ticker_profits)(ticker_sold, ticker_replay)
+            yield {
+                'ticker': ticker_sold,
+                'profit_details': self._profits_in_shares(ticker_profits, quantity_scales.get(ticker_sold))
+            }
 
+    def get_total_details(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> list[ProfitDetails]:        
+        return list(self.iter_total_details(account, date_start, date_end))
@@ -0,0 +1,100 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+
+from profits.models import Account
+from profits.repositories.open_lot_cache_repository import OpenLotCacheRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.repositories.realized_gain_repository import RealizedGainRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_service import PeriodTotal, ProfitDetails, ProfitService, TickerReplay
+
+import logging
+logger = logging.getLogger('profits.services')
+
+
+class RealizedGainProfitService(ProfitService):
+    """
+    Same reports as `ProfitService` but read from the persisted realized gains (`RealizedGain`).
+    Gains of a ticker are calculated again, replaying all its operations, only when its operations changed since last calculated 
+    (see `profits.signals`), so reports for unchanged tickers do not replay any operation.
+    `currency_service` must load exchanges for all dates, as gains are calculated for all the operations and not only the period ones.
+    """
+    def __init__(
+            self, 
+            operation_repository: OperationRepository, 
+            currency_service: CurrencyService,
+            profit_calculator: ProfitCalculator,
+            realized_gain_repository: RealizedGainRepository,
+            open_lot_cache_repository: Optional[OpenLotCacheRepository] = None):
+        super().__init__(operation_repository, currency_service, profit_calculator, open_lot_cache_repository=open_lot_cache_repository)
+        self.realized_gain_repository = realized_gain_repository
+
+    def _calculate_tickers_gains(self, account: Account, tickers: list[str]) -> dict[str, list[ProfitExchangeDTO]]:
+        logger.info(f'Calculating realized gains for account {account.id} tickers {tickers}')   # type: ignore
+        tickers_operations = self.operation_repository.get_account_operations(account, tickers, None)
+        quantity_scales = self.operation_repository.get_quantity_scales(tickers)
+        return {
+            ticker: self._profits_in_shares(self._calculate_ticker_profits(ticker, TickerReplay(LotLedger(), ticker_operations)), quantity_scales.get(ticker))
+            for ticker, ticker_operations in tickers_operations.items()
+        }
+
+    def _refresh_tickers_gains(self, account: Account, tickers: list[str]) -> None:
+        """
+        Calculates again the realized gains of the tickers with operations changed since last calculated.
+        """
+        tickers_up_to_date = self.realized_gain_repository.get_tickers_up_to_date(account, tickers)
+        tickers_stale = [ticker for ticker in tickers if ticker not in tickers_up_to_date]
+        if not tickers_stale:
+            return
+
+        self.realized_gain_repository.replace_tickers_gains(
+            account, tickers_stale, lambda tickers_locked: self._calculate_tickers_gains(account, tickers_locked))
+
+    def get_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
+        self._refresh_tickers_gains(account, self._get_tickers_sold(account, date_start, date_end))
+
+        return self.realized_gain_repository.get_total(account, date_start, date_end)
+
+    def get_period_totals(
+            self, 
+            account: Account, 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime], 
+            year_start: tuple[int, int] = (4, 6)) -> list[PeriodTotal]:
+        tickers_sold = self._get_tickers_sold(account, date_start, date_end)
+        self._refresh_tickers_gains(account, tickers_sold)
+
+        tickers_gains = self.realized_gain_repository.get_tickers_gains(account, tickers_sold, date_start, date_end)
+
+        return self._get_period_totals(
+            (profit for ticker_gains in tickers_gains.values() for profit in ticker_gains), date_start, date_end, year_start)
+
+    def iter_total_details(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Iterator[ProfitDetails]:
+        tickers_sold = self._get_tickers_sold(account, date_start, date_end)
+        self._refresh_tickers_gains(account, tickers_sold)
+
+        tickers_gains = self.realized_gain_repository.get_tickers_gains(account, tickers_sold, date_start, date_end)
+
+        for ticker_sold, ticker_gains in tickers_gains.items():
+            yield {
+                'ticker': ticker_sold,
+                'profit_details': ticker_gains
+            }
+
+    async def aget_total(self, account: Account, date_start: Optional[datetime], date_end: Optional[datetime]) -> Decimal:
+        # Gains are refreshed in transactions, which the async ORM does not support, so the synchronous report runs in a thread
+        return await sync_to_async(self.get_total)(account, date_start, date_end)
+
+    async def aiter_total_details(
+            self, 
+            account: Account, 
+            date_start: Optional[datetime], 
+            date_end: Optional[datetime]) -> AsyncIterator[ProfitDetails]:
+        for ticker_profit in await sync_to_async(self.get_total_details)(account, date_start, date_end):
+            yield ticker_profit
@@ -0,0 +1,129 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitDTO, ProfitExchangeDTO
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+
+
+class Section104ProfitCalculator(ProfitCalculator):
+    """
+    Matches SELLs with the Section 104 holding of the ticker: a pool with the quantity held and its cost in the target currency,
+    each BUY exchanged at the rate of its date. A SELL takes from the pool its part of the cost (cost * quantity sold / quantity held),
+    so each operation is O(1) and only the pool is kept, not the lots bought.
+    The pool is kept in the `lot_ledger` given as a single lot in the target currency, dated as the last BUY added to it,
+    so the replay of the operations before the period can be resumed as with FIFO.
+    """
+    def _pool_from_ledger(self, lot_ledger: LotLedger, target_currency: str) -> tuple[Decimal, Decimal, Optional[datetime]]:
+        """
+        Returns the quantity, cost and date of the pool held in `lot_ledger`, adding up its lots if there are several.
+        """
+        quantity = Decimal(0)
+        cost = Decimal(0)
+        date = None
+        for open_lot in lot_ledger.open_lots():
+            quantity += open_lot.quantity
+            cost += open_lot.quantity * open_lot.buy.price_avg * self.profit_exchanger.get_exchange(
+                open_lot.buy.currency, target_currency, open_lot.buy.date)
+            date = open_lot.buy.date
+
+        return quantity, cost, date
+
+    @staticmethod
+    def _pool_to_ledger(lot_ledger: LotLedger, quantity: Decimal, cost: Decimal, date: Optional[datetime], target_currency: str) -> None:
+        lot_ledger.clear()
+        if quantity > 0 and date is not None:
+            lot_ledger.add(OperationDTO(type='BUY', date=date, quantity=quantity, currency=target_currency, price_avg=cost / quantity))
+
+    def _iter_pool_sells(
+            self,
+            ticker_operations: list[OperationDTO],
+            lot_ledger: LotLedger,
+            target_currency: str) -> Iterator[tuple[OperationDTO, Decimal, datetime]]:
+        """
+        Replays the operations in the pool, yielding each SELL with the cost taken from the pool and the date of the pool.
+        Once all are yielded `lot_ledger` holds the pool left.
+        """
+        quantity, cost, date = self._pool_from_ledger(lot_ledger, target_currency)
+
+        for operation in ticker_operations:
+            if operation.type == 'BUY':
+                quantity += operation.quantity
+                cost += operation.quantity * operation.price_avg * self.profit_exchanger.get_exchange(
+                    operation.currency, target_currency, operation.date)
+                date = operation.date
+            elif operation.type == 'SELL':
+                if operation.quantity > quantity:
+                    raise ValueError(f'On date {operation.date}, {operation.quantity - quantity} stocks left to sell without corresponding buys.')
+                cost_sold = cost * operation.quantity / quantity if quantity else Decimal(0)
+                quantity -= operation.quantity
+                cost -= cost_sold
+                assert date is not None
+                yield operation, cost_sold, date
+            else:
+                raise ValueError(f"Unexpected operation type {operation.type}")
+
+        self._pool_to_ledger(lot_ledger, quantity, cost, date, target_currency)
+
+    def _calculate_profit_pool(self, sell: OperationDTO, cost_sold: Decimal, date: datetime, target_currency: str) -> ProfitExchangeDTO:
+        """
+        Profit of a SELL taken from the pool, with the cost taken from it as BUY amount and the date of the pool as BUY date.
+        """
+        sell_amount_total = sell.quantity * sell.price_avg
+        profit_dto = ProfitDTO(
+            sell_date= sell.date,
+            sell_quantity= sell.quantity,
+            sell_amount_total= sell_amount_total,
+            sell_currency= sell.currency,
+            buy_date= date,
+            buy_amount_total= cost_sold,
+            buy_currency= target_currency,
+            profit= sell_amount_total - cost_sold if sell.currency == target_currency else None
+        )
+        return self.profit_exchanger.exchange_currencies(profit_dto, target_currency)
+
+    def replay_ticker_operations(self, ticker_operations: list[OperationDTO], lot_ledger: LotLedger, target_currency: str = "GBP") -> None:
+        """
+        Replays the operations only to update the pool in `lot_ledger`. The cost of the BUYs is exchanged, so rates are needed.
+        """
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+        for _ in self._iter_pool_sells(ticker_operations, lot_ledger, target_currency):
+            pass
+
+    def calculate_ticker_profits(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> list[ProfitExchangeDTO]:
+        """
+        Replays the operations of a ticker in its Section 104 pool, returning a profit per SELL with the pool cost as BUY amount.
+        If a `lot_ledger` is given the replay starts from its pool, and after the replay it holds the pool left.
+        """
+        if lot_ledger is None:
+            lot_ledger = LotLedger()
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+
+        return [
+            self._calculate_profit_pool(sell, cost_sold, date, target_currency)
+            for sell, cost_sold, date in self._iter_pool_sells(ticker_operations, lot_ledger, target_currency)
+        ]
+
+    def calculate_ticker_profit_total(
+            self,
+            ticker_operations: list[OperationDTO],
+            target_currency: str = "GBP",
+            lot_ledger: Optional[LotLedger] = None) -> Decimal:
+        """
+        Same replay as `calculate_ticker_profits` but only adding up the profits exchanged.
+        """
+        if lot_ledger is None:
+            lot_ledger = LotLedger()
+        self._plan_exchanges(ticker_operations, lot_ledger, target_currency)
+
+        profit_total = Decimal(0)
+        for sell, cost_sold, _ in self._iter_pool_sells(ticker_operations, lot_ledger, target_currency):
+            profit_total += sell.quantity * sell.price_avg * self.profit_exchanger.get_exchange(sell.currency, target_currency, sell.date) - cost_sold
+
+        return profit_total
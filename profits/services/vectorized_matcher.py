@@ -0,0 +1,55 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class VectorizedMatches(NamedTuple):
+    # For each match, index of the BUY lot, index of the SELL and quantity matched
+    buy_indexes: np.ndarray
+    sell_indexes: np.ndarray
+    quantities: np.ndarray
+    # Quantity still open of each BUY lot after all the SELLs
+    lots_open_quantities: np.ndarray
+
+
+class SellWithoutBuysError(ValueError):
+    def __init__(self, sell_index: int, quantity_left: int):
+        super().__init__(f'SELL {sell_index} has {quantity_left} left to sell without corresponding buys.')
+        self.sell_index = sell_index
+        self.quantity_left = quantity_left
+
+
+def match_fifo(buy_quantities: np.ndarray, sell_quantities: np.ndarray, sell_lots_available: np.ndarray) -> VectorizedMatches:
+    """
+    Matches SELLs with BUY lots using the FIFO method without iterating the operations.
+    Quantities are integer arrays (fixed-point) in the order operations happened.
+    `sell_lots_available` has, for each SELL, the number of BUY lots opened before it.
+
+    With FIFO the n-th unit sold always comes from the n-th unit bought, so matches are the intersections
+    of the intervals of cumulative quantities of the BUYs and the SELLs: every boundary of either one
+    starts a new match, and the lot and SELL of a match are found by binary search of its start.
+    Lots with zero quantity are never matched.
+    """
+    buys_cumulative = np.cumsum(buy_quantities, dtype=np.int64)
+    sells_cumulative = np.cumsum(sell_quantities, dtype=np.int64)
+
+    # Each SELL can only be matched with the quantity bought before it
+    bought_before = np.concatenate(([0], buys_cumulative))[sell_lots_available]
+    sells_oversold = np.flatnonzero(sells_cumulative > bought_before)
+    if sells_oversold.size:
+        sell_index = int(sells_oversold[0])
+        raise SellWithoutBuysError(sell_index, int(sells_cumulative[sell_index] - bought_before[sell_index]))
+
+    quantity_sold = sells_cumulative[-1] if sells_cumulative.size else 0
+    boundaries = np.union1d(buys_cumulative, sells_cumulative)
+    boundaries = boundaries[(boundaries > 0) & (boundaries <= quantity_sold)]
+    starts = np.concatenate(([0], boundaries[:-1])).astype(np.int64) if boundaries.size else boundaries
+
+    lots_open_quantities = buy_quantities - np.clip(quantity_sold - (buys_cumulative - buy_quantities), 0, buy_quantities)
+
+    return VectorizedMatches(
+        buy_indexes=np.searchsorted(buys_cumulative, starts, side='right'),
+        sell_indexes=np.searchsorted(sells_cumulative, starts, side='right'),
+        quantities=boundaries - starts,
+        lots_open_quantities=lots_open_quantities,
+    )
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from profits.models import CurrencyExchange, Operation, Split
+from profits.repositories.lot_checkpoint_repository import LotCheckpointRepository
+from profits.repositories.open_lot_cache_repository import OpenLotCacheRepository
+from profits.repositories.operation_lock_repository import OperationLockRepository
+from profits.repositories.realized_gain_repository import RealizedGainRepository
+from profits.repositories.split_repository import SplitRepository
+
+
+def keep_operation_previous_values(sender, instance: Operation, **kwargs):
+    """
+    If the date or ticker of an operation are changed, data calculated with the previous ones is also stale.
+    """
+    instance._previous_values = None   # type: ignore
+    if instance.pk is not None:
+        instance._previous_values = Operation.objects.filter(pk=instance.pk).values_list('date', 'ticker').first()   # type: ignore
+
+def invalidate_operation_lot_checkpoints(sender, instance: Operation, **kwargs):
+    """
+    Lots open after an operation change when the operation is saved or deleted.
+    Takes the lock of the account operations, so checkpoints being saved from the previous operations are deleted once saved.
+    """
+    OperationLockRepository.lock_account(instance.account_id)   # type: ignore
+    lot_checkpoint_repository = LotCheckpointRepository()
+    lot_checkpoint_repository.delete_checkpoints_after(instance.ticker, instance.date, instance.account_id)   # type: ignore
+
+    previous_values = getattr(instance, '_previous_values', None)
+    if previous_values is not None:
+        previous_date, previous_ticker = previous_values
+        lot_checkpoint_repository.delete_checkpoints_after(previous_ticker, previous_date, instance.account_id)   # type: ignore
+
+def invalidate_operation_realized_gains(sender, instance: Operation, **kwargs):
+    """
+    Realized gains of a ticker have to be calculated again when any of its operations is saved or deleted.
+    """
+    # Gains being calculated from the previous operations are saved before the ticker is made stale
+    OperationLockRepository.lock_account(instance.account_id)   # type: ignore
+    realized_gain_repository = RealizedGainRepository()
+    previous_values = getattr(instance, '_previous_values', None)
+    if previous_values is not None and previous_values[1] != instance.ticker:
+        realized_gain_repository.set_ticker_stale(instance.account_id, previous_values[1])   # type: ignore
+
+    realized_gain_repository.set_ticker_stale(instance.account_id, instance.ticker)   # type: ignore
+
+def connect_operation_receivers() -> None:
+    """
+    Connects the receivers of the operations changes of the features enabled, and disconnects the others.
+    Receivers of `post_delete` make Django delete the operations one by one instead of in a single query, so they are
+    only connected when needed. Data saved by these features is also checked against the stamp of the operations when read,
+    as changes in bulk send no signals. Called when the app is ready and when the settings change in the tests.
+    """
+    lot_checkpoints = settings.PROFITS_LOT_CHECKPOINTS
+    realized_gains = settings.PROFITS_REALIZED_GAINS
+    receivers = [
+        (pre_save, keep_operation_previous_values, lot_checkpoints or realized_gains),
+        (post_save, invalidate_operation_lot_checkpoints, lot_checkpoints),
+        (post_delete, invalidate_operation_lot_checkpoints, lot_checkpoints),
+        (post_save, invalidate_operation_realized_gains, realized_gains),
+        (post_delete, invalidate_operation_realized_gains, realized_gains),
+    ]
+    for signal, receiver_function, enabled in receivers:
+        if enabled:
+            signal.connect(receiver_function, sender=Operation)
+        else:
+            signal.disconnect(receiver_function, sender=Operation)
+
+@receiver(setting_changed)
+def reconnect_operation_receivers(sender, setting: str, **kwargs):
+    if setting in ('PROFITS_LOT_CHECKPOINTS', 'PROFITS_REALIZED_GAINS'):
+        connect_operation_receivers()
+
+@receiver([post_save, post_delete], sender=Split)
+def invalidate_split_lot_checkpoints(sender, instance: Split, **kwargs):
+    """
+    Splits change the quantities of the lots open in all the accounts.
+    Operations are adjusted to the units after the last split, so lots of checkpoints before the split also change.
+    """
+    if not settings.PROFITS_LOT_CHECKPOINTS:
+        return
+
+    LotCheckpointRepository().delete_ticker_checkpoints(instance.ticker)
+
+@receiver([post_save, post_delete], sender=Split)
+def invalidate_split_realized_gains(sender, instance: Split, **kwargs):
+    """
+    Realized gains are stored with the quantities adjusted to the splits.
+    """
+    if not settings.PROFITS_REALIZED_GAINS:
+        return
+
+    RealizedGainRepository().set_ticker_stale_all_accounts(instance.ticker)
+
+@receiver([post_save, post_delete], sender=Split)
+def invalidate_split_index(sender, instance: Split, **kwargs):
+    """
+    Invalidated again on commit, in case the index was loaded by another request before the transaction was committed.
+    """
+    SplitRepository.invalidate_split_index()
+    transaction.on_commit(SplitRepository.invalidate_split_index)
+
+@receiver([post_save, post_delete], sender=Split)
+def invalidate_split_open_lots_cached(sender, instance: Split, **kwargs):
+    """
+    Cached lots are in the units after the last split, and are cached per account, so the ones of all the accounts are invalidated.
+    """
+    OpenLotCacheRepository.delete_all_open_lots()
+    transaction.on_commit(OpenLotCacheRepository.delete_all_open_lots)
+
+def set_all_realized_gains_stale():
+    RealizedGainRepository().set_all_stale()
+
+@receiver([post_save, post_delete], sender=CurrencyExchange)
+def invalidate_currency_exchange_realized_gains(sender, instance: CurrencyExchange, **kwargs):
+    """
+    Realized gains are stored exchanged, so any rate change can change them.
+    Rates are uploaded in bulk, so the gains are invalidated once when the transaction is committed, not for each rate.
+    """
+    if not settings.PROFITS_REALIZED_GAINS:
+        return
+
+    # Callbacks are discarded on rollback, so a pending one means the invalidation is already scheduled for this transaction
+    connection = transaction.get_connection()
+    if not any(callback is set_all_realized_gains_stale for _, callback, _ in connection.run_on_commit):
+        transaction.on_commit(set_all_realized_gains_stale)
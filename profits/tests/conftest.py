@@ -1,7 +1,8 @@
+import random
 import pytest
 
-from typing import Any, Callable, Type
-from datetime import datetime
+from typing import Any, Callable, Optional, Type
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
@@ -10,7 +11,19 @@ from django.utils.timezone import make_aware
 
 from rest_framework.test import APIClient
 
+from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.models import Account, Broker, Currency, CurrencyExchange, Dividend, Operation, Split
+from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.lot_checkpoint_repository import LotCheckpointRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.repositories.realized_gain_repository import RealizedGainRepository
+from profits.repositories.split_repository import SplitRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_checkpoint_service import LotCheckpointService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.profit_service import ProfitService
+from profits.services.realized_gain_profit_service import RealizedGainProfitService
 
 @pytest.fixture
 def create_date():
@@ -204,3 +217,60 @@ def create_operation(
 @pytest.fixture
 def operation_default(create_operation) -> Operation:
     return create_operation()
+
+@pytest.fixture
+def create_random_operations():
+    def _create_random_operations(seed: int, count: int, currencies: tuple[str, ...] = ('GBP',)) -> list[OperationDTO]:
+        """
+        Random operations of a ticker as loaded from the database, with quantities and amount totals of 7 decimal places
+        and never selling more than bought.
+        """
+        generator = random.Random(seed)
+        date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        quantity_open = Decimal(0)
+        operations = []
+        for _ in range(count):
+            date += timedelta(days=generator.randint(0, 20))
+            currency = generator.choice(currencies)
+            if quantity_open > 0 and generator.random() < 0.4:
+                type = 'SELL'
+                quantity = min(quantity_open, Decimal(generator.randint(1, 500_000_000)).scaleb(-7))
+                quantity_open -= quantity
+            else:
+                type = 'BUY'
+                quantity = Decimal(generator.randint(1, 500_000_000)).scaleb(-7)
+                quantity_open += quantity
+            amount_total = Decimal(generator.randint(1, 10 ** 12)).scaleb(-7)
+            operations.append(OperationDTO(type=type, date=date, quantity=quantity, currency=currency, price_avg=amount_total / quantity))
+        return operations
+    return _create_random_operations
+
+@pytest.fixture
+def create_profit_service() -> Callable:
+    def _create_profit_service(
+            split_adjusted: bool = False,
+            lot_checkpoints: bool = False,
+            realized_gains: bool = False,
+            **kwargs) -> ProfitService:
+        """
+        Profit service on the database repositories, with the other optional arguments of `ProfitService` in `kwargs`.
+        With `realized_gains` the service is a `RealizedGainProfitService`.
+        """
+        currency_service = CurrencyService(CurrencyRepository(), None, None)
+        profit_calculator = ProfitCalculator(ProfitExchanger(currency_service))
+        operation_repository = OperationRepository(SplitRepository() if split_adjusted else None)
+        if realized_gains:
+            return RealizedGainProfitService(operation_repository, currency_service, profit_calculator, RealizedGainRepository(), **kwargs)
+        if lot_checkpoints:
+            kwargs['lot_checkpoint_service'] = LotCheckpointService(LotCheckpointRepository())
+        return ProfitService(operation_repository, currency_service, profit_calculator, **kwargs)
+    return _create_profit_service
+
+@pytest.fixture(autouse=True)
+def split_index_invalidated():
+    """
+    The split index is cached by the process, and splits created by a test are rolled back without signals.
+    """
+    SplitRepository.invalidate_split_index()
+    yield
+    SplitRepository.invalidate_split_index()
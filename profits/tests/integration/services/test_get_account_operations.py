@@ -0,0 +1,72 @@
+import pytest
+
+from datetime import datetime, timezone
+
+from asgiref.sync import async_to_sync
+
+from profits.repositories.operation_repository import OperationRepository
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_account, create_user, create_date):
+    create_operation(date=create_date('2024-01-01'))
+    create_operation(date=create_date('2024-02-02'))
+    create_operation(date=create_date('2024-03-03'), type='SELL')
+
+    create_operation(ticker="TSLA", date=create_date('2024-01-01'))
+    create_operation(ticker="TSLA", date=create_date('2024-03-03'), type='SELL')
+    create_operation(ticker="MSFT", date=create_date('2024-01-01'))
+
+    # Creates operations for non-default account
+    other_account=create_account(user=create_user(username="another"))
+    create_operation(account=other_account, date=create_date('2024-01-01'))
+
+
+@pytest.mark.django_db
+class TestGetAccountOperations:
+
+    def test_when_multiple_tickers_then_returns_operations_grouped_by_ticker(self, account_default, sample_operations):
+
+        operation_repository = OperationRepository()
+        result = operation_repository.get_account_operations(account_default, ['TSLA', 'AAPL'], None)
+
+        assert list(result.keys()) == ['TSLA', 'AAPL']
+        assert len(result['AAPL']) == 3
+        assert len(result['TSLA']) == 2
+        assert result['AAPL'] == sorted(result['AAPL'], key=lambda x: x.date)
+
+    def test_when_filtered_by_date_end_then_returns_previous_operations(self, account_default, sample_operations):
+        date_end = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+        operation_repository = OperationRepository()
+        result = operation_repository.get_account_operations(account_default, ['AAPL', 'TSLA'], date_end)
+
+        assert len(result['AAPL']) == 2
+        assert len(result['TSLA']) == 1
+
+    def test_when_ticker_without_operations_then_returns_empty_list(self, account_default, sample_operations):
+
+        operation_repository = OperationRepository()
+        result = operation_repository.get_account_operations(account_default, ['GOOG'], None)
+
+        assert result == {'GOOG': []}
+
+    def test_when_many_tickers_then_executes_single_query(self, account_default, create_operation, create_date, django_assert_num_queries):
+        tickers = [f'TK{index}' for index in range(20)]
+        for ticker in tickers:
+            create_operation(ticker=ticker, date=create_date('2024-01-01'))
+            create_operation(ticker=ticker, date=create_date('2024-02-01'), type='SELL')
+
+        operation_repository = OperationRepository()
+        with django_assert_num_queries(1):
+            result = operation_repository.get_account_operations(account_default, tickers, None)
+
+        assert all(len(result[ticker]) == 2 for ticker in tickers)
+
+    def test_when_async_then_same_operations(self, account_default, sample_operations):
+        operation_repository = OperationRepository()
+
+        result = async_to_sync(operation_repository.aget_account_operations)(account_default, ['TSLA', 'AAPL'], None)
+
+        assert result == operation_repository.get_account_operations(account_default, ['TSLA', 'AAPL'], None)
+        assert sorted(async_to_sync(operation_repository.aget_account_tickers_sold_period)(account_default, None, None)) == ['AAPL', 'TSLA']
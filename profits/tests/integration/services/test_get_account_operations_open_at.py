@@ -0,0 +1,86 @@
+import pytest
+
+from decimal import Decimal
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import ProfitServiceBuySellMissmatch
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.profit_service import ProfitService
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_date):
+    """
+    AAPL bought 10 each month and sold 25 every 3 months, TSLA bought once and never sold before 2023.
+    """
+    for month in range(1, 13):
+        create_operation(ticker='AAPL', type='BUY', date=create_date(f'2022-{month:02}-01'), quantity=Decimal(10), amount_total=Decimal(100 + month))
+        if month % 3 == 0:
+            create_operation(ticker='AAPL', type='SELL', date=create_date(f'2022-{month:02}-15'), quantity=Decimal(25), amount_total=Decimal(400))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2023-02-01'), quantity=Decimal(15), amount_total=Decimal(300))
+    create_operation(ticker='TSLA', type='BUY', date=create_date('2022-05-01'), quantity=Decimal(3), amount_total=Decimal(30))
+    create_operation(ticker='TSLA', type='SELL', date=create_date('2023-03-01'), quantity=Decimal(2), amount_total=Decimal(50))
+
+
+@pytest.mark.django_db
+class TestGetAccountOperationsOpenAt:
+
+    def test_when_operations_before_date_start_then_same_open_lots_as_replay(self, account_default, sample_operations, create_date):
+        date_start = create_date('2022-11-01')
+        tickers_operations = OperationRepository().get_account_operations(account_default, ['AAPL', 'TSLA'], None)
+
+        result = OperationRepository().get_account_operations_open_at(account_default, ['AAPL', 'TSLA'], date_start, None)
+
+        assert list(result.keys()) == ['AAPL', 'TSLA']
+        for ticker, (open_lots, operations_period) in result.items():
+            lot_ledger = LotLedger()
+            operations_before = [operation for operation in tickers_operations[ticker] if operation.date < date_start]
+            ProfitCalculator(ProfitExchanger(CurrencyService(CurrencyRepository(), None, None))).replay_ticker_operations(operations_before, lot_ledger)
+            assert open_lots == lot_ledger.open_lots()
+            assert operations_period == [operation for operation in tickers_operations[ticker] if operation.date >= date_start]
+
+    def test_when_buys_sold_before_date_start_then_not_loaded(self, account_default, sample_operations, create_date):
+        result = OperationRepository().get_account_operations_open_at(account_default, ['AAPL'], create_date('2023-01-01'), None)
+
+        open_lots, operations_period = result['AAPL']
+        # 120 bought and 100 sold, so the lots up to October are fully sold
+        assert [(open_lot.buy.date.month, open_lot.quantity) for open_lot in open_lots] == [(11, Decimal(10)), (12, Decimal(10))]
+        assert len(operations_period) == 1
+
+    def test_when_lot_partially_sold_before_date_start_then_loaded_with_quantity_open(self, account_default, sample_operations, create_date):
+        result = OperationRepository().get_account_operations_open_at(account_default, ['AAPL'], create_date('2022-10-01'), None)
+
+        open_lots, _ = result['AAPL']
+        # 90 bought and 75 sold, so 5 of the lot of August are open
+        assert [(open_lot.buy.date.month, open_lot.quantity) for open_lot in open_lots] == [(8, Decimal(5)), (9, Decimal(10))]
+        assert open_lots[0].buy.quantity == Decimal(10)
+
+    def test_when_date_end_then_operations_after_not_loaded(self, account_default, sample_operations, create_date):
+        result = OperationRepository().get_account_operations_open_at(account_default, ['TSLA'], create_date('2022-06-01'), create_date('2022-12-31'))
+
+        assert result['TSLA'][0] == [OpenLotDTO(buy=result['TSLA'][0][0].buy, quantity=Decimal(3))]
+        assert result['TSLA'][1] == []
+
+    def test_when_sold_more_than_bought_before_date_start_then_raises_exception(self, account_default, create_operation, create_date):
+        create_operation(ticker='AAPL', type='BUY', date=create_date('2022-01-01'), quantity=Decimal(10))
+        create_operation(ticker='AAPL', type='SELL', date=create_date('2022-02-01'), quantity=Decimal(11))
+        create_operation(ticker='AAPL', type='SELL', date=create_date('2023-02-01'), quantity=Decimal(1))
+
+        with pytest.raises(ValueError):
+            OperationRepository().get_account_operations_open_at(account_default, ['AAPL'], create_date('2023-01-01'), None)
+
+    def test_when_profit_service_loads_open_lots_only_then_same_profits(self, account_default, sample_operations, create_date):
+        currency_service = CurrencyService(CurrencyRepository(), None, None)
+        profit_calculator = ProfitCalculator(ProfitExchanger(currency_service))
+        date_start = create_date('2022-11-01')
+        expected_details = ProfitService(OperationRepository(), currency_service, profit_calculator).get_total_details(account_default, date_start, None)
+
+        result = ProfitService(OperationRepository(), currency_service, profit_calculator, load_open_lots_only=True) \
+            .get_total_details(account_default, date_start, None)
+
+        assert result == expected_details
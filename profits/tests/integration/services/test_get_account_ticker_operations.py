@@ -1,6 +1,7 @@
 import pytest
 
 from datetime import datetime, timezone
+from decimal import Decimal
 
 from profits.repositories.operation_repository import OperationRepository
 
@@ -47,3 +48,25 @@ class TestGetAccountTickerOperations:
         result = operation_repository.get_account_ticker_operations(account_without_operations, 'AAPL', None)
         
         assert len(result) == 0
+
+    def test_when_operations_then_returns_dtos_with_currency_and_price_avg(self, account_default, create_operation, create_date, currency_usd):
+        create_operation(date=create_date('2024-01-01'), quantity=Decimal('4'), amount_total=Decimal('1000'), currency=currency_usd)
+        create_operation(date=create_date('2024-02-01'), quantity=Decimal('0'), amount_total=Decimal('0'), currency=currency_usd)
+
+        operation_repository = OperationRepository()
+        result = operation_repository.get_account_ticker_operations(account_default, 'AAPL', None)
+
+        assert [operation.currency for operation in result] == ['USD', 'USD']
+        assert result[0].quantity == Decimal('4')
+        assert result[0].price_avg == Decimal('250')
+        assert result[1].price_avg == Decimal('0')
+
+    def test_when_many_operations_then_executes_single_query(self, account_default, create_operation, create_date, django_assert_num_queries):
+        for day in range(1, 21):
+            create_operation(date=create_date(f'2024-01-{day:02d}'))
+
+        operation_repository = OperationRepository()
+        with django_assert_num_queries(1):
+            result = operation_repository.get_account_ticker_operations(account_default, 'AAPL', None)
+
+        assert len(result) == 20
@@ -0,0 +1,57 @@
+import pytest
+
+from decimal import Decimal
+
+from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.profit_service import ProfitService
+
+
+@pytest.fixture
+def profit_service() -> ProfitService:
+    currency_service = CurrencyService(CurrencyRepository(), None, None)
+    return ProfitService(OperationRepository(), currency_service, ProfitCalculator(ProfitExchanger(currency_service)))
+
+@pytest.fixture
+def accounts(create_account, create_operation, create_currency_exchange, create_date, currency_usd, currency_gbp):
+    create_currency_exchange(date=create_date('2023-01-01'), origin=currency_usd, target=currency_gbp, rate=Decimal('0.8'))
+    accounts = [create_account(user_broker_ref=f'REF{index}') for index in range(3)]
+    for index, account in enumerate(accounts):
+        for ticker in ['AAPL', 'MSFT', 'USDGBP']:
+            create_operation(account=account, ticker=ticker, type='BUY', date=create_date('2023-01-15'), quantity=Decimal(10), 
+                             amount_total=Decimal(1000), currency=currency_usd)
+            create_operation(account=account, ticker=ticker, type='SELL', date=create_date(f'2023-0{index + 2}-15'), quantity=Decimal(5), 
+                             amount_total=Decimal(600 + index), currency=currency_usd)
+    return accounts
+
+
+@pytest.mark.django_db
+class TestGetAccountsTotals:
+
+    def test_when_several_accounts_then_same_totals_as_each_account(self, profit_service, accounts, create_date):
+        date_start, date_end = create_date('2023-02-01'), create_date('2023-03-31')
+
+        result = profit_service.get_accounts_totals(accounts, date_start, date_end)
+
+        assert result == [
+            {'id': account.id, 'profit_total': profit_service.get_total(account, date_start, date_end), 'error': None}
+            for account in accounts
+        ]
+        assert [account_total['profit_total'] for account_total in result] == [Decimal('160'), Decimal('161.6'), Decimal(0)]
+
+    def test_when_several_accounts_then_operations_loaded_with_one_query(self, profit_service, accounts, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            profit_service.get_accounts_totals(accounts, None, None)
+
+    def test_when_account_sells_without_buys_then_error_only_for_that_account(self, profit_service, accounts, create_operation, create_date):
+        create_operation(account=accounts[1], ticker='NVDA', type='SELL', date=create_date('2023-03-01'), quantity=Decimal(1))
+
+        result = profit_service.get_accounts_totals(accounts, None, None)
+
+        assert [account_total['error'] is None for account_total in result] == [True, False, True]
+        assert 'NVDA' in result[1]['error']
+        assert result[1]['profit_total'] is None
+        assert result[2]['profit_total'] == Decimal('163.2')
@@ -0,0 +1,49 @@
+import pytest
+
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from profits.services.exceptions import ProfitServiceBuySellMissmatch
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_currency_exchange, create_date, currency_usd, currency_gbp):
+    create_currency_exchange(date=create_date('2023-01-01'), origin=currency_usd, target=currency_gbp, rate=Decimal('0.8'))
+    create_currency_exchange(date=create_date('2023-06-01'), origin=currency_usd, target=currency_gbp, rate=Decimal('0.75'))
+    for index, ticker in enumerate(['AAPL', 'MSFT', 'TSLA', 'GOOG']):
+        create_operation(ticker=ticker, type='BUY', date=create_date('2023-01-15'), quantity=Decimal(10 + index), 
+                         amount_total=Decimal(1000), currency=currency_usd)
+        create_operation(ticker=ticker, type='BUY', date=create_date('2023-02-15'), quantity=Decimal(5), 
+                         amount_total=Decimal(600), currency=currency_gbp)
+        create_operation(ticker=ticker, type='SELL', date=create_date('2023-06-15'), quantity=Decimal(12 + index), 
+                         amount_total=Decimal(1500 + index), currency=currency_usd)
+
+
+@pytest.mark.django_db
+class TestGetTotalDetailsParallel:
+
+    def test_when_max_workers_then_same_details_as_serial(self, create_profit_service, account_default, sample_operations):
+        expected_details = create_profit_service().get_total_details(account_default, None, None)
+
+        result = create_profit_service(max_workers=2).get_total_details(account_default, None, None)
+
+        assert len(result) == 4
+        assert result == expected_details
+
+    def test_when_sell_without_buys_then_raises_exception(self, create_profit_service, account_default, sample_operations, create_operation, create_date):
+        create_operation(ticker='NVDA', type='SELL', date=create_date('2023-06-15'), quantity=Decimal(1))
+
+        with pytest.raises(ProfitServiceBuySellMissmatch) as e:
+            create_profit_service(max_workers=2).get_total_details(account_default, None, None)
+
+        assert 'NVDA' in str(e.value)
+
+    def test_when_iteration_stopped_early_then_pending_tickers_cancelled(
+            self, create_profit_service, account_default, sample_operations, mocker):
+        shutdown_spy = mocker.spy(ProcessPoolExecutor, 'shutdown')
+        tickers_profit = create_profit_service(max_workers=2).iter_total_details(account_default, None, None)
+
+        assert next(tickers_profit)['ticker'] == 'AAPL'
+        tickers_profit.close()
+
+        assert shutdown_spy.call_args_list[0].kwargs == {'wait': False, 'cancel_futures': True}
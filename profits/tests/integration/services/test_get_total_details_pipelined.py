@@ -0,0 +1,73 @@
+import threading
+import pytest
+
+from decimal import Decimal
+
+from profits.services import profit_service
+from profits.services.exceptions import ProfitServiceBuySellMissmatch
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_currency_exchange, create_date, currency_usd, currency_gbp):
+    create_currency_exchange(date=create_date('2022-01-01'), origin=currency_usd, target=currency_gbp, rate=Decimal('0.8'))
+    for index, ticker in enumerate(['AAPL', 'GOOG', 'MSFT', 'NVDA', 'TSLA']):
+        create_operation(ticker=ticker, type='BUY', date=create_date('2022-01-15'), quantity=Decimal(10 + index),
+                         amount_total=Decimal(1000), currency=currency_usd)
+        create_operation(ticker=ticker, type='SELL', date=create_date('2022-06-15'), quantity=Decimal(5),
+                         amount_total=Decimal(700), currency=currency_usd)
+        create_operation(ticker=ticker, type='SELL', date=create_date('2023-06-15'), quantity=Decimal(3 + index),
+                         amount_total=Decimal(500 + index), currency=currency_gbp)
+
+def loader_threads() -> list[threading.Thread]:
+    return [thread for thread in threading.enumerate() if thread.name == 'profits-operations-prefetch']
+
+
+# Operations are loaded by another thread with its own connection, so the test data has to be committed
+@pytest.mark.django_db(transaction=True)
+class TestGetTotalDetailsPipelined:
+
+    @pytest.mark.parametrize("pipeline_chunk_size", [1, 2, 10])
+    def test_when_pipelined_then_same_details_as_loaded_at_once(
+            self, create_profit_service, account_default, sample_operations, create_date, pipeline_chunk_size):
+        expected_details = create_profit_service().get_total_details(account_default, create_date('2023-01-01'), None)
+
+        result = create_profit_service(pipeline_chunk_size=pipeline_chunk_size, pipeline_prefetch_chunks=1).get_total_details(account_default, create_date('2023-01-01'), None)
+
+        assert len(result) == 5
+        assert result == expected_details
+        assert loader_threads() == []
+
+    def test_when_pipelined_with_max_workers_then_single_pool_started_before_loader(
+            self, create_profit_service, account_default, sample_operations, create_date, mocker):
+        expected_details = create_profit_service().get_total_details(account_default, create_date('2023-01-01'), None)
+        process_pool_executor = profit_service.ProcessPoolExecutor
+        loader_threads_on_pool_created = []
+
+        def create_process_pool_executor(*args, **kwargs):
+            loader_threads_on_pool_created.append(len(loader_threads()))
+            return process_pool_executor(*args, **kwargs)
+
+        mocker.patch.object(profit_service, 'ProcessPoolExecutor', side_effect=create_process_pool_executor)
+
+        result = create_profit_service(pipeline_chunk_size=2, pipeline_prefetch_chunks=1, max_workers=2).get_total_details(
+            account_default, create_date('2023-01-01'), None)
+
+        assert result == expected_details
+        assert loader_threads_on_pool_created == [0]
+
+    def test_when_error_loading_then_raised_in_caller(
+            self, create_profit_service, account_default, sample_operations, create_operation, create_date):
+        create_operation(ticker='TSLA', type='SELL', date=create_date('2022-07-15'), quantity=Decimal(100))
+
+        with pytest.raises(ProfitServiceBuySellMissmatch):
+            create_profit_service(pipeline_chunk_size=2, pipeline_prefetch_chunks=1, load_open_lots_only=True).get_total_details(account_default, create_date('2023-01-01'), None)
+
+        assert loader_threads() == []
+
+    def test_when_iteration_stopped_then_loader_stopped(self, create_profit_service, account_default, sample_operations):
+        tickers_profit = create_profit_service(pipeline_chunk_size=1, pipeline_prefetch_chunks=1).iter_total_details(account_default, None, None)
+
+        assert next(tickers_profit)['profit_details']
+        tickers_profit.close()
+
+        assert loader_threads() == []
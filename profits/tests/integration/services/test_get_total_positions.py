@@ -0,0 +1,59 @@
+import pytest
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_currency_exchange, currency_gbp, currency_usd, create_date):
+    """
+    AAPL in GBP partially sold in 2023, and MSFT in USD bought in 2022 and 2023 and never sold.
+    """
+    create_currency_exchange(date=create_date('2022-01-01').date(), origin=currency_usd, target=currency_gbp, rate=Decimal('0.8'))
+    create_currency_exchange(date=create_date('2023-01-01').date(), origin=currency_usd, target=currency_gbp, rate=Decimal('0.75'))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-02-01'), quantity=Decimal(10), amount_total=Decimal(1000))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-05-01'), quantity=Decimal(10), amount_total=Decimal(1500))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2023-03-01'), quantity=Decimal(15), amount_total=Decimal(3000))
+    create_operation(ticker='MSFT', type='BUY', date=create_date('2022-06-01'), quantity=Decimal(4), amount_total=Decimal(400), currency=currency_usd)
+    create_operation(ticker='MSFT', type='BUY', date=create_date('2023-06-01'), quantity=Decimal(2), amount_total=Decimal(300), currency=currency_usd)
+
+
+@pytest.mark.django_db
+class TestGetTotalPositions:
+
+    def test_when_lots_open_then_positions_with_cost_basis_exchanged(self, create_profit_service, account_default, sample_operations):
+        result = create_profit_service().get_total_positions(account_default, None, None)
+
+        msft_cost_basis = Decimal(400) * Decimal('0.8') + Decimal(300) * Decimal('0.75')
+        assert result['positions'] == [
+            {'ticker': 'AAPL', 'quantity': Decimal(5), 'average_cost': Decimal(150), 'cost_basis': Decimal(750)},
+            {'ticker': 'MSFT', 'quantity': Decimal(6), 'average_cost': msft_cost_basis / 6, 'cost_basis': msft_cost_basis},
+        ]
+
+    @pytest.mark.parametrize("load_open_lots_only", [False, True])
+    def test_when_period_then_total_same_as_get_total(self, create_profit_service, account_default, sample_operations, create_date, load_open_lots_only):
+        profit_service = create_profit_service(load_open_lots_only=load_open_lots_only)
+        expected = profit_service.get_total(account_default, create_date('2023-01-01'), None)
+
+        result = profit_service.get_total_positions(account_default, create_date('2023-01-01'), None)
+
+        assert result['profit_total'] == expected
+        assert [position['quantity'] for position in result['positions']] == [Decimal(5), Decimal(6)]
+
+    def test_when_date_end_then_positions_at_date_end(self, create_profit_service, account_default, sample_operations, create_date):
+        result = create_profit_service().get_total_positions(account_default, None, create_date('2022-12-31'))
+
+        assert result['profit_total'] == Decimal(0)
+        assert [(position['ticker'], position['quantity']) for position in result['positions']] == [('AAPL', Decimal(20)), ('MSFT', Decimal(4))]
+
+    def test_positions_and_total_loaded_with_single_operations_query(self, create_profit_service, account_default, sample_operations):
+        profit_service = create_profit_service()
+
+        with CaptureQueriesContext(connection) as queries:
+            profit_service.get_total_positions(account_default, None, None)
+
+        operation_queries = [query for query in queries.captured_queries if 'profits_operation' in query['sql']]
+        # Tickers held, and their operations
+        assert len(operation_queries) == 2
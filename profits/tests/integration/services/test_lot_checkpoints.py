@@ -0,0 +1,161 @@
+import pytest
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test.utils import CaptureQueriesContext
+
+from profits.interfaces.dtos.lot_checkpoint_dto import LotCheckpointDTO
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.models import LotCheckpoint, Operation
+from profits.repositories.lot_checkpoint_repository import LotCheckpointRepository
+from profits.services.lot_checkpoint_service import LotCheckpointService
+
+
+@pytest.fixture(autouse=True)
+def lot_checkpoints_enabled(settings):
+    """
+    Checkpoints are only invalidated by the signals when enabled.
+    """
+    settings.PROFITS_LOT_CHECKPOINTS = True
+
+@pytest.fixture
+def sample_operations(create_operation, create_date):
+    """
+    A BUY and a partial SELL of AAPL every 4 months during 4 years.
+    """
+    for year in range(2020, 2024):
+        for month in (1, 5, 9):
+            create_operation(ticker='AAPL', type='BUY', date=create_date(f'{year}-{month:02}-10'), 
+                             quantity=Decimal(10), amount_total=Decimal(100 * month + year))
+            create_operation(ticker='AAPL', type='SELL', date=create_date(f'{year}-{month:02}-20'), 
+                             quantity=Decimal(7), amount_total=Decimal(80 * month + year))
+
+
+@pytest.mark.django_db
+class TestLotCheckpoints:
+
+    def test_when_date_start_then_only_sells_in_period_reported(self, create_profit_service, account_default, sample_operations, create_date):
+        result = create_profit_service().get_total_details(account_default, create_date('2023-01-01'), None)
+
+        assert len(result) == 1
+        assert result[0]['profit_details']
+        assert all(profit.sell_date >= create_date('2023-01-01') for profit in result[0]['profit_details'])
+
+    def test_when_date_start_then_checkpoints_saved_at_tax_year_start(self, create_profit_service, account_default, sample_operations, create_date):
+        create_profit_service(lot_checkpoints=True).get_total(account_default, create_date('2023-01-01'), None)
+
+        checkpoints_dates = list(LotCheckpoint.objects.filter(account=account_default, ticker='AAPL').order_by('date').values_list('date', flat=True))
+        assert checkpoints_dates == [datetime(year, 4, 6, tzinfo=timezone.utc) for year in (2020, 2021, 2022)]
+
+    def test_when_resumed_from_checkpoint_then_same_profits(self, create_profit_service, account_default, sample_operations, create_date):
+        date_start = create_date('2023-06-01')
+        expected_details = create_profit_service().get_total_details(account_default, date_start, None)
+        expected_total = create_profit_service().get_total(account_default, date_start, None)
+
+        # First call saves the checkpoints and next ones resume from them
+        assert create_profit_service(lot_checkpoints=True).get_total_details(account_default, date_start, None) == expected_details
+        assert LotCheckpoint.objects.filter(account=account_default, date__year=2023).exists()
+        assert create_profit_service(lot_checkpoints=True).get_total_details(account_default, date_start, None) == expected_details
+        assert create_profit_service(lot_checkpoints=True).get_total(account_default, date_start, None) == expected_total
+
+    def test_when_operation_before_checkpoint_created_then_later_checkpoints_deleted(
+            self, create_profit_service, account_default, sample_operations, create_operation, create_date):
+        create_profit_service(lot_checkpoints=True).get_total(account_default, create_date('2023-01-01'), None)
+
+        create_operation(ticker='AAPL', type='BUY', date=create_date('2021-06-01'), quantity=Decimal(1), amount_total=Decimal(1))
+
+        checkpoints_dates = list(LotCheckpoint.objects.filter(account=account_default, ticker='AAPL').order_by('date').values_list('date', flat=True))
+        assert checkpoints_dates == [datetime(year, 4, 6, tzinfo=timezone.utc) for year in (2020, 2021)]
+
+    def test_when_operation_deleted_then_later_checkpoints_deleted(
+            self, create_profit_service, account_default, sample_operations, create_date):
+        create_profit_service(lot_checkpoints=True).get_total(account_default, create_date('2023-01-01'), None)
+
+        account_default.operation_set.filter(date=create_date('2022-01-20')).delete()   # type: ignore
+
+        assert LotCheckpoint.objects.filter(account=account_default, ticker='AAPL').count() == 2
+
+    def test_when_operation_created_in_bulk_then_checkpoints_after_not_used(
+            self, create_profit_service, account_default, sample_operations, currency_gbp, create_date):
+        date_start = create_date('2023-01-01')
+        create_profit_service(lot_checkpoints=True).get_total(account_default, date_start, None)
+        # Without signals, so the checkpoints are only found stale by the stamp of the operations
+        Operation.objects.bulk_create([Operation(
+            account=account_default, ticker='AAPL', type='BUY', date=create_date('2021-06-01'), quantity=Decimal(1), 
+            amount_total=Decimal(1), currency=currency_gbp, exchange=Decimal(1))])
+        expected = create_profit_service().get_total_details(account_default, date_start, None)
+
+        assert create_profit_service(lot_checkpoints=True).get_total_details(account_default, date_start, None) == expected
+        # Replayed from the first operation, so saved again with the current stamp
+        assert LotCheckpointRepository().get_latest_checkpoints(account_default, ['AAPL'], date_start)
+
+    def test_when_features_disabled_then_operations_deleted_in_single_query(self, settings, account_default, sample_operations):
+        assert post_delete.has_listeners(Operation)
+        settings.PROFITS_LOT_CHECKPOINTS = False
+
+        with CaptureQueriesContext(connection) as queries:
+            account_default.operation_set.all().delete()   # type: ignore
+
+        assert not post_delete.has_listeners(Operation)
+        assert len(queries.captured_queries) == 1
+        assert queries.captured_queries[0]['sql'].startswith('DELETE')
+
+    def test_when_split_then_ticker_checkpoints_deleted_for_all_accounts(
+            self, create_profit_service, account_default, sample_operations, create_split, create_date):
+        create_profit_service(lot_checkpoints=True).get_total(account_default, create_date('2023-01-01'), None)
+
+        create_split(ticker='AAPL', date=datetime(2021, 3, 1).date())
+
+        # Operations are adjusted to the units after the last split, so checkpoints before the split change too
+        assert not LotCheckpoint.objects.filter(ticker='AAPL').exists()
+
+    def test_when_operation_changed_after_loaded_then_checkpoints_not_saved(
+            self, create_profit_service, account_default, sample_operations, create_operation, create_date, mocker):
+        profit_service = create_profit_service(lot_checkpoints=True)
+        get_account_operations = profit_service.operation_repository.get_account_operations
+
+        def get_account_operations_then_changed(*args, **kwargs):
+            # Changed by another request after the operations were loaded, before the checkpoints are saved
+            tickers_operations = get_account_operations(*args, **kwargs)
+            mocker.stop(get_account_operations_mock)
+            create_operation(ticker='AAPL', type='BUY', date=create_date('2021-06-01'), quantity=Decimal(1), amount_total=Decimal(1))
+            return tickers_operations
+
+        get_account_operations_mock = mocker.patch.object(
+            profit_service.operation_repository, 'get_account_operations', side_effect=get_account_operations_then_changed)
+
+        profit_service.get_total(account_default, create_date('2023-01-01'), None)
+
+        assert not LotCheckpoint.objects.filter(account=account_default, ticker='AAPL').exists()
+
+    def test_when_checkpoint_saved_again_then_replaced(self, account_default, sample_operations):
+        date = datetime(2022, 4, 6, tzinfo=timezone.utc)
+        lot_checkpoint_repository = LotCheckpointRepository()
+        lot_checkpoint_repository.save_checkpoints(account_default, 'AAPL', [LotCheckpointDTO(date=date, open_lots=[])], lambda: True)
+        buy = Operation.objects.filter(account=account_default, type='BUY').first().to_dto()   # type: ignore
+
+        lot_checkpoint_repository.save_checkpoints(
+            account_default, 'AAPL', [LotCheckpointDTO(date=date, open_lots=[OpenLotDTO(buy, Decimal(3))])], lambda: True)
+
+        result = lot_checkpoint_repository.get_latest_checkpoints(account_default, ['AAPL'], date)
+        assert [open_lot.quantity for open_lot in result['AAPL'].open_lots] == [Decimal(3)]
+
+    def test_when_disabled_then_operation_saved_without_derived_data_queries(self, settings, account_default, sample_operations, create_date):
+        settings.PROFITS_LOT_CHECKPOINTS = False
+        settings.PROFITS_REALIZED_GAINS = False
+
+        with CaptureQueriesContext(connection) as queries:
+            Operation.objects.update_or_create(
+                account=account_default, ticker='AAPL', date=create_date('2023-01-10'), defaults={'quantity': Decimal(11)})
+
+        sqls = [query['sql'] for query in queries.captured_queries]
+        assert not [sql for sql in sqls if 'profits_lotcheckpoint' in sql or 'profits_realizedgain' in sql]
+        # Only the select for update of `update_or_create`, not the previous values of the operation
+        assert len([sql for sql in sqls if sql.startswith('SELECT') and 'profits_operation' in sql]) == 1
+
+    def test_when_boundary_not_in_every_year_then_error(self):
+        with pytest.raises(ValueError, match='02-29'):
+            LotCheckpointService(LotCheckpointRepository(), 2, 29)
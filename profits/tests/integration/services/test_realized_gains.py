@@ -0,0 +1,193 @@
+import threading
+import pytest
+
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.db import connections, transaction
+
+from profits.models import Operation, RealizedGain, RealizedGainTicker
+from profits.repositories.realized_gain_repository import PROFIT_EXCHANGE_DTO_COLUMNS, RealizedGainRepository
+
+
+def quantize(value, places):
+    return value.quantize(Decimal(1).scaleb(-places)) if value is not None else None
+
+@pytest.fixture(autouse=True)
+def realized_gains_enabled(settings):
+    """
+    Realized gains are only invalidated by the signals when enabled.
+    """
+    settings.PROFITS_REALIZED_GAINS = True
+
+@pytest.fixture
+def sample_operations(create_operation, create_currency_exchange, create_date, currency_usd, currency_gbp):
+    create_currency_exchange(date=create_date('2022-01-01'), origin=currency_gbp, target=currency_usd, rate=Decimal('1.3'))
+    create_currency_exchange(date=create_date('2023-06-01'), origin=currency_gbp, target=currency_usd, rate=Decimal('1.25'))
+    for ticker in ['AAPL', 'MSFT']:
+        create_operation(ticker=ticker, type='BUY', date=create_date('2022-01-15'), quantity=Decimal(10), 
+                         amount_total=Decimal(1000), currency=currency_usd)
+        create_operation(ticker=ticker, type='BUY', date=create_date('2022-02-15'), quantity=Decimal(5), 
+                         amount_total=Decimal(600), currency=currency_gbp)
+        create_operation(ticker=ticker, type='SELL', date=create_date('2022-06-15'), quantity=Decimal(4), 
+                         amount_total=Decimal(450), currency=currency_usd)
+        create_operation(ticker=ticker, type='SELL', date=create_date('2023-06-15'), quantity=Decimal(9), 
+                         amount_total=Decimal(1300), currency=currency_usd)
+
+
+@pytest.mark.django_db
+class TestRealizedGains:
+
+    def test_when_total_details_then_same_as_replay_at_field_precision(self, create_profit_service, account_default, sample_operations, create_date):
+        date_start, date_end = create_date('2023-01-01'), create_date('2023-12-31')
+        expected_details = create_profit_service().get_total_details(account_default, date_start, date_end)
+
+        result = create_profit_service(realized_gains=True).get_total_details(account_default, date_start, date_end)
+
+        assert [details['ticker'] for details in result] == [details['ticker'] for details in expected_details]
+        for details, expected in zip(result, expected_details):
+            assert len(details['profit_details']) == len(expected['profit_details']) == 2
+            for profit, expected_profit in zip(details['profit_details'], expected['profit_details']):
+                for column in PROFIT_EXCHANGE_DTO_COLUMNS:
+                    field = RealizedGain._meta.get_field(column)
+                    expected_value = getattr(expected_profit, column)
+                    if isinstance(expected_value, Decimal):
+                        expected_value = quantize(expected_value, field.decimal_places)   # type: ignore
+                    assert getattr(profit, column) == expected_value, column
+
+    def test_when_total_then_sum_of_period_gains(self, create_profit_service, account_default, sample_operations, create_date):
+        date_start, date_end = create_date('2022-01-01'), create_date('2022-12-31')
+        expected_details = create_profit_service().get_total_details(account_default, date_start, date_end)
+
+        result = create_profit_service(realized_gains=True).get_total(account_default, date_start, date_end)
+
+        # Stored gains are rounded to the field precision before adding them up
+        assert result == sum(
+            quantize(profit.profit_exchange, 7) for details in expected_details for profit in details['profit_details'])
+
+    def test_when_gains_up_to_date_then_operations_not_replayed(self, create_profit_service, account_default, sample_operations, mocker):
+        create_profit_service(realized_gains=True).get_total(account_default, None, None)
+        profit_service = create_profit_service(realized_gains=True)
+        get_account_operations_spy = mocker.spy(profit_service.operation_repository, 'get_account_operations')
+
+        profit_service.get_total(account_default, None, None)
+
+        get_account_operations_spy.assert_not_called()
+
+    def test_when_operation_created_then_only_its_ticker_calculated_again(
+            self, create_profit_service, account_default, sample_operations, create_operation, create_date, mocker):
+        total = create_profit_service(realized_gains=True).get_total(account_default, None, None)
+        create_operation(ticker='MSFT', type='SELL', date=create_date('2023-07-01'), quantity=Decimal(1), amount_total=Decimal(200))
+        assert not RealizedGain.objects.filter(account=account_default, ticker='MSFT').exists()
+        profit_service = create_profit_service(realized_gains=True)
+        get_account_operations_spy = mocker.spy(profit_service.operation_repository, 'get_account_operations')
+
+        result = profit_service.get_total(account_default, None, None)
+
+        get_account_operations_spy.assert_called_once_with(account_default, ['MSFT'], None)
+        assert result > total
+
+    def test_when_operation_created_in_bulk_then_only_its_ticker_calculated_again(
+            self, create_profit_service, account_default, sample_operations, currency_gbp, create_date, mocker):
+        total = create_profit_service(realized_gains=True).get_total(account_default, None, None)
+        # Without signals, so the gains are only found stale by the stamp of the operations
+        Operation.objects.bulk_create([Operation(
+            account=account_default, ticker='MSFT', type='SELL', date=create_date('2023-07-01'), quantity=Decimal(1), 
+            amount_total=Decimal(200), currency=currency_gbp, exchange=Decimal(1))])
+        profit_service = create_profit_service(realized_gains=True)
+        get_account_operations_spy = mocker.spy(profit_service.operation_repository, 'get_account_operations')
+
+        result = profit_service.get_total(account_default, None, None)
+
+        get_account_operations_spy.assert_called_once_with(account_default, ['MSFT'], None)
+        assert result > total
+
+    def test_when_operation_deleted_then_ticker_gains_deleted(self, create_profit_service, account_default, sample_operations, create_date):
+        create_profit_service(realized_gains=True).get_total(account_default, None, None)
+
+        account_default.operation_set.filter(ticker='AAPL', date=create_date('2023-06-15')).delete()   # type: ignore
+
+        assert not RealizedGainTicker.objects.filter(account=account_default, ticker='AAPL').exists()
+        assert not RealizedGain.objects.filter(account=account_default, ticker='AAPL').exists()
+        assert RealizedGain.objects.filter(account=account_default, ticker='MSFT').exists()
+
+    def test_when_async_total_then_same_as_sync(self, create_profit_service, account_default, sample_operations, create_date):
+        date_start = create_date('2023-01-01')
+
+        result = async_to_sync(create_profit_service(realized_gains=True).aget_total)(account_default, date_start, None)
+
+        assert result == create_profit_service(realized_gains=True).get_total(account_default, date_start, None)
+        assert RealizedGainTicker.objects.filter(account=account_default).count() == 2
+
+
+# The concurrent refresh runs in another thread with its own connection, so the test data has to be committed
+@pytest.mark.django_db(transaction=True)
+class TestRealizedGainsConcurrent:
+
+    def test_when_refreshed_concurrently_then_gains_calculated_and_stored_once(
+            self, create_profit_service, account_default, sample_operations, mocker):
+        profit_service = create_profit_service(realized_gains=True)
+        calculate_tickers_gains = profit_service._calculate_tickers_gains
+        concurrent_totals = []
+
+        def refresh_concurrently():
+            try:
+                concurrent_totals.append(create_profit_service(realized_gains=True).get_total(account_default, None, None))
+            finally:
+                connections.close_all()
+
+        concurrent_refresh = threading.Thread(target=refresh_concurrently)
+        concurrent_blocked = []
+
+        def calculate_while_refreshed_concurrently(account, tickers):
+            concurrent_refresh.start()
+            concurrent_refresh.join(timeout=0.5)
+            concurrent_blocked.append(concurrent_refresh.is_alive())
+            return calculate_tickers_gains(account, tickers)
+
+        mocker.patch.object(profit_service, '_calculate_tickers_gains', side_effect=calculate_while_refreshed_concurrently)
+
+        total = profit_service.get_total(account_default, None, None)
+        concurrent_refresh.join()
+
+        # The concurrent refresh waits for the lock and then finds the tickers up to date
+        assert concurrent_blocked == [True]
+        assert concurrent_totals == [total]
+        assert RealizedGainTicker.objects.filter(account=account_default).count() == 2
+        assert RealizedGain.objects.filter(account=account_default).count() == 6
+
+
+# Gains are invalidated when the rates are committed
+@pytest.mark.django_db(transaction=True)
+class TestRealizedGainsCurrencyExchanges:
+
+    def test_when_currency_exchange_created_then_all_gains_deleted(
+            self, create_profit_service, account_default, sample_operations, create_currency_exchange, create_date, currency_gbp, currency_usd):
+        create_profit_service(realized_gains=True).get_total(account_default, None, None)
+
+        create_currency_exchange(date=create_date('2022-06-15'), origin=currency_gbp, target=currency_usd, rate=Decimal('1.2'))
+
+        assert not RealizedGainTicker.objects.exists()
+        assert not RealizedGain.objects.exists()
+
+    def test_when_currency_exchanges_created_in_transaction_then_gains_deleted_once_on_commit(
+            self, create_profit_service, account_default, sample_operations, create_currency_exchange, create_date, currency_gbp, currency_usd, mocker):
+        create_profit_service(realized_gains=True).get_total(account_default, None, None)
+        set_all_stale_spy = mocker.spy(RealizedGainRepository, 'set_all_stale')
+
+        with transaction.atomic():
+            for day in range(1, 11):
+                create_currency_exchange(date=create_date(f'2022-07-{day:02}'), origin=currency_gbp, target=currency_usd, rate=Decimal('1.2'))
+            assert RealizedGainTicker.objects.exists()
+
+        set_all_stale_spy.assert_called_once()
+        assert not RealizedGainTicker.objects.exists()
+
+    def test_when_disabled_then_currency_exchange_created_without_invalidation(
+            self, settings, create_currency_exchange, create_date, currency_gbp, currency_usd, mocker):
+        settings.PROFITS_REALIZED_GAINS = False
+        set_all_stale_spy = mocker.spy(RealizedGainRepository, 'set_all_stale')
+
+        create_currency_exchange(date=create_date('2022-06-15'), origin=currency_gbp, target=currency_usd, rate=Decimal('1.2'))
+
+        set_all_stale_spy.assert_not_called()
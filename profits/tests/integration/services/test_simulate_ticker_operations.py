@@ -0,0 +1,105 @@
+import pytest
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.models import Operation
+from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.open_lot_cache_repository import OpenLotCacheRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import ProfitServiceBuySellMissmatch, ProfitServiceInvalidOperations
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.profit_service import ProfitService
+
+
+@pytest.fixture
+def profit_service() -> ProfitService:
+    currency_service = CurrencyService(CurrencyRepository(), None, None)
+    return ProfitService(
+        OperationRepository(), currency_service, ProfitCalculator(ProfitExchanger(currency_service)),
+        open_lot_cache_repository=OpenLotCacheRepository())
+
+@pytest.fixture
+def sample_operations(create_operation, create_date):
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-02-01'), quantity=Decimal(10), amount_total=Decimal(1000))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-05-01'), quantity=Decimal(10), amount_total=Decimal(1500))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2023-03-01'), quantity=Decimal(5), amount_total=Decimal(1000))
+
+def operation_queries_count(queries: CaptureQueriesContext) -> int:
+    return len([query for query in queries.captured_queries if 'profits_operation' in query['sql']])
+
+
+@pytest.mark.django_db
+class TestSimulateTickerOperations:
+
+    def test_when_sell_then_profits_same_as_saved_operation(
+            self, profit_service, account_default, sample_operations, create_operation, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2024-01-01'), quantity=Decimal(10), currency='GBP', price_avg=Decimal(200))
+
+        result = profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        create_operation(ticker='AAPL', type='SELL', date=create_date('2024-01-01'), quantity=Decimal(10), amount_total=Decimal(2000))
+        expected = profit_service.get_total_details(account_default, create_date('2024-01-01'), None)
+        assert expected == [{'ticker': 'AAPL', 'profit_details': result}]
+        assert [profit.profit_exchange for profit in result] == [Decimal(500), Decimal(250)]
+
+    def test_when_buys_and_sells_then_only_simulated_sells_matched(self, profit_service, account_default, sample_operations, create_date):
+        operations = [
+            OperationDTO(type='SELL', date=create_date('2024-02-01'), quantity=Decimal(20), currency='GBP', price_avg=Decimal(100)),
+            OperationDTO(type='BUY', date=create_date('2024-01-01'), quantity=Decimal(5), currency='GBP', price_avg=Decimal(50)),
+        ]
+
+        result = profit_service.simulate_ticker_operations(account_default, 'AAPL', operations)
+
+        assert [(profit.sell_quantity, profit.profit_exchange) for profit in result] == [
+            (Decimal(5), Decimal(0)), (Decimal(10), Decimal(-500)), (Decimal(5), Decimal(250))]
+
+    def test_when_simulated_again_then_open_lots_from_cache(self, profit_service, account_default, sample_operations, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2024-01-01'), quantity=Decimal(1), currency='GBP', price_avg=Decimal(200))
+        profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        with CaptureQueriesContext(connection) as queries:
+            profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        # Only the stamp of the operations, to check the lots cached are still current
+        assert operation_queries_count(queries) == 1
+
+    def test_when_operation_saved_then_open_lots_cached_invalidated(
+            self, profit_service, account_default, sample_operations, create_operation, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2024-01-01'), quantity=Decimal(5), currency='GBP', price_avg=Decimal(200))
+        profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        create_operation(ticker='AAPL', type='SELL', date=create_date('2023-06-01'), quantity=Decimal(5), amount_total=Decimal(1000))
+        result = profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        assert [profit.profit_exchange for profit in result] == [Decimal(250)]
+
+    def test_when_operation_created_in_bulk_then_open_lots_cached_not_used(
+            self, profit_service, account_default, sample_operations, currency_gbp, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2024-01-01'), quantity=Decimal(5), currency='GBP', price_avg=Decimal(200))
+        profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        # Without signals, so the lots cached are only found stale by the stamp of the operations
+        Operation.objects.bulk_create([Operation(
+            account=account_default, ticker='AAPL', type='SELL', date=create_date('2023-06-01'), quantity=Decimal(5), 
+            amount_total=Decimal(1000), currency=currency_gbp, exchange=Decimal(1))])
+        result = profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+        assert [profit.profit_exchange for profit in result] == [Decimal(250)]
+
+    def test_when_operation_not_after_last_saved_then_exception(self, profit_service, account_default, sample_operations, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2023-03-01'), quantity=Decimal(1), currency='GBP', price_avg=Decimal(200))
+
+        with pytest.raises(ProfitServiceInvalidOperations):
+            profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
+
+    def test_when_more_sold_than_open_then_exception(self, profit_service, account_default, sample_operations, create_date):
+        sell = OperationDTO(type='SELL', date=create_date('2024-01-01'), quantity=Decimal(16), currency='GBP', price_avg=Decimal(200))
+
+        with pytest.raises(ProfitServiceBuySellMissmatch):
+            profit_service.simulate_ticker_operations(account_default, 'AAPL', [sell])
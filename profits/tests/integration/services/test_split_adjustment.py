@@ -0,0 +1,129 @@
+import pytest
+
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.operation_repository import OperationRepository
+from profits.repositories.split_repository import SplitRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.services.position_history_service import PositionHistoryService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+
+
+@pytest.fixture
+def sample_operations(create_operation, create_split, create_date):
+    """
+    AAPL bought before a 1:2 split and a 1:3 split, and sold after each of them.
+    """
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-01-10'), quantity=Decimal(10), amount_total=Decimal(1000))
+    create_split(ticker='AAPL', date=datetime(2022, 3, 1).date(), origin=Decimal(1), target=Decimal(2))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2022-04-10'), quantity=Decimal(8), amount_total=Decimal(480))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-05-10'), quantity=Decimal(4), amount_total=Decimal(240))
+    create_split(ticker='AAPL', date=datetime(2022, 9, 1).date(), origin=Decimal(1), target=Decimal(3))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2022-10-10'), quantity=Decimal(48), amount_total=Decimal(960))
+
+
+@pytest.mark.django_db
+class TestSplitAdjustment:
+
+    def test_when_splits_then_operations_in_units_after_last_split(self, account_default, sample_operations):
+        result = OperationRepository(SplitRepository()).get_account_operations(account_default, ['AAPL'], None)
+
+        assert [(operation.quantity, operation.price_avg) for operation in result['AAPL']] == [
+            (Decimal(60), Decimal(100) / 6), (Decimal(24), Decimal(20)), (Decimal(12), Decimal(20)), (Decimal(48), Decimal(20))]
+
+    def test_when_splits_then_all_quantity_bought_sold(self, create_profit_service, account_default, sample_operations):
+        result = create_profit_service(split_adjusted=True).get_total_details(account_default, None, None)
+
+        assert sum(profit.sell_quantity for profit in result[0]['profit_details']) == Decimal(72)
+
+    def test_when_splits_then_open_lots_loaded_same_as_replay(self, account_default, sample_operations, create_date):
+        date_start = create_date('2022-06-01')
+        operation_repository = OperationRepository(SplitRepository())
+        tickers_operations = operation_repository.get_account_operations(account_default, ['AAPL'], None)
+
+        result = operation_repository.get_account_operations_open_at(account_default, ['AAPL'], date_start, None)
+
+        lot_ledger = LotLedger()
+        operations_before = [operation for operation in tickers_operations['AAPL'] if operation.date < date_start]
+        ProfitCalculator(ProfitExchanger(CurrencyService(CurrencyRepository(), None, None))).replay_ticker_operations(operations_before, lot_ledger)
+        open_lots, _ = result['AAPL']
+        assert open_lots == lot_ledger.open_lots()
+
+    def test_when_split_index_cached_then_no_split_query(self, account_default, sample_operations):
+        operation_repository = OperationRepository(SplitRepository())
+        operation_repository.get_account_operations(account_default, ['AAPL'], None)
+
+        with CaptureQueriesContext(connection) as queries:
+            operation_repository.get_account_operations(account_default, ['AAPL'], None)
+
+        assert len(queries) == 1
+
+    def test_when_split_created_then_split_index_invalidated(self, account_default, sample_operations, create_split):
+        SplitRepository.get_split_index()
+
+        create_split(ticker='AAPL', date=datetime(2023, 1, 1).date(), origin=Decimal(1), target=Decimal(10))
+
+        assert SplitRepository.get_split_index().factor('AAPL', datetime(2022, 12, 1).date()) == Decimal(10)
+
+    def test_when_splits_and_open_lots_only_then_same_total(self, create_profit_service, account_default, sample_operations, create_date):
+        expected = create_profit_service(split_adjusted=True).get_total(account_default, create_date('2022-06-01'), None)
+
+        result = create_profit_service(split_adjusted=True, load_open_lots_only=True).get_total(account_default, create_date('2022-06-01'), None)
+
+        assert result == expected
+
+
+@pytest.fixture
+def reverse_split_operations(create_operation, create_split, create_date):
+    """
+    A 3 to 1 reverse split, so a share before it is a third of a share after it.
+    """
+    create_split(ticker='AAPL', date=datetime(2022, 6, 1).date(), origin=Decimal(3), target=Decimal(1))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-01-10'), quantity=Decimal(1), amount_total=Decimal(100))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-02-10'), quantity=Decimal(1), amount_total=Decimal(100))
+    create_operation(ticker='AAPL', type='SELL', date=create_date('2022-03-10'), quantity=Decimal(2), amount_total=Decimal(300))
+    create_operation(ticker='MSFT', type='BUY', date=create_date('2022-01-10'), quantity=Decimal(2), amount_total=Decimal(200))
+    create_operation(ticker='MSFT', type='SELL', date=create_date('2022-02-10'), quantity=Decimal(1), amount_total=Decimal(150))
+    create_operation(ticker='MSFT', type='SELL', date=create_date('2022-03-10'), quantity=Decimal(1), amount_total=Decimal(150))
+    create_split(ticker='MSFT', date=datetime(2022, 6, 1).date(), origin=Decimal(3), target=Decimal(1))
+    create_operation(ticker='AAPL', type='BUY', date=create_date('2022-07-10'), quantity=Decimal(1), amount_total=Decimal(300))
+
+
+@pytest.mark.django_db
+class TestSplitAdjustmentNotFiniteDecimal:
+
+    def test_when_bought_and_sold_in_full_then_no_quantity_left(self, create_profit_service, account_default, reverse_split_operations):
+        result = create_profit_service(split_adjusted=True).get_total_details(account_default, None, None)
+
+        assert [profit.sell_quantity for profit in result[0]['profit_details']] == [Decimal(1) / 3, Decimal(1) / 3]
+        assert [profit.sell_quantity for profit in result[1]['profit_details']] == [Decimal(1) / 3, Decimal(1) / 3]
+        assert sum(profit.profit_exchange for details in result for profit in details['profit_details']) == Decimal(200)
+
+    def test_when_positions_then_in_shares_without_sold_remainder(self, create_profit_service, account_default, reverse_split_operations):
+        result = create_profit_service(split_adjusted=True).get_total_positions(account_default, None, None)
+
+        assert [(position['ticker'], position['quantity'], position['cost_basis']) for position in result['positions']] == [
+            ('AAPL', Decimal(1), Decimal(300))]
+
+    def test_when_position_history_then_in_shares(self, account_default, reverse_split_operations, create_date):
+        position_history_service = PositionHistoryService(OperationRepository(SplitRepository()), CurrencyService(CurrencyRepository(), None, None))
+
+        result = position_history_service.get_position_history(account_default, create_date('2022-02-15'), create_date('2022-07-10'))
+
+        assert [(position['ticker'], position['quantities'][0], position['quantities'][-1]) for position in result['positions']] == [
+            ('AAPL', Decimal(2) / 3, Decimal(1)), ('MSFT', Decimal(1) / 3, Decimal(0))]
+
+    def test_when_open_lots_only_then_same_as_replay(self, create_profit_service, account_default, reverse_split_operations, create_date):
+        date_start = create_date('2022-05-01')
+        expected = create_profit_service(split_adjusted=True).get_total_details(account_default, date_start, None)
+
+        result = create_profit_service(split_adjusted=True, load_open_lots_only=True).get_total_details(account_default, date_start, None)
+
+        assert result == expected
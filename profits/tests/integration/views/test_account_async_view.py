@@ -0,0 +1,111 @@
+import base64
+import pytest
+
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.throttling import AnonRateThrottle
+
+from profits.views.account_async_view import _ReportView
+from profits.views.account_view import AccountViewSet
+
+
+@pytest.fixture
+def async_client() -> AsyncClient:
+    return AsyncClient()
+
+@pytest.fixture
+def sample_operations(create_operation, create_currency_exchange, create_date, currency_usd, currency_gbp):
+    create_currency_exchange(date=create_date('2023-01-01'), origin=currency_usd, target=currency_gbp, rate=Decimal('0.8'))
+    create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+    create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('60'), amount_total=Decimal('9000'))
+    create_operation(ticker='TSLA', type='BUY', date=create_date('2023-02-15'), quantity=Decimal('10'), amount_total=Decimal('2000'), 
+                     currency=currency_usd)
+    create_operation(ticker='TSLA', type='SELL', date=create_date('2023-07-01'), quantity=Decimal('5'), amount_total=Decimal('1500'), 
+                     currency=currency_usd)
+
+def get_streaming(async_client: AsyncClient, url: str) -> tuple:
+    """
+    Requests and reads the streamed content in the same event loop, as async generators left are closed with their loop.
+    """
+    async def _get_streaming():
+        response = await async_client.get(url)
+        return response, b''.join([chunk async for chunk in response.streaming_content])
+    return async_to_sync(_get_streaming)()
+
+
+@pytest.mark.django_db
+class TestAccountAsyncView:
+
+    @pytest.mark.parametrize("params", [{}, {'date_start': '2023-06-01', 'date_end': '2023-12-31'}, {'matching_method': 'hmrc'}])
+    def test_total_when_operations_then_same_as_sync(self, authenticated_client, async_client, account_default, sample_operations, params):
+        expected = authenticated_client.get(reverse('account-total', args=[account_default.id]), params)
+
+        response = async_to_sync(async_client.get)(reverse('account-total-async', args=[account_default.id]), params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == expected.json()
+        assert Decimal(response.json()['profit_total']) == Decimal('3000') + Decimal('400')
+
+    def test_total_when_account_not_found(self, async_client):
+        response = async_to_sync(async_client.get)(reverse('account-total-async', args=[999999]))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize("params", [{'date_start': 'invalid'}, {'matching_method': 'lifo'}])
+    def test_total_when_invalid_parameters(self, async_client, account_default, params):
+        response = async_to_sync(async_client.get)(reverse('account-total-async', args=[account_default.id]), params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.json()
+
+    def test_total_details_when_operations_then_same_csv_as_sync(self, authenticated_client, async_client, account_default, sample_operations):
+        expected = authenticated_client.get(reverse('account-total-details', args=[account_default.id]))
+
+        response, content = get_streaming(async_client, reverse('account-total-details-async', args=[account_default.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Disposition'] == expected['Content-Disposition']
+        assert content == b''.join(expected.streaming_content)
+        assert content.count(b'\r\n') == 3
+
+    def test_total_details_when_sell_without_buys_then_error_before_streaming(
+            self, async_client, account_default, create_operation, create_date):
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('100'))
+
+        response = async_to_sync(async_client.get)(reverse('account-total-details-async', args=[account_default.id]))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.json()
+
+    @pytest.mark.parametrize("url_name", ['account-total-async', 'account-total-details-async'])
+    def test_when_throttled_then_same_as_sync(self, mocker, api_client, async_client, account_default, url_name):
+        mocker.patch.object(_ReportView, 'throttle_classes', [AnonRateThrottle])
+        mocker.patch.object(AccountViewSet, 'throttle_classes', [AnonRateThrottle])
+        mocker.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '1/day'})
+        cache.clear()
+
+        first = async_to_sync(async_client.get)(reverse(url_name, args=[account_default.id]))
+        response = async_to_sync(async_client.get)(reverse(url_name, args=[account_default.id]))
+        # The sync and async views share the throttle rate
+        expected = api_client.get(reverse('account-total', args=[account_default.id]))
+        cache.clear()
+
+        assert first.status_code == status.HTTP_200_OK
+        assert response.status_code == expected.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.json() == expected.json()
+        assert response['Retry-After'] == expected['Retry-After']
+
+    def test_when_invalid_credentials_then_same_as_sync(self, api_client, async_client, account_default):
+        headers = {'Authorization': f"Basic {base64.b64encode(b'unknown:password').decode()}"}
+        expected = api_client.get(reverse('account-total', args=[account_default.id]), headers=headers)
+
+        response = async_to_sync(async_client.get)(reverse('account-total-async', args=[account_default.id]), headers=headers)
+
+        assert response.status_code == expected.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json() == expected.json()
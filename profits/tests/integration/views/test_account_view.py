@@ -3,12 +3,14 @@ import pytest
 from datetime import datetime
 from decimal import Decimal
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse
 from django.utils.timezone import make_aware
 
 from rest_framework import status
 
-from profits.models import Account
+from profits.models import Account, Operation
+from profits.services.profit_service import ProfitService
 
 @pytest.mark.django_db
 class TestAccountViewSet:
@@ -253,7 +255,7 @@ class TestAccountViewSet:
         assert response['Content-Type'] == 'text/csv'
         assert 'attachment; filename=' in response['Content-Disposition']
         
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         csv_lines = content.split('\n')
         assert len(csv_lines) == 3 # Header + data row + '\n' empty line at the end
         
@@ -317,6 +319,224 @@ class TestAccountViewSet:
         assert response['Content-Type'] == 'text/csv'
         assert 'attachment; filename=' in response['Content-Disposition']
         
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         csv_lines = content.split('\n')
         assert len(csv_lines) == 3 # Header + data row + '\n' empty line at the end
+
+    def test_period_totals_when_operations_in_several_tax_years(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-period-totals', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2022-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='SELL', date=create_date('2022-03-01'), quantity=Decimal('50'), amount_total=Decimal('6000'))
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('50'), amount_total=Decimal('4000'))
+
+        response = authenticated_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [period['profit_total'] for period in response.data['period_totals']] == [Decimal('1000'), Decimal('0'), Decimal('-1000')]
+        assert response.data['period_totals'][0]['date_start'] == make_aware(datetime(2021, 4, 6))
+
+    def test_period_totals_when_invalid_year_start(self, authenticated_client, account_default):
+        url = reverse('account-period-totals', args=[account_default.id])
+
+        response = authenticated_client.get(url, {'year_start': '13-01'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_period_totals_when_year_start_not_in_every_year(self, authenticated_client, account_default):
+        url = reverse('account-period-totals', args=[account_default.id])
+
+        response = authenticated_client.get(url, {'year_start': '02-29'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['error'] == "Invalid year start 02-29, expected a month and day that exist in every year (not 02-29)."
+
+    def test_period_totals_when_year_start_setting_not_in_every_year(self, settings, authenticated_client, account_default):
+        settings.PROFITS_REPORT_YEAR_START = (2, 29)
+        url = reverse('account-period-totals', args=[account_default.id])
+
+        with pytest.raises(ImproperlyConfigured, match='PROFITS_REPORT_YEAR_START'):
+            authenticated_client.get(url)
+
+    def test_totals_when_several_accounts(self, authenticated_client, create_account, create_operation, create_date):
+        url = reverse('account-totals')
+        accounts = [create_account(user_broker_ref=f'REF{index}') for index in range(2)]
+        for index, account in enumerate(accounts):
+            create_operation(account=account, type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+            create_operation(account=account, type='SELL', date=create_date('2023-06-01'), quantity=Decimal('100'), amount_total=Decimal(11000 + index))
+
+        response = authenticated_client.post(
+            url, {'account_ids': [accounts[1].id, accounts[0].id, 99999], 'date_start': '2023-01-01'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['date_start'] == make_aware(datetime(2023, 1, 1))
+        assert response.data['totals'] == [
+            {'id': accounts[1].id, 'profit_total': Decimal('1001'), 'error': None},
+            {'id': accounts[0].id, 'profit_total': Decimal('1000'), 'error': None},
+            {'id': 99999, 'profit_total': None, 'error': 'Account not found.'},
+        ]
+
+    @pytest.mark.parametrize("data", [{}, {'account_ids': 'all'}, {'account_ids': [1], 'date_end': 'invalid-date'}])
+    def test_totals_when_invalid_parameters(self, authenticated_client, data):
+        url = reverse('account-totals')
+
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_total_details_when_sell_without_buys_then_error_before_streaming(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-total-details', args=[account_default.id])
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('100'))
+
+        response = authenticated_client.get(url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_positions_when_lots_open(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-positions', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='BUY', date=create_date('2023-02-15'), quantity=Decimal('100'), amount_total=Decimal('12000'))
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('150'), amount_total=Decimal('18000'))
+        create_operation(type='BUY', date=create_date('2023-03-15'), ticker='TSLA', quantity=Decimal('10'), amount_total=Decimal('2000'))
+
+        response = authenticated_client.get(url, {'date_end': '2023-12-31'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['profit_total'] == Decimal('2000')
+        assert response.data['positions'] == [
+            {'ticker': 'AAPL', 'quantity': Decimal('50'), 'average_cost': Decimal('120'), 'cost_basis': Decimal('6000')},
+            {'ticker': 'TSLA', 'quantity': Decimal('10'), 'average_cost': Decimal('200'), 'cost_basis': Decimal('2000')},
+        ]
+
+    def test_positions_when_sell_without_buys(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-positions', args=[account_default.id])
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('100'))
+
+        response = authenticated_client.get(url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_total_when_hmrc_matching_method_then_buy_after_period_matched(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-total', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='SELL', date=create_date('2023-12-20'), quantity=Decimal('100'), amount_total=Decimal('12000'))
+        create_operation(type='BUY', date=create_date('2024-01-10'), quantity=Decimal('100'), amount_total=Decimal('11000'))
+
+        response_fifo = authenticated_client.get(url, {'date_start': '2023-01-01', 'date_end': '2023-12-31'})
+        response_hmrc = authenticated_client.get(url, {'date_start': '2023-01-01', 'date_end': '2023-12-31', 'matching_method': 'hmrc'})
+
+        assert response_fifo.data['profit_total'] == Decimal('2000')
+        assert response_hmrc.data['profit_total'] == Decimal('1000')
+
+    def test_total_when_invalid_matching_method(self, authenticated_client, account_default):
+        url = reverse('account-total', args=[account_default.id])
+
+        response = authenticated_client.get(url, {'matching_method': 'lifo'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_totals_when_section104_matching_method(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-totals')
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='BUY', date=create_date('2023-02-15'), quantity=Decimal('100'), amount_total=Decimal('20000'))
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('100'), amount_total=Decimal('18000'))
+
+        response = authenticated_client.post(url, {'account_ids': [account_default.id], 'matching_method': 'section104'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['totals'] == [{'id': account_default.id, 'profit_total': Decimal('3000'), 'error': None}]
+
+    def test_totals_when_invalid_matching_method(self, authenticated_client, account_default):
+        url = reverse('account-totals')
+
+        response = authenticated_client.post(url, {'account_ids': [account_default.id], 'matching_method': 'lifo'}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_simulate_when_sell_after_operations(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-simulate', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='SELL', date=create_date('2023-06-01'), quantity=Decimal('50'), amount_total=Decimal('6000'))
+        data = {'ticker': 'AAPL', 'operations': [{'type': 'SELL', 'date': '2024-01-10T00:00:00Z', 'quantity': '20', 'price': '150'}]}
+
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['profit_total'] == Decimal('1000')
+        assert [profit['sell_quantity'] for profit in response.data['profit_details']] == [Decimal('20')]
+        assert Operation.objects.filter(account=account_default).count() == 2
+
+    def test_simulate_when_ticker_lower_case_then_upper_case(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-simulate', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        data = {'ticker': ' aapl ', 'operations': [{'type': 'SELL', 'date': '2024-01-10T00:00:00Z', 'quantity': '20', 'price': '150'}]}
+
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['ticker'] == 'AAPL'
+        assert response.data['profit_total'] == Decimal('1000')
+
+    @pytest.mark.parametrize("ticker", ['', 'AA PL', 'AAPL;', 'AAPLAAPLAAPL'])
+    def test_simulate_when_invalid_ticker(self, authenticated_client, account_default, ticker):
+        url = reverse('account-simulate', args=[account_default.id])
+        data = {'ticker': ticker, 'operations': [{'type': 'SELL', 'date': '2024-01-10T00:00:00Z', 'quantity': '20', 'price': '150'}]}
+
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data['error']) == {'ticker'}
+
+    @pytest.mark.parametrize("operations", [
+        [],
+        [{'type': 'SELL', 'date': '2023-01-01T00:00:00Z', 'quantity': '20', 'price': '150'}],
+        [{'type': 'SELL', 'date': '2024-01-10T00:00:00Z', 'quantity': '200', 'price': '150'}],
+    ])
+    def test_simulate_when_invalid_operations(self, authenticated_client, account_default, create_operation, create_date, operations):
+        url = reverse('account-simulate', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+
+        response = authenticated_client.post(url, {'ticker': 'AAPL', 'operations': operations}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_simulate_when_unexpected_error_then_message_not_returned(
+            self, authenticated_client, account_default, create_operation, create_date, mocker):
+        url = reverse('account-simulate', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-15'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        mocker.patch.object(ProfitService, 'simulate_ticker_operations', side_effect=RuntimeError('connection to 10.0.0.1 refused'))
+        data = {'ticker': 'AAPL', 'operations': [{'type': 'SELL', 'date': '2024-01-10T00:00:00Z', 'quantity': '20', 'price': '150'}]}
+
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['error'] == f"Error simulating operations of AAPL for accountId {account_default.id}."
+
+    def test_position_history_when_operations(self, authenticated_client, account_default, create_operation, create_date):
+        url = reverse('account-position-history', args=[account_default.id])
+        create_operation(type='BUY', date=create_date('2023-01-02'), quantity=Decimal('100'), amount_total=Decimal('10000'))
+        create_operation(type='SELL', date=create_date('2023-01-04'), quantity=Decimal('40'), amount_total=Decimal('6000'))
+
+        response = authenticated_client.get(url, {'date_start': '2023-01-01', 'date_end': '2023-01-05', 'valued': 'true'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['dates']) == 5
+        assert response.data['positions'] == [{
+            'ticker': 'AAPL',
+            'quantities': [Decimal('0'), Decimal('100'), Decimal('100'), Decimal('60'), Decimal('60')],
+            'values': [Decimal('0'), Decimal('10000'), Decimal('10000'), Decimal('9000'), Decimal('9000')],
+        }]
+
+    def test_position_history_when_invalid_frequency(self, authenticated_client, account_default):
+        url = reverse('account-position-history', args=[account_default.id])
+
+        response = authenticated_client.get(url, {'frequency': 'monthly'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
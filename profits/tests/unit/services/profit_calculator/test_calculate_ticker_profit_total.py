@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.vectorized_matcher import match_fifo
+
+RATES = {'GBP': Decimal(1), 'USD': Decimal('0.781234'), 'EUR': Decimal('0.853921')}
+
+
+class TestCalculateTickerProfitTotal:
+    @pytest.fixture
+    def profit_exchanger(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return ProfitExchanger(currency_service_mock)
+
+    def test_when_no_operations_then_returns_zero(self, profit_exchanger):
+        result = ProfitCalculator(profit_exchanger).calculate_ticker_profit_total([])
+
+        assert result == Decimal(0)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_operations_then_same_total_as_profit_details(self, profit_exchanger, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 300, tuple(RATES))
+        profit_calculator = ProfitCalculator(profit_exchanger)
+        expected_total = sum(profit.profit_exchange for profit in profit_calculator.calculate_ticker_profits(ticker_operations))
+
+        result = profit_calculator.calculate_ticker_profit_total(ticker_operations)
+
+        assert result == expected_total
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_above_vectorized_threshold_then_same_total_with_vectorized_matcher(
+            self, profit_exchanger, create_random_operations, mocker, seed):
+        ticker_operations = create_random_operations(seed, 300, tuple(RATES))
+        expected_total = ProfitCalculator(profit_exchanger).calculate_ticker_profit_total(ticker_operations)
+        match_fifo_spy = mocker.patch('profits.services.profit_calculator.match_fifo', wraps=match_fifo)
+
+        result = ProfitCalculator(profit_exchanger, vectorized_threshold=1).calculate_ticker_profit_total(ticker_operations)
+
+        assert result == expected_total
+        match_fifo_spy.assert_called_once()
+
+    def test_when_operations_then_no_profit_dtos_created(self, create_random_operations):
+        profit_exchanger_mock = Mock(spec=ProfitExchanger)
+        profit_exchanger_mock.exchange_profit.return_value = Decimal(1)
+        ticker_operations = create_random_operations(1, 100)
+
+        ProfitCalculator(profit_exchanger_mock).calculate_ticker_profit_total(ticker_operations)
+
+        profit_exchanger_mock.exchange_currencies.assert_not_called()
+        assert profit_exchanger_mock.exchange_profit.call_count > 0
+
+    def test_when_sell_quantity_bigger_than_buy_then_raises_exception(self, profit_exchanger):
+        ticker_operations = [
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, tzinfo=timezone.utc), quantity=Decimal('10'), currency='GBP', price_avg=Decimal('1')),
+            OperationDTO(type='SELL', date=datetime(2024, 2, 1, tzinfo=timezone.utc), quantity=Decimal('11'), currency='GBP', price_avg=Decimal('1')),
+        ]
+
+        with pytest.raises(ValueError):
+            ProfitCalculator(profit_exchanger).calculate_ticker_profit_total(ticker_operations)
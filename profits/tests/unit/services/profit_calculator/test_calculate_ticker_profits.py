@@ -7,6 +7,8 @@ from datetime import datetime, timezone
 from profits.services.profit_calculator import ProfitCalculator
 from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.interfaces.dtos.profit_dto import ProfitDTO, ProfitExchangeDTO
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.services.lot_ledger import LotLedger
 from profits.services.profit_exchanger import ProfitExchanger
 
 
@@ -136,3 +138,20 @@ class TestCalculateTickerProfits:
         for call, expected_profit in zip(calls, expected_profits):
             # adding "{}" to verify that no keyword parameters are passed
             assert call == ((expected_profit, 'GBP'), {})
+
+    def test_when_lot_ledger_given_then_holds_open_lots_after_replay(self, profit_calculator_mock, profit_exchanger_mock, mock_operation_dto):
+        buy_first = mock_operation_dto(type='BUY', quantity=Decimal('10'))
+        buy_second = mock_operation_dto(type='BUY', quantity=Decimal('10'))
+        ticker_operations = [
+            buy_first,
+            buy_second,
+            mock_operation_dto(type='SELL', quantity=Decimal('15'))
+        ]
+        lot_ledger = LotLedger()
+
+        profit_calculator_mock.calculate_ticker_profits(ticker_operations, lot_ledger=lot_ledger)
+
+        assert profit_exchanger_mock.exchange_currencies.call_count == 2
+        assert lot_ledger.open_lots() == [OpenLotDTO(buy=buy_second, quantity=Decimal('5'))]
+        assert buy_first.quantity == Decimal('10')
+        assert buy_second.quantity == Decimal('10')
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+
+RATES = {'GBP': Decimal(1), 'USD': Decimal('0.781234')}
+
+
+class TestCalculateTickerProfitsVectorized:
+    @pytest.fixture
+    def profit_exchanger(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return ProfitExchanger(currency_service_mock)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_when_above_threshold_then_same_profits_as_scalar(self, profit_exchanger, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 500, tuple(RATES))
+
+        expected_ledger = LotLedger()
+        expected_profits = ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations, lot_ledger=expected_ledger)
+        lot_ledger = LotLedger()
+        result = ProfitCalculator(profit_exchanger, vectorized_threshold=1).calculate_ticker_profits(ticker_operations, lot_ledger=lot_ledger)
+
+        assert result == expected_profits
+        assert lot_ledger.open_lots() == expected_ledger.open_lots()
+
+    def test_when_lot_ledger_given_then_replay_starts_from_open_lots(self, profit_exchanger, create_random_operations):
+        ticker_operations = create_random_operations(20, 200)
+
+        expected_profits = ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
+        profit_calculator = ProfitCalculator(profit_exchanger, vectorized_threshold=1)
+        lot_ledger = LotLedger()
+        result = profit_calculator.calculate_ticker_profits(ticker_operations[:100], lot_ledger=lot_ledger)
+        result += profit_calculator.calculate_ticker_profits(ticker_operations[100:], lot_ledger=lot_ledger)
+
+        assert result == expected_profits
+
+    def test_when_sell_quantity_bigger_than_buy_then_raises_exception(self, profit_exchanger):
+        ticker_operations = [
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, tzinfo=timezone.utc), quantity=Decimal('10'), currency='GBP', price_avg=Decimal('1')),
+            OperationDTO(type='SELL', date=datetime(2024, 2, 1, tzinfo=timezone.utc), quantity=Decimal('11'), currency='GBP', price_avg=Decimal('1')),
+        ]
+
+        with pytest.raises(ValueError) as e:
+            ProfitCalculator(profit_exchanger, vectorized_threshold=1).calculate_ticker_profits(ticker_operations)
+
+        assert '1.0000000 stocks left to sell' in str(e.value)
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import random
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+
+RATES = {'GBP': Decimal(1), 'USD': Decimal('0.781234')}
+
+
+class TestCoalesceLots:
+    @pytest.fixture
+    def profit_exchanger(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return ProfitExchanger(currency_service_mock)
+
+    @pytest.fixture
+    def plan_operations(self):
+        def _plan_operations(seed: int) -> list[OperationDTO]:
+            """
+            Operations of a recurring purchase plan: several BUYs a day at the same price, and SELLs of part of the position.
+            """
+            generator = random.Random(seed)
+            date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+            quantity_open = Decimal(0)
+            operations = []
+            for _ in range(100):
+                date += timedelta(days=generator.randint(1, 10))
+                currency = generator.choice(tuple(RATES))
+                price_avg = Decimal(generator.randint(100, 200))
+                for minute in range(generator.randint(1, 4)):
+                    quantity = Decimal(generator.randint(1, 100))
+                    quantity_open += quantity
+                    operations.append(OperationDTO(
+                        type='BUY', date=date + timedelta(minutes=minute), quantity=quantity, currency=currency, price_avg=price_avg))
+                if generator.random() < 0.5:
+                    quantity = Decimal(generator.randint(1, int(quantity_open)))
+                    quantity_open -= quantity
+                    operations.append(OperationDTO(
+                        type='SELL', date=date + timedelta(hours=1), quantity=quantity, currency=currency, price_avg=Decimal(generator.randint(100, 200))))
+            return operations
+        return _plan_operations
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_coalesce_lots_then_same_totals_with_less_matches(self, profit_exchanger, plan_operations, seed):
+        ticker_operations = plan_operations(seed)
+        expected = ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
+
+        result = ProfitCalculator(profit_exchanger, coalesce_lots=True).calculate_ticker_profits(ticker_operations)
+
+        assert len(result) < len(expected)
+        assert sum(profit.profit_exchange for profit in result) == sum(profit.profit_exchange for profit in expected)
+        assert sum(profit.sell_quantity for profit in result) == sum(profit.sell_quantity for profit in expected)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_coalesce_lots_vectorized_then_same_totals_as_scalar(self, profit_exchanger, plan_operations, seed):
+        ticker_operations = plan_operations(seed)
+        expected = ProfitCalculator(profit_exchanger, coalesce_lots=True).calculate_ticker_profit_total(ticker_operations)
+
+        result = ProfitCalculator(profit_exchanger, vectorized_threshold=0, coalesce_lots=True).calculate_ticker_profits(ticker_operations)
+
+        assert sum(profit.profit_exchange for profit in result) == expected
+
+    @pytest.fixture
+    def intraday_operations(self):
+        """
+        BUYs at the same price before and after SELLs of the same day, so lots could be merged after being consumed.
+        """
+        date = datetime(2024, 1, 1, 9, tzinfo=timezone.utc)
+        def operation(type: str, hours: int, quantity: str, price_avg: str = '100') -> OperationDTO:
+            return OperationDTO(type=type, date=date + timedelta(hours=hours), quantity=Decimal(quantity), currency='GBP', price_avg=Decimal(price_avg))
+        return [
+            operation('BUY', 0, '10'), operation('SELL', 1, '4', '110'), operation('BUY', 2, '10'), operation('BUY', 3, '5', '101'),
+            operation('BUY', 4, '5', '101'), operation('SELL', 5, '3', '120'), operation('BUY', 6, '5', '101'), operation('SELL', 7, '20', '130'),
+            operation('BUY', 8, '5', '101')]
+
+    @pytest.mark.parametrize("seed", [None, *range(3)])
+    def test_when_coalesce_lots_vectorized_then_same_details_and_open_lots_as_scalar(
+            self, profit_exchanger, plan_operations, intraday_operations, seed):
+        ticker_operations = intraday_operations if seed is None else plan_operations(seed)
+        lot_ledger_expected = LotLedger()
+        expected = ProfitCalculator(profit_exchanger, coalesce_lots=True).calculate_ticker_profits(ticker_operations, lot_ledger=lot_ledger_expected)
+        lot_ledger = LotLedger()
+
+        result = ProfitCalculator(profit_exchanger, vectorized_threshold=0, coalesce_lots=True).calculate_ticker_profits(
+            ticker_operations, lot_ledger=lot_ledger)
+
+        assert result == expected
+        assert lot_ledger.open_lots() == lot_ledger_expected.open_lots()
+
+    def test_when_coalesce_lots_vectorized_from_open_lots_then_same_details_as_scalar(self, profit_exchanger, plan_operations):
+        ticker_operations = plan_operations(0)
+        middle = len(ticker_operations) // 2
+        lot_ledger_expected = LotLedger()
+        lot_ledger = LotLedger()
+        ProfitCalculator(profit_exchanger, coalesce_lots=True).replay_ticker_operations(ticker_operations[:middle], lot_ledger_expected)
+        ProfitCalculator(profit_exchanger, coalesce_lots=True).replay_ticker_operations(ticker_operations[:middle], lot_ledger)
+        expected = ProfitCalculator(profit_exchanger, coalesce_lots=True).calculate_ticker_profits(
+            ticker_operations[middle:], lot_ledger=lot_ledger_expected)
+
+        result = ProfitCalculator(profit_exchanger, vectorized_threshold=0, coalesce_lots=True).calculate_ticker_profits(
+            ticker_operations[middle:], lot_ledger=lot_ledger)
+
+        assert result == expected
+        assert lot_ledger.open_lots() == lot_ledger_expected.open_lots()
+
+    def test_when_preserve_lot_details_then_details_row_per_buy(self, profit_exchanger, plan_operations):
+        ticker_operations = plan_operations(0)
+        expected = ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
+        profit_calculator = ProfitCalculator(profit_exchanger, coalesce_lots=True, preserve_lot_details=True)
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert result == expected
+        assert profit_calculator.calculate_ticker_profit_total(ticker_operations) == sum(profit.profit_exchange for profit in expected)
+
+    def test_when_preserve_lot_details_then_replay_keeps_lot_per_buy(self, profit_exchanger, plan_operations):
+        ticker_operations = [operation for operation in plan_operations(0) if operation.type == 'BUY']
+        lot_ledger = LotLedger()
+
+        ProfitCalculator(profit_exchanger, coalesce_lots=True, preserve_lot_details=True).replay_ticker_operations(ticker_operations, lot_ledger)
+
+        assert len(lot_ledger) == len(ticker_operations)
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.fixed_point_profit_calculator import FixedPointProfitCalculator
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.utils.fixed_point_utils import round_div
+
+RATES = {
+    'GBP': Decimal(1),
+    'USD': Decimal('0.781234'),
+    # Inverse of a stored rate, as `CurrencyService` calculates when only the opposite pair is stored
+    'EUR': Decimal(1) / Decimal('1.172345'),
+}
+
+AMOUNT_FIELDS = [
+    'sell_quantity', 'sell_amount_total', 'buy_amount_total', 'profit',
+    'buy_amount_total_exchange', 'sell_amount_total_exchange', 'profit_exchange'
+]
+
+
+def quantize(value):
+    return value.quantize(Decimal('1e-7')) if value is not None else None
+
+
+class TestFixedPointProfitCalculator:
+    @pytest.fixture
+    def profit_exchanger(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return ProfitExchanger(currency_service_mock)
+
+    @pytest.mark.parametrize("numerator, denominator, expected", [
+        (10, 4, 2),
+        (14, 4, 4),
+        (11, 4, 3),
+        (-10, 4, -2),
+        (-11, 4, -3),
+        (9, 3, 3),
+    ])
+    def test_round_div_rounds_half_to_even(self, numerator, denominator, expected):
+        assert round_div(numerator, denominator) == expected
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_when_random_operations_then_same_profits_as_decimal_at_field_precision(self, profit_exchanger, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 300, tuple(RATES))
+
+        expected_profits = ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
+        result = FixedPointProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
+
+        assert len(result) == len(expected_profits)
+        for result_profit, expected_profit in zip(result, expected_profits):
+            for field in AMOUNT_FIELDS:
+                assert getattr(result_profit, field) == quantize(getattr(expected_profit, field)), field
+            assert result_profit.buy_date == expected_profit.buy_date
+            assert result_profit.sell_date == expected_profit.sell_date
+            assert result_profit.buy_exchange == expected_profit.buy_exchange
+            assert result_profit.sell_exchange == expected_profit.sell_exchange
+
+    def test_when_lot_ledger_given_then_holds_open_lots_after_replay(self, profit_exchanger, create_random_operations):
+        ticker_operations = create_random_operations(10, 50, tuple(RATES))
+        first_half, second_half = ticker_operations[:25], ticker_operations[25:]
+
+        expected_ledger = LotLedger()
+        ProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations, lot_ledger=expected_ledger)
+
+        lot_ledger = LotLedger()
+        fixed_point_profit_calculator = FixedPointProfitCalculator(profit_exchanger)
+        fixed_point_profit_calculator.calculate_ticker_profits(first_half, lot_ledger=lot_ledger)
+        fixed_point_profit_calculator.calculate_ticker_profits(second_half, lot_ledger=lot_ledger)
+
+        assert lot_ledger.open_lots() == [
+            OpenLotDTO(buy=open_lot.buy, quantity=quantize(open_lot.quantity)) for open_lot in expected_ledger.open_lots()
+        ]
+
+    def test_when_sell_quantity_bigger_than_buy_then_raises_exception(self, profit_exchanger):
+        ticker_operations = [
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, tzinfo=timezone.utc), quantity=Decimal('10'), currency='GBP', price_avg=Decimal('1')),
+            OperationDTO(type='SELL', date=datetime(2024, 2, 1, tzinfo=timezone.utc), quantity=Decimal('11'), currency='GBP', price_avg=Decimal('1')),
+        ]
+
+        with pytest.raises(ValueError):
+            FixedPointProfitCalculator(profit_exchanger).calculate_ticker_profits(ticker_operations)
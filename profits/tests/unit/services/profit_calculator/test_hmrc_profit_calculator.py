@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.hmrc_profit_calculator import HmrcProfitCalculator
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.section104_profit_calculator import Section104ProfitCalculator
+
+RATES = {'GBP': Decimal(1), 'USD': Decimal('0.781234')}
+
+
+def create_operation(type: str, date: str, quantity: str, price_avg: str, currency: str = 'GBP') -> OperationDTO:
+    return OperationDTO(
+        type=type, date=datetime.fromisoformat(date).replace(tzinfo=timezone.utc), quantity=Decimal(quantity), currency=currency, price_avg=Decimal(price_avg))
+
+
+class TestHmrcProfitCalculator:
+    @pytest.fixture
+    def profit_calculator(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return HmrcProfitCalculator(ProfitExchanger(currency_service_mock))
+
+    def test_when_buy_same_day_then_matched_before_earlier_buys(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('BUY', '2024-02-01T10:00', '10', '150'),
+            create_operation('SELL', '2024-02-01T15:00', '10', '200'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert [(profit.buy_date.date(), profit.sell_quantity, profit.profit_exchange) for profit in result] == [
+            (datetime(2024, 2, 1).date(), Decimal(10), Decimal(500))]
+        assert all(isinstance(profit, ProfitExchangeDTO) for profit in result)
+
+    def test_when_buy_within_30_days_after_sell_then_matched_bed_and_breakfast(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('SELL', '2024-03-01', '10', '200'),
+            create_operation('BUY', '2024-03-31', '4', '120'),
+        ]
+        lot_ledger = LotLedger()
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations, lot_ledger=lot_ledger)
+
+        assert [(profit.buy_date.date(), profit.sell_quantity, profit.profit_exchange) for profit in result] == [
+            (datetime(2024, 3, 31).date(), Decimal(4), Decimal(320)),
+            (datetime(2024, 1, 1).date(), Decimal(6), Decimal(600))]
+        assert [(open_lot.buy.date.date(), open_lot.quantity) for open_lot in lot_ledger.open_lots()] == [(datetime(2024, 1, 1).date(), Decimal(4))]
+
+    def test_when_buy_more_than_30_days_after_sell_then_pool(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('SELL', '2024-03-01', '10', '200'),
+            create_operation('BUY', '2024-04-01', '10', '120'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert [(profit.buy_date.date(), profit.profit_exchange) for profit in result] == [(datetime(2024, 1, 1).date(), Decimal(1000))]
+
+    def test_when_bed_and_breakfast_buy_then_earlier_sells_matched_first(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '20', '100'),
+            create_operation('SELL', '2024-03-01', '10', '200'),
+            create_operation('SELL', '2024-03-05', '10', '200'),
+            create_operation('BUY', '2024-03-10', '15', '120'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert [(profit.sell_date.day, profit.buy_date.date().month, profit.sell_quantity) for profit in result] == [
+            (1, 3, Decimal(10)), (5, 3, Decimal(5)), (5, 1, Decimal(5))]
+
+    def test_when_several_buys_same_day_then_single_buy_at_average_price(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01T10:00', '10', '100'),
+            create_operation('BUY', '2024-01-01T12:00', '30', '200'),
+            create_operation('SELL', '2024-02-01', '20', '300'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert len(result) == 1
+        assert result[0].buy_amount_total == Decimal(3500)
+        assert result[0].buy_date == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+
+    def test_when_quantity_left_then_matched_at_pool_average_cost(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('BUY', '2024-02-01', '10', '200', 'USD'),
+            create_operation('SELL', '2024-06-01', '10', '300'),
+            create_operation('BUY', '2024-06-10', '4', '250'),
+        ]
+        lot_ledger = LotLedger()
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations, lot_ledger=lot_ledger)
+
+        pool_cost = Decimal(1000) + Decimal(2000) * RATES['USD']
+        assert [(profit.buy_date.date(), profit.sell_quantity, profit.buy_amount_total) for profit in result] == [
+            (datetime(2024, 6, 10).date(), Decimal(4), Decimal(1000)),
+            (datetime(2024, 2, 1).date(), Decimal(6), pool_cost * 6 / 20)]
+        assert [(open_lot.quantity, open_lot.quantity * open_lot.buy.price_avg) for open_lot in lot_ledger.open_lots()] == [
+            (Decimal(14), pool_cost * 14 / 20)]
+
+    def test_when_no_buys_same_day_or_30_days_after_sells_then_same_as_section104(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('BUY', '2024-02-01', '10', '200', 'USD'),
+            create_operation('SELL', '2024-04-01', '5', '300'),
+            create_operation('BUY', '2024-06-01', '8', '150'),
+            create_operation('SELL', '2024-08-01', '12', '250', 'USD'),
+            create_operation('SELL', '2024-10-01', '3', '350'),
+        ]
+        expected = Section104ProfitCalculator(profit_calculator.profit_exchanger).calculate_ticker_profits(ticker_operations)
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert result == expected
+
+    def test_when_open_lots_then_only_matched_by_pool(self, profit_calculator):
+        open_lot_buy = create_operation('BUY', '2023-01-01', '10', '50')
+        ticker_operations = [
+            create_operation('SELL', '2024-03-01', '10', '200'),
+            create_operation('BUY', '2024-03-02', '5', '120'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations, lot_ledger=LotLedger([OpenLotDTO(buy=open_lot_buy, quantity=Decimal(10))]))
+
+        assert [(profit.buy_date.year, profit.sell_quantity) for profit in result] == [(2024, Decimal(5)), (2023, Decimal(5))]
+
+    def test_when_sell_quantity_bigger_than_buy_then_raises_exception(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('SELL', '2024-02-01', '11', '100'),
+        ]
+
+        with pytest.raises(ValueError):
+            profit_calculator.calculate_ticker_profits(ticker_operations)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_random_operations_then_all_quantity_sold_matched(self, profit_calculator, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 300, tuple(RATES))
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert sum(profit.sell_quantity for profit in result) == sum(operation.quantity for operation in ticker_operations if operation.type == 'SELL')
+        assert profit_calculator.calculate_ticker_profit_total(ticker_operations) == sum(profit.profit_exchange for profit in result)
@@ -13,7 +13,9 @@ from profits.repositories.operation_repository import OperationRepository
 class TestProfitService:
     @pytest.fixture
     def operation_repository_mock(self):
-        return Mock(spec=OperationRepository)
+        operation_repository_mock = Mock(spec=OperationRepository)
+        operation_repository_mock.get_quantity_scales.return_value = {}
+        return operation_repository_mock
     
     @pytest.fixture
     def currency_service_mock(self):
@@ -21,7 +23,9 @@ class TestProfitService:
     
     @pytest.fixture
     def profit_calculator_mock(self):
-        return Mock(spec=ProfitCalculator)
+        profit_calculator_mock = Mock(spec=ProfitCalculator)
+        profit_calculator_mock.lookahead_days = 0
+        return profit_calculator_mock
     
     @pytest.fixture
     def profit_service_mock(self, operation_repository_mock, currency_service_mock, profit_calculator_mock):
@@ -39,10 +43,12 @@ class TestProfitService:
             profit_calculator_mock):
         account = Mock()
         operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL']
-        operation_repository_mock.get_account_ticker_operations.return_value = [
-            OperationDTO(type='BUY', date=datetime(2024, 1, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('100')),
-            OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('120'))
-        ]
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [
+                OperationDTO(type='BUY', date=datetime(2024, 1, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('100')),
+                OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('120'))
+            ]
+        }
         currency_service_mock.is_currency_conversion.return_value = False
         profit_calculator_mock.calculate_ticker_profits.return_value = [
             ProfitDTO(
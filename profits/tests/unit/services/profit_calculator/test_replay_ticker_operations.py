@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_exchanger import ProfitExchanger
+
+
+class TestReplayTickerOperations:
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_operations_then_same_open_lots_as_calculating_profits(self, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 200)
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.return_value = Decimal(1)
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: Decimal(1) for date in dates}
+        expected_ledger = LotLedger()
+        ProfitCalculator(ProfitExchanger(currency_service_mock)).calculate_ticker_profits(ticker_operations, lot_ledger=expected_ledger)
+
+        lot_ledger = LotLedger()
+        ProfitCalculator(ProfitExchanger(currency_service_mock)).replay_ticker_operations(ticker_operations, lot_ledger)
+
+        assert lot_ledger.open_lots() == expected_ledger.open_lots()
+
+    def test_when_operations_then_no_exchanges(self, create_random_operations):
+        profit_exchanger_mock = Mock(spec=ProfitExchanger)
+
+        ProfitCalculator(profit_exchanger_mock).replay_ticker_operations(create_random_operations(1, 100), LotLedger())
+
+        assert profit_exchanger_mock.method_calls == []
+
+    def test_when_sell_quantity_bigger_than_buy_then_raises_exception(self):
+        ticker_operations = [
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, tzinfo=timezone.utc), quantity=Decimal('10'), currency='GBP', price_avg=Decimal('1')),
+            OperationDTO(type='SELL', date=datetime(2024, 2, 1, tzinfo=timezone.utc), quantity=Decimal('11'), currency='GBP', price_avg=Decimal('1')),
+        ]
+
+        with pytest.raises(ValueError):
+            ProfitCalculator(Mock(spec=ProfitExchanger)).replay_ticker_operations(ticker_operations, LotLedger())
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.lot_ledger import LotLedger
+from profits.services.profit_exchanger import ProfitExchanger
+from profits.services.section104_profit_calculator import Section104ProfitCalculator
+
+RATES = {'GBP': Decimal(1), 'USD': Decimal('0.8')}
+
+
+def create_operation(type: str, date: str, quantity: str, price_avg: str, currency: str = 'GBP') -> OperationDTO:
+    return OperationDTO(
+        type=type, date=datetime.fromisoformat(date).replace(tzinfo=timezone.utc), quantity=Decimal(quantity), currency=currency, price_avg=Decimal(price_avg))
+
+
+class TestSection104ProfitCalculator:
+    @pytest.fixture
+    def profit_calculator(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchange.side_effect = lambda origin, target, date: RATES[origin]
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: RATES[origin] for date in dates}
+        return Section104ProfitCalculator(ProfitExchanger(currency_service_mock))
+
+    def test_when_sell_then_cost_is_average_cost_of_pool(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('BUY', '2024-02-01', '30', '200'),
+            create_operation('SELL', '2024-03-01', '20', '250'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert len(result) == 1
+        assert result[0].buy_amount_total == Decimal(3500)
+        assert result[0].profit_exchange == Decimal(1500)
+        assert result[0].buy_date == datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+    def test_when_buys_in_other_currency_then_cost_exchanged_at_buy_date(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100', 'USD'),
+            create_operation('SELL', '2024-03-01', '10', '150', 'USD'),
+        ]
+
+        result = profit_calculator.calculate_ticker_profits(ticker_operations)
+
+        assert result[0].buy_amount_total_exchange == Decimal(800)
+        assert result[0].sell_amount_total_exchange == Decimal(1200)
+        assert result[0].profit is None
+        assert result[0].profit_exchange == Decimal(400)
+
+    def test_when_replayed_in_parts_then_same_profits_as_single_replay(self, profit_calculator, create_random_operations):
+        ticker_operations = create_random_operations(1, 200, tuple(RATES))
+        expected = profit_calculator.calculate_ticker_profits(ticker_operations)
+        lot_ledger = LotLedger()
+
+        profit_calculator.replay_ticker_operations(ticker_operations[:100], lot_ledger)
+        result = profit_calculator.calculate_ticker_profits(ticker_operations[100:], lot_ledger=lot_ledger)
+
+        assert len(lot_ledger) <= 1
+        assert sum(profit.profit_exchange for profit in result) == pytest.approx(
+            sum(profit.profit_exchange for profit in expected if profit.sell_date >= ticker_operations[100].date), rel=Decimal('1e-20'))
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_when_operations_then_total_same_as_profit_details(self, profit_calculator, create_random_operations, seed):
+        ticker_operations = create_random_operations(seed, 300, tuple(RATES))
+        expected_total = sum(profit.profit_exchange for profit in profit_calculator.calculate_ticker_profits(ticker_operations))
+
+        result = profit_calculator.calculate_ticker_profit_total(ticker_operations)
+
+        assert result == expected_total
+
+    def test_when_sell_quantity_bigger_than_pool_then_raises_exception(self, profit_calculator):
+        ticker_operations = [
+            create_operation('BUY', '2024-01-01', '10', '100'),
+            create_operation('SELL', '2024-02-01', '11', '100'),
+        ]
+
+        with pytest.raises(ValueError):
+            profit_calculator.calculate_ticker_profits(ticker_operations)
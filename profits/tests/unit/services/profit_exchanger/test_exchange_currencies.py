@@ -1,3 +1,4 @@
+from dataclasses import fields
 from datetime import datetime, timezone
 from decimal import Decimal
 from unittest.mock import Mock
@@ -49,4 +50,19 @@ class TestExchangeCurrencies:
         assert result.buy_amount_total_exchange == Decimal(1000)
         assert result.sell_amount_total_exchange == Decimal(2400)
         assert result.profit_exchange == Decimal(1400)
-        assert currency_service_mock.get_currency_exchange.call_count == 2
\ No newline at end of file
+        assert currency_service_mock.get_currency_exchange.call_count == 2
+
+    def test_exchange_currencies_when_exchanged_then_profit_fields_copied(
+            self, 
+            profit_exchanger, 
+            currency_service_mock, 
+            sample_profit_dto
+    ):
+        currency_service_mock.get_currency_exchange.return_value = Decimal(1)
+
+        result = profit_exchanger.exchange_currencies(sample_profit_dto, 'GBP')
+
+        for field in fields(ProfitDTO):
+            assert getattr(result, field.name) == getattr(sample_profit_dto, field.name)
+        assert result.currency_exchange == 'GBP'
+        assert not hasattr(result, '__dict__')
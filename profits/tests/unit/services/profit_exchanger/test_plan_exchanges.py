@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitDTO
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import CurrencyConversionException, CurrencyExchangeNotFoundException
+from profits.services.profit_exchanger import ProfitExchanger
+
+
+class TestPlanExchanges:
+    @pytest.fixture
+    def currency_service_mock(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {date: Decimal(date.day) for date in dates}
+        return currency_service_mock
+    
+    @pytest.fixture
+    def profit_exchanger(self, currency_service_mock):
+        return ProfitExchanger(currency_service=currency_service_mock)
+
+    @staticmethod
+    def create_operation(day: int, currency: str = 'USD', hour: int = 0) -> OperationDTO:
+        return OperationDTO(type='BUY', date=datetime(2024, 1, day, hour, tzinfo=timezone.utc), quantity=Decimal(1), currency=currency, price_avg=Decimal(1))
+
+    def test_when_operations_then_one_lookup_per_currency_with_distinct_dates(self, profit_exchanger, currency_service_mock):
+        operations = [self.create_operation(1), self.create_operation(1, hour=10), self.create_operation(2), self.create_operation(3, 'EUR')]
+
+        profit_exchanger.plan_exchanges(operations, 'GBP')
+
+        assert currency_service_mock.get_currency_exchanges.call_count == 2
+        currency_service_mock.get_currency_exchanges.assert_any_call('USD', 'GBP', {datetime(2024, 1, 1).date(), datetime(2024, 1, 2).date()})
+        currency_service_mock.get_currency_exchanges.assert_any_call('EUR', 'GBP', {datetime(2024, 1, 3).date()})
+
+    def test_when_planned_then_exchange_currencies_does_not_look_up_rates(self, profit_exchanger, currency_service_mock):
+        profit_exchanger.plan_exchanges([self.create_operation(2), self.create_operation(5)], 'GBP')
+        profit_dto = ProfitDTO(
+            buy_date=datetime(2024, 1, 2, 15, tzinfo=timezone.utc), buy_amount_total=Decimal(10), buy_currency='USD',
+            sell_date=datetime(2024, 1, 5, 9, tzinfo=timezone.utc), sell_quantity=Decimal(1), sell_amount_total=Decimal(20), sell_currency='USD',
+            profit=Decimal(10))
+
+        result = profit_exchanger.exchange_currencies(profit_dto, 'GBP')
+
+        assert result.buy_exchange == Decimal(2)
+        assert result.sell_exchange == Decimal(5)
+        assert result.profit_exchange == Decimal(80)
+        currency_service_mock.get_currency_exchange.assert_not_called()
+
+    def test_when_rate_not_planned_then_looked_up_in_currency_service(self, profit_exchanger, currency_service_mock):
+        currency_service_mock.get_currency_exchanges.side_effect = CurrencyExchangeNotFoundException('No rates')
+        currency_service_mock.get_currency_exchange.side_effect = CurrencyConversionException('No rate')
+        profit_exchanger.plan_exchanges([self.create_operation(2)], 'GBP')
+
+        with pytest.raises(CurrencyConversionException):
+            profit_exchanger.get_exchange('USD', 'GBP', datetime(2024, 1, 2, tzinfo=timezone.utc))
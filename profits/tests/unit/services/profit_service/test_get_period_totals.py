@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.profit_calculator import ProfitCalculator
+from profits.services.profit_service import ProfitService
+
+
+def create_profit(sell_date: datetime, profit_exchange: Decimal) -> ProfitExchangeDTO:
+    return ProfitExchangeDTO(
+        buy_date=datetime(2019, 1, 1, tzinfo=timezone.utc), buy_amount_total=Decimal(0), buy_currency='GBP',
+        sell_date=sell_date, sell_quantity=Decimal(1), sell_amount_total=profit_exchange, sell_currency='GBP', profit=profit_exchange,
+        currency_exchange='GBP', buy_exchange=Decimal(1), buy_amount_total_exchange=Decimal(0), 
+        sell_exchange=Decimal(1), sell_amount_total_exchange=profit_exchange, profit_exchange=profit_exchange)
+
+
+class TestGetPeriodTotals:
+    @pytest.fixture
+    def operation_repository_mock(self):
+        operation_repository_mock = Mock(spec=OperationRepository)
+        operation_repository_mock.get_quantity_scales.return_value = {}
+        operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL', 'TSLA']
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [OperationDTO(type='SELL', date=datetime(2021, 2, 1, tzinfo=timezone.utc), quantity=Decimal('1'), currency='GBP', price_avg=Decimal('1'))],
+            'TSLA': [OperationDTO(type='SELL', date=datetime(2022, 2, 1, tzinfo=timezone.utc), quantity=Decimal('1'), currency='GBP', price_avg=Decimal('1'))],
+        }
+        return operation_repository_mock
+    
+    @pytest.fixture
+    def currency_service_mock(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.is_currency_conversion.return_value = False
+        return currency_service_mock
+    
+    @pytest.fixture
+    def profit_calculator_mock(self):
+        profit_calculator_mock = Mock(spec=ProfitCalculator)
+        profit_calculator_mock.lookahead_days = 0
+        profit_calculator_mock.calculate_ticker_profits.side_effect = [
+            [
+                create_profit(datetime(2020, 5, 1, tzinfo=timezone.utc), Decimal('10')), 
+                create_profit(datetime(2021, 4, 5, 23, tzinfo=timezone.utc), Decimal('5'))
+            ],
+            [
+                create_profit(datetime(2021, 4, 6, tzinfo=timezone.utc), Decimal('-3')), 
+                create_profit(datetime(2023, 1, 1, tzinfo=timezone.utc), Decimal('7'))
+            ],
+        ]
+        return profit_calculator_mock
+    
+    @pytest.fixture
+    def profit_service(self, operation_repository_mock, currency_service_mock, profit_calculator_mock):
+        return ProfitService(operation_repository_mock, currency_service_mock, profit_calculator_mock)
+
+    def test_when_no_dates_then_tax_years_from_first_to_last_sell(self, profit_service, profit_calculator_mock):
+        result = profit_service.get_period_totals(Mock(), None, None)
+
+        assert [(period['date_start'].date().isoformat(), period['profit_total']) for period in result] == [
+            ('2020-04-06', Decimal('15')),
+            ('2021-04-06', Decimal('-3')),
+            ('2022-04-06', Decimal('7')),
+        ]
+        assert result[0]['date_end'] == datetime(2021, 4, 5, 23, 59, 59, 999999, tzinfo=timezone.utc)
+        assert profit_calculator_mock.calculate_ticker_profits.call_count == 2
+
+    def test_when_dates_and_year_start_then_periods_clipped_to_dates(self, profit_service):
+        date_start, date_end = datetime(2020, 3, 1, tzinfo=timezone.utc), datetime(2023, 6, 30, tzinfo=timezone.utc)
+
+        result = profit_service.get_period_totals(Mock(), date_start, date_end, (1, 1))
+
+        assert [(period['date_start'], period['profit_total']) for period in result] == [
+            (date_start, Decimal('10')),
+            (datetime(2021, 1, 1, tzinfo=timezone.utc), Decimal('2')),
+            (datetime(2022, 1, 1, tzinfo=timezone.utc), Decimal('0')),
+            (datetime(2023, 1, 1, tzinfo=timezone.utc), Decimal('7')),
+        ]
+        assert result[-1]['date_end'] == date_end
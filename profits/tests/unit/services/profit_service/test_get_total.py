@@ -0,0 +1,66 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.services.profit_calculator import ProfitCalculator
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.profit_service import ProfitService
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import ProfitServiceBuySellMissmatch
+from profits.repositories.operation_repository import OperationRepository
+
+class TestGetTotal:
+    @pytest.fixture
+    def operation_repository_mock(self):
+        return Mock(spec=OperationRepository)
+    
+    @pytest.fixture
+    def currency_service_mock(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.is_currency_conversion.return_value = False
+        return currency_service_mock
+    
+    @pytest.fixture
+    def profit_calculator_mock(self):
+        profit_calculator_mock = Mock(spec=ProfitCalculator)
+        profit_calculator_mock.lookahead_days = 0
+        return profit_calculator_mock
+    
+    @pytest.fixture
+    def profit_service_mock(self, operation_repository_mock, currency_service_mock, profit_calculator_mock):
+        return ProfitService(
+            operation_repository=operation_repository_mock,
+            currency_service=currency_service_mock,
+            profit_calculator= profit_calculator_mock
+        )
+    
+    def test_profit_service_get_total_when_multiple_tickers_then_adds_up_tickers_totals(
+            self, 
+            profit_service_mock, 
+            operation_repository_mock, 
+            profit_calculator_mock):
+        account = Mock()
+        operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL', 'TSLA']
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('120'))],
+            'TSLA': [OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('5'), currency='USD', price_avg=Decimal('200'))],
+        }
+        profit_calculator_mock.calculate_ticker_profit_total.side_effect = [Decimal('200'), Decimal('-50')]
+
+        result = profit_service_mock.get_total(account, None, None)
+
+        assert result == Decimal('150')
+        profit_calculator_mock.calculate_ticker_profits.assert_not_called()
+
+    def test_profit_service_get_total_when_calculation_error_then_raises_exception(
+            self, 
+            profit_service_mock, 
+            operation_repository_mock, 
+            profit_calculator_mock):
+        operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL']
+        operation_repository_mock.get_account_operations.return_value = {'AAPL': []}
+        profit_calculator_mock.calculate_ticker_profit_total.side_effect = ValueError('stocks left to sell')
+
+        with pytest.raises(ProfitServiceBuySellMissmatch):
+            profit_service_mock.get_total(Mock(), None, None)
@@ -13,7 +13,9 @@ from profits.repositories.operation_repository import OperationRepository
 class TestGetTotalDetails:
     @pytest.fixture
     def operation_repository_mock(self):
-        return Mock(spec=OperationRepository)
+        operation_repository_mock = Mock(spec=OperationRepository)
+        operation_repository_mock.get_quantity_scales.return_value = {}
+        return operation_repository_mock
     
     @pytest.fixture
     def currency_service_mock(self):
@@ -21,7 +23,9 @@ class TestGetTotalDetails:
     
     @pytest.fixture
     def profit_calculator_mock(self):
-        return Mock(spec=ProfitCalculator)    
+        profit_calculator_mock = Mock(spec=ProfitCalculator)
+        profit_calculator_mock.lookahead_days = 0
+        return profit_calculator_mock
     
     @pytest.fixture
     def profit_service_mock(self, operation_repository_mock, currency_service_mock, profit_calculator_mock):
@@ -39,10 +43,12 @@ class TestGetTotalDetails:
             profit_calculator_mock):
         account = Mock()
         operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL']
-        operation_repository_mock.get_account_ticker_operations.return_value = [
-            OperationDTO(type='BUY', date=datetime(2024, 1, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('100')),
-            OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('120'))
-        ]
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [
+                OperationDTO(type='BUY', date=datetime(2024, 1, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('100')),
+                OperationDTO(type='SELL', date=datetime(2024, 2, 1), quantity=Decimal('10'), currency='USD', price_avg=Decimal('120'))
+            ]
+        }
         currency_service_mock.is_currency_conversion.return_value = False
         profit_calculator_mock.calculate_ticker_profits.return_value = [
             ProfitDTO(
@@ -54,4 +60,48 @@ class TestGetTotalDetails:
         assert len(result) == 1
         assert result[0]['ticker'] == 'AAPL'
         assert len(result[0]['profit_details']) == 1
-        assert result[0]['profit_details'][0].profit == Decimal('200')
\ No newline at end of file
+        assert result[0]['profit_details'][0].profit == Decimal('200')
+
+    def test_profit_service_get_total_details_when_currency_conversion_then_not_loaded(
+            self, 
+            profit_service_mock, 
+            operation_repository_mock, 
+            currency_service_mock,
+            profit_calculator_mock):
+        account = Mock()
+        operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL', 'USDGBP', 'TSLA']
+        operation_repository_mock.get_account_operations.return_value = {'AAPL': [], 'TSLA': []}
+        currency_service_mock.is_currency_conversion.side_effect = CurrencyService.is_currency_conversion
+        profit_calculator_mock.calculate_ticker_profits.return_value = []
+
+        result = profit_service_mock.get_total_details(account, None, None)
+
+        assert [ticker_profit['ticker'] for ticker_profit in result] == ['AAPL', 'TSLA']
+        operation_repository_mock.get_account_operations.assert_called_once_with(account, ['AAPL', 'TSLA'], None, {})
+        operation_repository_mock.get_account_ticker_operations.assert_not_called()
+
+    def test_profit_service_get_total_details_when_date_start_then_operations_before_only_replayed(
+            self, 
+            profit_service_mock, 
+            operation_repository_mock, 
+            currency_service_mock,
+            profit_calculator_mock):
+        account = Mock()
+        operations_before = [
+            OperationDTO(type='BUY', date=datetime(2023, 1, 1, tzinfo=timezone.utc), quantity=Decimal('10'), currency='USD', price_avg=Decimal('100')),
+            OperationDTO(type='SELL', date=datetime(2023, 2, 1, tzinfo=timezone.utc), quantity=Decimal('5'), currency='USD', price_avg=Decimal('120')),
+        ]
+        operations_period = [
+            OperationDTO(type='SELL', date=datetime(2024, 2, 1, tzinfo=timezone.utc), quantity=Decimal('5'), currency='USD', price_avg=Decimal('130')),
+        ]
+        operation_repository_mock.get_account_tickers_sold_period.return_value = ['AAPL']
+        operation_repository_mock.get_account_operations.return_value = {'AAPL': operations_before + operations_period}
+        currency_service_mock.is_currency_conversion.return_value = False
+        profit_calculator_mock.calculate_ticker_profits.return_value = []
+
+        profit_service_mock.get_total_details(account, datetime(2024, 1, 1, tzinfo=timezone.utc), None)
+
+        profit_calculator_mock.replay_ticker_operations.assert_called_once()
+        assert profit_calculator_mock.replay_ticker_operations.call_args.args[0] == operations_before
+        profit_calculator_mock.calculate_ticker_profits.assert_called_once()
+        assert profit_calculator_mock.calculate_ticker_profits.call_args.args[0] == operations_period
@@ -101,3 +101,40 @@ class TestCurrencyService:
         )
 
         assert result == Decimal("1.25")
+
+    def test_get_currency_exchanges_when_several_dates_returns_rate_on_or_before_each_date(self, currency_service_mock, currency_repository_mock):
+        currency_repository_mock.get_currency_exchanges.return_value = {
+            datetime(2024, 1, 2).date(): Decimal("1.25"),
+            datetime(2024, 1, 5).date(): Decimal("1.3"),
+        }
+        dates = [datetime(2024, 1, day).date() for day in (1, 2, 4, 5, 20)]
+
+        result = currency_service_mock.get_currency_exchanges("USD", "GBP", dates)
+
+        assert result == {
+            datetime(2024, 1, 2).date(): Decimal("1.25"),
+            datetime(2024, 1, 4).date(): Decimal("1.25"),
+            datetime(2024, 1, 5).date(): Decimal("1.3"),
+            datetime(2024, 1, 20).date(): Decimal("1.3"),
+        }
+        for date_request, exchange in result.items():
+            assert currency_service_mock.get_currency_exchange("USD", "GBP", datetime.combine(date_request, datetime.min.time())) == exchange
+        currency_repository_mock.get_currency_exchanges.assert_called_once()
+
+    def test_get_currency_exchanges_when_rate_is_zero_then_previous_rate_as_get_currency_exchange(self, currency_service_mock, currency_repository_mock):
+        currency_repository_mock.get_currency_exchanges.return_value = {
+            datetime(2024, 1, 2).date(): Decimal("1.25"),
+            datetime(2024, 1, 3).date(): Decimal("0"),
+            datetime(2024, 1, 5).date(): Decimal("1.3"),
+        }
+        dates = [datetime(2024, 1, day).date() for day in (3, 4, 5)]
+
+        result = currency_service_mock.get_currency_exchanges("USD", "GBP", dates)
+
+        assert result == {
+            datetime(2024, 1, 3).date(): Decimal("1.25"),
+            datetime(2024, 1, 4).date(): Decimal("1.25"),
+            datetime(2024, 1, 5).date(): Decimal("1.3"),
+        }
+        for date_request, exchange in result.items():
+            assert currency_service_mock.get_currency_exchange("USD", "GBP", datetime.combine(date_request, datetime.min.time())) == exchange
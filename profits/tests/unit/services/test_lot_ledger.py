@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+
+from profits.interfaces.dtos.open_lot_dto import OpenLotDTO
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.services.lot_ledger import LotLedger
+
+
+class TestLotLedger:
+    @pytest.fixture
+    def create_buy(self):
+        def _create_buy(quantity: str, day: int = 1) -> OperationDTO:
+            return OperationDTO(
+                type='BUY', 
+                date=datetime(2024, 1, day, tzinfo=timezone.utc), 
+                quantity=Decimal(quantity), 
+                currency='GBP', 
+                price_avg=Decimal('100'))
+        return _create_buy
+
+    def test_when_no_lots_then_nothing_consumed(self):
+        lot_ledger = LotLedger()
+
+        matches, quantity_left = lot_ledger.consume(Decimal('5'))
+
+        assert matches == []
+        assert quantity_left == Decimal('5')
+
+    def test_when_consuming_part_of_lot_then_lot_remains_open_with_remainder(self, create_buy):
+        buy = create_buy('10')
+        lot_ledger = LotLedger()
+        lot_ledger.add(buy)
+
+        matches, quantity_left = lot_ledger.consume(Decimal('4'))
+
+        assert matches == [(buy, Decimal('4'))]
+        assert quantity_left == Decimal('0')
+        assert lot_ledger.open_lots() == [OpenLotDTO(buy=buy, quantity=Decimal('6'))]
+        assert buy.quantity == Decimal('10'), "BUY operation must not be modified"
+
+    def test_when_consuming_across_lots_then_oldest_lots_consumed_first(self, create_buy):
+        buys = [create_buy('5', day=1), create_buy('5', day=2), create_buy('5', day=3)]
+        lot_ledger = LotLedger()
+        for buy in buys:
+            lot_ledger.add(buy)
+
+        matches, quantity_left = lot_ledger.consume(Decimal('12'))
+
+        assert matches == [(buys[0], Decimal('5')), (buys[1], Decimal('5')), (buys[2], Decimal('2'))]
+        assert quantity_left == Decimal('0')
+        assert len(lot_ledger) == 1
+        assert lot_ledger.quantity == Decimal('3')
+
+    def test_when_consuming_more_than_open_then_returns_quantity_left(self, create_buy):
+        lot_ledger = LotLedger()
+        lot_ledger.add(create_buy('5'))
+
+        _, quantity_left = lot_ledger.consume(Decimal('7'))
+
+        assert quantity_left == Decimal('2')
+        assert len(lot_ledger) == 0
+
+    def test_when_created_from_open_lots_then_given_lots_not_modified(self, create_buy):
+        open_lot = OpenLotDTO(buy=create_buy('10'), quantity=Decimal('3'))
+        lot_ledger = LotLedger([open_lot])
+
+        lot_ledger.consume(Decimal('1'))
+
+        assert open_lot.quantity == Decimal('3')
+        assert lot_ledger.quantity == Decimal('2')
+
+    def test_when_adding_same_day_and_price_with_coalesce_then_merged_into_last_lot(self, create_buy):
+        buys = [
+            create_buy('5'),
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, 15, tzinfo=timezone.utc), quantity=Decimal('3'), currency='GBP', price_avg=Decimal('100'))]
+        lot_ledger = LotLedger()
+        lot_ledger.add(buys[0])
+
+        lot_ledger.add(buys[1], coalesce=True)
+
+        assert lot_ledger.open_lots() == [OpenLotDTO(buy=LotLedger.coalesce_buys(*buys), quantity=Decimal('8'))]
+        assert lot_ledger.open_lots()[0].buy.quantity == Decimal('8')
+        assert buys[0].quantity == Decimal('5'), "BUY operations must not be modified"
+
+    def test_when_adding_with_coalesce_after_last_lot_consumed_then_new_lot(self, create_buy):
+        buys = [
+            create_buy('5'),
+            OperationDTO(type='BUY', date=datetime(2024, 1, 1, 15, tzinfo=timezone.utc), quantity=Decimal('3'), currency='GBP', price_avg=Decimal('100'))]
+        lot_ledger = LotLedger()
+        lot_ledger.add(buys[0])
+        lot_ledger.consume(Decimal('1'))
+
+        lot_ledger.add(buys[1], coalesce=True)
+
+        assert lot_ledger.open_lots() == [OpenLotDTO(buy=buys[0], quantity=Decimal('4')), OpenLotDTO(buy=buys[1], quantity=Decimal('3'))]
+
+    def test_when_adding_different_day_or_price_with_coalesce_then_new_lot(self, create_buy):
+        other_price = OperationDTO(type='BUY', date=datetime(2024, 1, 2, tzinfo=timezone.utc), quantity=Decimal('3'), currency='GBP', price_avg=Decimal('101'))
+        lot_ledger = LotLedger()
+        lot_ledger.add(create_buy('5', day=1))
+
+        lot_ledger.add(create_buy('5', day=2), coalesce=True)
+        lot_ledger.add(other_price, coalesce=True)
+
+        assert len(lot_ledger) == 3
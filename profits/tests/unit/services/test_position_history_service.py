@@ -0,0 +1,151 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.repositories.operation_repository import OperationRepository
+from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import CurrencyExchangeNotFoundException
+from profits.services.position_history_service import PositionHistoryService
+
+
+def create_operation(type: str, day: str, quantity: str, price: str = '100', currency: str = 'GBP') -> OperationDTO:
+    return OperationDTO(
+        type=type, date=datetime.fromisoformat(day).replace(hour=10, tzinfo=timezone.utc),
+        quantity=Decimal(quantity), currency=currency, price_avg=Decimal(price))
+
+class TestGetPositionHistory:
+    @pytest.fixture
+    def operation_repository_mock(self):
+        operation_repository_mock = Mock(spec=OperationRepository)
+        operation_repository_mock.get_quantity_scales.return_value = {}
+        return operation_repository_mock
+
+    @pytest.fixture
+    def currency_service_mock(self):
+        currency_service_mock = Mock(spec=CurrencyService)
+        currency_service_mock.is_currency_conversion.return_value = False
+        return currency_service_mock
+
+    @pytest.fixture
+    def position_history_service(self, operation_repository_mock, currency_service_mock):
+        return PositionHistoryService(operation_repository_mock, currency_service_mock)
+
+    @pytest.fixture
+    def sample_operations(self, operation_repository_mock):
+        operation_repository_mock.get_account_tickers.return_value = ['AAPL', 'MSFT', 'TSLA']
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [
+                create_operation('BUY', '2024-01-02', '10', '100'),
+                create_operation('BUY', '2024-01-02', '5', '110'),
+                create_operation('SELL', '2024-01-04', '12', '120'),
+            ],
+            'MSFT': [
+                create_operation('BUY', '2024-01-03', '2.5', '300', 'USD'),
+            ],
+            'TSLA': [
+                create_operation('BUY', '2023-06-01', '1', '200'),
+                create_operation('SELL', '2023-07-01', '1', '250'),
+            ],
+        }
+
+    def test_when_operations_then_quantities_held_at_end_of_each_day(self, position_history_service, sample_operations):
+        result = position_history_service.get_position_history(
+            Mock(), datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 5, tzinfo=timezone.utc))
+
+        assert result['dates'] == [date(2024, 1, day) for day in range(1, 6)]
+        assert result['positions'] == [
+            {'ticker': 'AAPL', 'quantities': [Decimal(0), Decimal(15), Decimal(15), Decimal(3), Decimal(3)], 'values': None},
+            {'ticker': 'MSFT', 'quantities': [Decimal(0), Decimal(0), Decimal('2.5'), Decimal('2.5'), Decimal('2.5')], 'values': None},
+        ]
+
+    def test_when_weekly_then_every_7_days_from_date_start(self, position_history_service, sample_operations):
+        result = position_history_service.get_position_history(
+            Mock(), datetime(2023, 5, 25, tzinfo=timezone.utc), datetime(2023, 7, 10, tzinfo=timezone.utc), 'weekly')
+
+        assert result['dates'] == [date(2023, 5, 25) + timedelta(days=7 * week) for week in range(7)]
+        assert result['positions'] == [
+            {'ticker': 'TSLA', 'quantities': [Decimal(0)] + [Decimal(1)] * 5 + [Decimal(0)], 'values': None},
+        ]
+
+    def test_when_valued_then_last_price_exchanged(self, position_history_service, currency_service_mock, sample_operations):
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {
+            day: Decimal(1) if origin == target else Decimal('0.8') for day in dates if day >= date(2024, 1, 4)
+        }
+
+        result = position_history_service.get_position_history(
+            Mock(), datetime(2024, 1, 2, tzinfo=timezone.utc), datetime(2024, 1, 4, tzinfo=timezone.utc), valued=True)
+
+        assert [position['values'] for position in result['positions']] == [
+            [None, None, Decimal(360)],
+            [Decimal(0), None, Decimal(600)],
+        ]
+
+    def test_when_valued_and_currency_without_rates_then_not_valued(self, position_history_service, currency_service_mock, sample_operations):
+        def get_currency_exchanges(origin, target, dates):
+            if origin != target:
+                raise CurrencyExchangeNotFoundException(f"No exchange rates found for {origin}-{target}")
+            return {day: Decimal(1) for day in dates}
+        currency_service_mock.get_currency_exchanges.side_effect = get_currency_exchanges
+
+        result = position_history_service.get_position_history(
+            Mock(), datetime(2024, 1, 2, tzinfo=timezone.utc), datetime(2024, 1, 4, tzinfo=timezone.utc), valued=True)
+
+        assert [position['values'] for position in result['positions']] == [
+            [Decimal(1650), Decimal(1650), Decimal(360)],
+            [Decimal(0), None, None],
+        ]
+
+    def test_when_valued_then_rounded_to_penny_in_decimal(self, position_history_service, operation_repository_mock, currency_service_mock):
+        operation_repository_mock.get_account_tickers.return_value = ['AAPL', 'MSFT']
+        operation_repository_mock.get_account_operations.return_value = {
+            'AAPL': [create_operation('BUY', '2024-01-02', '1', '2.675')],
+            'MSFT': [create_operation('BUY', '2024-01-02', '3', '0.35', 'USD')],
+        }
+        currency_service_mock.get_currency_exchanges.side_effect = lambda origin, target, dates: {
+            day: Decimal(1) if origin == target else Decimal('0.7') for day in dates
+        }
+
+        result = position_history_service.get_position_history(
+            Mock(), datetime(2024, 1, 2, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc), valued=True)
+
+        # In floats 2.675 is 2.67499... and 3 * 0.35 * 0.7 is 0.73499..., rounded down
+        assert [position['values'] for position in result['positions']] == [[Decimal('2.68')], [Decimal('0.74')]]
+
+    def test_when_no_dates_then_from_first_operation(self, position_history_service, sample_operations):
+        result = position_history_service.get_position_history(Mock(), None, datetime(2024, 1, 5, tzinfo=timezone.utc))
+
+        assert result['dates'][0] == date(2023, 6, 1)
+        assert [position['ticker'] for position in result['positions']] == ['AAPL', 'MSFT', 'TSLA']
+
+    def test_when_no_operations_then_empty(self, position_history_service, operation_repository_mock):
+        operation_repository_mock.get_account_tickers.return_value = []
+        operation_repository_mock.get_account_operations.return_value = {}
+
+        result = position_history_service.get_position_history(Mock(), None, None)
+
+        assert result == {'dates': [], 'positions': []}
+
+    def test_when_many_tickers_and_years_then_same_as_day_by_day(self, position_history_service, operation_repository_mock):
+        tickers = [f'T{index}' for index in range(50)]
+        operation_repository_mock.get_account_tickers.return_value = tickers
+        operation_repository_mock.get_account_operations.return_value = {
+            ticker: [
+                create_operation('BUY' if day % 3 else 'SELL', (date(2015, 1, 1) + timedelta(days=day)).isoformat(), '1' if day % 3 else '0.5')
+                for day in range(index, 3650, 7 + index % 5)
+            ]
+            for index, ticker in enumerate(tickers)
+        }
+        date_start = datetime(2015, 6, 1, tzinfo=timezone.utc)
+        date_end = datetime(2024, 12, 31, tzinfo=timezone.utc)
+
+        result = position_history_service.get_position_history(Mock(), date_start, date_end)
+
+        operations = operation_repository_mock.get_account_operations.return_value
+        for position in result['positions'][::7]:
+            for day, quantity in list(zip(result['dates'], position['quantities']))[::97]:
+                assert quantity == sum(
+                    operation.quantity if operation.type == 'BUY' else -operation.quantity
+                    for operation in operations[position['ticker']] if operation.date.date() <= day
+                )
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from profits.services.vectorized_matcher import SellWithoutBuysError, match_fifo
+
+
+class TestMatchFifo:
+
+    def test_when_no_sells_then_no_matches_and_all_lots_open(self):
+        result = match_fifo(np.array([5, 10]), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+        assert result.quantities.tolist() == []
+        assert result.lots_open_quantities.tolist() == [5, 10]
+
+    def test_when_sells_cross_lots_then_matches_in_fifo_order(self):
+        # BUY 5, BUY 5, SELL 7, BUY 10, SELL 6
+        result = match_fifo(np.array([5, 5, 10]), np.array([7, 6]), np.array([2, 3]))
+
+        assert result.buy_indexes.tolist() == [0, 1, 1, 2]
+        assert result.sell_indexes.tolist() == [0, 0, 1, 1]
+        assert result.quantities.tolist() == [5, 2, 3, 3]
+        assert result.lots_open_quantities.tolist() == [0, 0, 7]
+
+    def test_when_lot_with_zero_quantity_then_not_matched(self):
+        result = match_fifo(np.array([5, 0, 5]), np.array([10]), np.array([3]))
+
+        assert result.buy_indexes.tolist() == [0, 2]
+        assert result.quantities.tolist() == [5, 5]
+
+    def test_when_sell_before_enough_buys_then_raises_exception(self):
+        # BUY 5, SELL 7, BUY 10
+        with pytest.raises(SellWithoutBuysError) as e:
+            match_fifo(np.array([5, 10]), np.array([7]), np.array([1]))
+
+        assert e.value.sell_index == 0
+        assert e.value.quantity_left == 2
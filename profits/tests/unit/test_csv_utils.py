@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from profits.interfaces.dtos.profit_dto import ProfitExchangeDTO
 from profits.services.profit_service import ProfitDetails
-from profits.utils.csv_utils import generate_total_details_csv, TOTAL_DETAILS_HEADERS_CSV
+from profits.utils.csv_utils import generate_total_details_csv, stream_total_details_csv, TOTAL_DETAILS_HEADERS_CSV
 
 
 def test_generate_total_details_csv_when_no_detail_returns_empty_csv():
@@ -72,4 +72,39 @@ def test_generate_total_details_csv_when_one_detail_returns_correct_csv():
     
     data = lines[1].split(',')
     assert data[0] == 'AAPL'
-    assert data[len(expected_headers) -1] == '5000'
\ No newline at end of file
+    assert data[len(expected_headers) -1] == '5000'
+
+
+def test_stream_total_details_csv_when_generator_then_same_csv_formatted_as_consumed():
+    profit_dto = ProfitExchangeDTO(
+        buy_date= datetime(2023, 1, 15, tzinfo=timezone.utc),
+        buy_amount_total= Decimal(10000),
+        buy_currency= 'USD',
+        sell_date= datetime(2023, 6, 1, tzinfo=timezone.utc),
+        sell_quantity= Decimal(100),
+        sell_amount_total= Decimal(15000),
+        sell_currency= 'USD',
+        profit= Decimal(5000),
+        currency_exchange= "GBP",
+        buy_exchange= Decimal(1),
+        buy_amount_total_exchange= Decimal(10000),
+        sell_exchange= Decimal(1),
+        sell_amount_total_exchange= Decimal(15000),
+        profit_exchange= Decimal(5000)                
+    )
+    tickers_requested = []
+    def tickers_profit():
+        for ticker in ['AAPL', 'TSLA']:
+            tickers_requested.append(ticker)
+            yield ProfitDetails(ticker=ticker, profit_details=[profit_dto, profit_dto])
+    date_start, date_end = datetime(2023, 1, 1, tzinfo=timezone.utc), datetime(2023, 12, 31, tzinfo=timezone.utc)
+
+    response = stream_total_details_csv(tickers_profit(), 1, date_start, date_end)
+
+    assert response['Content-Type'] == 'text/csv'
+    assert tickers_requested == []
+    streaming_content = b''.join(response.streaming_content)
+    assert tickers_requested == ['AAPL', 'TSLA']
+    expected_content = generate_total_details_csv(list(tickers_profit()), 1, date_start, date_end).content
+    assert streaming_content == expected_content
+    assert response['Content-Disposition'] == generate_total_details_csv([], 1, date_start, date_end)['Content-Disposition']
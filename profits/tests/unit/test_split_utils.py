@@ -0,0 +1,65 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+from profits.utils.split_utils import SplitIndex
+
+
+SPLITS = [
+    ('AAPL', date(2022, 6, 1), Decimal(1), Decimal(4)),
+    ('AAPL', date(2020, 1, 1), Decimal(1), Decimal(2)),
+    ('TSLA', date(2021, 1, 1), Decimal(3), Decimal(1)),
+]
+
+def create_buy(day: date, quantity: str = '10', price_avg: str = '100') -> OperationDTO:
+    return OperationDTO(
+        type='BUY', date=datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc), 
+        quantity=Decimal(quantity), currency='GBP', price_avg=Decimal(price_avg))
+
+
+class TestSplitIndex:
+    def test_factor_is_product_of_splits_after_day(self):
+        split_index = SplitIndex(SPLITS)
+
+        assert split_index.factor('AAPL', date(2019, 12, 31)) == Decimal(8)
+        assert split_index.factor('AAPL', date(2021, 1, 1)) == Decimal(4)
+        assert split_index.factor('AAPL', date(2023, 1, 1)) == Decimal(1)
+        assert split_index.factor('MSFT', date(2019, 1, 1)) == Decimal(1)
+
+    def test_when_operation_on_split_day_then_not_adjusted(self):
+        operation = create_buy(date(2022, 6, 1))
+
+        assert SplitIndex(SPLITS).adjust('AAPL', operation) is operation
+
+    def test_when_operation_before_splits_then_quantity_and_price_adjusted_keeping_amount(self):
+        result = SplitIndex(SPLITS).adjust('AAPL', create_buy(date(2019, 6, 1)))
+
+        assert result.quantity == Decimal(80)
+        assert result.price_avg == Decimal('12.5')
+        assert result.date == datetime(2019, 6, 1, 12, tzinfo=timezone.utc)
+
+    def test_when_reverse_split_not_finite_decimal_then_quantities_in_fractions_of_share(self):
+        split_index = SplitIndex(SPLITS)
+
+        before = split_index.adjust('TSLA', create_buy(date(2020, 6, 1), quantity='1', price_avg='10'))
+        after = split_index.adjust('TSLA', create_buy(date(2021, 6, 1), quantity='1', price_avg='30'))
+
+        # A third of a share is 1 unit, so a share bought before the split is exactly a third of one bought after it
+        assert split_index.scale('TSLA') == Decimal(3)
+        assert (before.quantity, before.price_avg) == (Decimal(1), Decimal(10))
+        assert (after.quantity, after.price_avg) == (Decimal(3), Decimal(10))
+        assert split_index.scale('AAPL') == Decimal(1)
+
+    def test_when_splits_not_finite_decimal_then_smallest_scale(self):
+        split_index = SplitIndex([
+            ('AMZN', date(2020, 1, 1), Decimal(3), Decimal(1)),
+            ('AMZN', date(2021, 1, 1), Decimal(1), Decimal(6)),
+            ('AMZN', date(2022, 1, 1), Decimal(7), Decimal(2)),
+        ])
+
+        assert split_index.scale('AMZN') == Decimal(7)
+        assert [factor for _, factor in split_index.ticker_factors('AMZN')] == [Decimal(4), Decimal(12), Decimal(2)]
+
+    def test_ticker_factors_oldest_first(self):
+        assert SplitIndex(SPLITS).ticker_factors('AAPL') == [(date(2020, 1, 1), Decimal(8)), (date(2022, 6, 1), Decimal(4))]
+        assert 'MSFT' not in SplitIndex(SPLITS)
@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework_nested import routers
 from rest_framework.routers import DefaultRouter
-from .views import views, currency_exchange_view, account_view, operation_view, split_view, health_check
+from .views import views, currency_exchange_view, account_view, account_async_view, operation_view, split_view, health_check
 
 router = DefaultRouter()
 router.register('broker', views.BrokerViewSet)
@@ -14,4 +14,6 @@ router.register('operation', operation_view.OperationViewSet)
 
 urlpatterns = router.urls + [
     path('health/', health_check.health_check, name='health-check'),
+    path('account/<int:pk>/total-async/', account_async_view.total, name='account-total-async'),
+    path('account/<int:pk>/total-details-async/', account_async_view.total_details, name='account-total-details-async'),
 ]
\ No newline at end of file
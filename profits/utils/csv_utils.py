@@ -1,8 +1,9 @@
 import csv
 from datetime import datetime
-from typing import Optional
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 from profits.services.profit_service import ProfitDetails
 from profits.utils import datetime_utils
@@ -25,24 +26,16 @@ TOTAL_DETAILS_HEADERS_CSV = [
         'Profit Exchange'
 
     ]
-def generate_total_details_csv(
-    tickers_profit: list[ProfitDetails],
-    account_id: int,
-    date_start: Optional[datetime],
-    date_end: Optional[datetime]
-) -> HttpResponse:
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = \
-        f'attachment; filename="totals-account-{account_id}-from-{datetime_utils.to_filename(date_start)}-to-{datetime_utils.to_filename(date_end)}.csv"'
+def _total_details_filename(account_id: int, date_start: Optional[datetime], date_end: Optional[datetime]) -> str:
+    return f'totals-account-{account_id}-from-{datetime_utils.to_filename(date_start)}-to-{datetime_utils.to_filename(date_end)}.csv'
 
-    writer = csv.writer(response)
-    writer.writerow(TOTAL_DETAILS_HEADERS_CSV)
+def _total_details_rows(tickers_profit: Iterable[ProfitDetails]) -> Iterator[list]:
+    yield TOTAL_DETAILS_HEADERS_CSV
     for ticker_profit in tickers_profit:
         ticker = ticker_profit.get('ticker')
         profit_details = ticker_profit.get('profit_details', [])
         for profit_detail in profit_details:
-            writer.writerow([
+            yield [
                 ticker,
                 profit_detail.buy_date, 
                 profit_detail.buy_amount_total, 
@@ -58,7 +51,64 @@ def generate_total_details_csv(
                 profit_detail.sell_exchange, 
                 profit_detail.sell_amount_total_exchange,
                 profit_detail.profit_exchange
-            ])
+            ]
+
+async def _atotal_details_rows(tickers_profit: AsyncIterable[ProfitDetails]) -> AsyncIterator[list]:
+    yield TOTAL_DETAILS_HEADERS_CSV
+    async for ticker_profit in tickers_profit:
+        for row in islice(_total_details_rows([ticker_profit]), 1, None):
+            yield row
+
+class _Echo:
+    """
+    File-like object that returns what is written, so `csv.writer` formats a row at a time without buffering the file.
+    """
+    def write(self, value: str) -> str:
+        return value
+
+def generate_total_details_csv(
+    tickers_profit: list[ProfitDetails],
+    account_id: int,
+    date_start: Optional[datetime],
+    date_end: Optional[datetime]
+) -> HttpResponse:
+
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{_total_details_filename(account_id, date_start, date_end)}"'
+
+    writer = csv.writer(response)
+    writer.writerows(_total_details_rows(tickers_profit))
+
+    return response
+
+def stream_total_details_csv(
+    tickers_profit: Iterable[ProfitDetails],
+    account_id: int,
+    date_start: Optional[datetime],
+    date_end: Optional[datetime]
+) -> StreamingHttpResponse:
+    """
+    Same CSV as `generate_total_details_csv` but formatting the rows as the response is sent, 
+    so with a generator of the tickers profits only the profits of one ticker are in memory at a time.
+    """
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in _total_details_rows(tickers_profit)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{_total_details_filename(account_id, date_start, date_end)}"'
+
+    return response
+
+def astream_total_details_csv(
+    tickers_profit: AsyncIterable[ProfitDetails],
+    account_id: int,
+    date_start: Optional[datetime],
+    date_end: Optional[datetime]
+) -> StreamingHttpResponse:
+    """
+    Same as `stream_total_details_csv` for an async iterator of the tickers profits, streamed by ASGI servers without a thread.
+    """
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) async for row in _atotal_details_rows(tickers_profit)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{_total_details_filename(account_id, date_start, date_end)}"'
 
     return response
-    
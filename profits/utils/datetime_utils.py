@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 from zoneinfo import ZoneInfo
 
@@ -34,4 +34,47 @@ def parse_flexible_date(date_string: Optional[str]) -> Optional[datetime]:
     if input_date:
         return make_aware(datetime.combine(input_date, datetime.min.time()))
         
-    raise ValueError(f"Invalid date format: {date_string}")
\ No newline at end of file
+    raise ValueError(f"Invalid date format: {date_string}")
+
+
+def check_year_start(month: int, day: int) -> None:
+    """
+    Raises `ValueError` unless the month and day exist in every year, as `yearly_dates` and `yearly_periods` use them in every year.
+    """
+    try:
+        # Not a leap year, so 29 February is rejected too
+        datetime(2001, month, day)
+    except ValueError as e:
+        raise ValueError(f"Invalid year start {month:02}-{day:02}, expected a month and day that exist in every year (not 02-29).") from e
+
+
+def yearly_dates(month: int, day: int, date_from: datetime, date_to: datetime) -> list[datetime]:
+    """
+    Returns the dates at the start of the given month and day of every year after `date_from` and not after `date_to`.
+    """
+    dates = []
+    for year in range(date_from.year, date_to.year + 1):
+        date_year = datetime(year, month, day, tzinfo=ZoneInfo("UTC"))
+        if date_from < date_year <= date_to:
+            dates.append(date_year)
+
+    return dates
+
+
+def yearly_periods(month: int, day: int, date_from: datetime, date_to: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Returns the yearly periods starting at the given month and day (e.g. UK tax years starting on 6 April) 
+    from the one including `date_from` to the one including `date_to`.
+    Periods are (start, end) with the end being the last microsecond before the start of the next period.
+    """
+    year = date_from.year if datetime(date_from.year, month, day, tzinfo=ZoneInfo("UTC")) <= date_from else date_from.year - 1
+
+    periods = []
+    period_start = datetime(year, month, day, tzinfo=ZoneInfo("UTC"))
+    while period_start <= date_to:
+        year += 1
+        period_start_next = datetime(year, month, day, tzinfo=ZoneInfo("UTC"))
+        periods.append((period_start, period_start_next - timedelta(microseconds=1)))
+        period_start = period_start_next
+
+    return periods
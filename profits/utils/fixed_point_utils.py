@@ -0,0 +1,34 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Optional
+
+from profits.models import CurrencyExchange, Operation
+
+# Precisions of the database fields, values are represented as integers scaled by 10**places
+QUANTITY_PLACES = Operation._meta.get_field('quantity').decimal_places
+AMOUNT_PLACES = Operation._meta.get_field('amount_total').decimal_places
+RATE_PLACES = CurrencyExchange._meta.get_field('rate').decimal_places
+
+
+def to_fixed(value: Decimal, places: int) -> int:
+    return int(value.scaleb(places).to_integral_value(ROUND_HALF_EVEN))
+
+def to_fixed_exact(value: Decimal, places: int) -> Optional[int]:
+    """
+    Returns `None` if the value has more decimal places than `places`.
+    """
+    value_scaled = value.scaleb(places)
+    value_integral = value_scaled.to_integral_value()
+    return int(value_integral) if value_scaled == value_integral else None
+
+def from_fixed(value: int, places: int) -> Decimal:
+    return Decimal(value).scaleb(-places)
+
+def round_div(numerator: int, denominator: int) -> int:
+    """
+    Integer division rounding half to even, as `Decimal.quantize` does by default. `denominator` must be positive.
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    remainder_double = 2 * remainder
+    if remainder_double > denominator or (remainder_double == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
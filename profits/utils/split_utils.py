@@ -0,0 +1,96 @@
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+from fractions import Fraction
+from itertools import groupby
+from math import lcm
+from operator import itemgetter
+from typing import Iterable
+
+from profits.interfaces.dtos.operation_dto import OperationDTO
+
+
+def _non_decimal_part(denominator: int) -> int:
+    """
+    Part of the denominator not made of factors 2 and 5, 1 if a fraction with it is a finite decimal.
+    """
+    for prime in (2, 5):
+        while denominator % prime == 0:
+            denominator //= prime
+    return denominator
+
+
+class SplitIndex:
+    """
+    Cumulative split factors of each ticker, to express operations in the units after the last split of their ticker.
+    A split of `origin` shares into `target` shares dated D applies to the operations before the day D.
+    For each ticker the split dates are kept sorted with, for each of them, the product of the factors of the splits from it on,
+    so the factor of an operation is found with a bisection of its date: O(log s) with s the splits of the ticker.
+    Adjusted quantities have to be exact, or a position bought and sold in full is left with a remainder (e.g. 1/3 + 1/3 != 2/3).
+    So if a factor is not a finite decimal (e.g. a 3 to 1 reverse split) the quantities of the ticker are in fractions of share,
+    `scale` of them per share, with the smallest scale that makes every factor of the ticker a finite decimal.
+    """
+    def __init__(self, splits: Iterable[tuple[str, date, Decimal, Decimal]]):
+        """
+        `splits` are (ticker, date, origin, target) tuples, in any order.
+        """
+        self._dates: dict[str, list[date]] = {}
+        self._factors: dict[str, list[Decimal]] = {}
+        self._scales: dict[str, Decimal] = {}
+        for ticker, ticker_splits in groupby(sorted(splits, key=itemgetter(0, 1)), key=itemgetter(0)):
+            ticker_splits = list(ticker_splits)
+            ratios = [Fraction(1)] * (len(ticker_splits) + 1)
+            for index in reversed(range(len(ticker_splits))):
+                _, _, origin, target = ticker_splits[index]
+                ratios[index] = ratios[index + 1] * Fraction(target) / Fraction(origin)
+
+            scale = 1
+            for ratio in ratios:
+                scale = lcm(scale, _non_decimal_part(ratio.denominator))
+
+            self._dates[ticker] = [split_date for _, split_date, _, _ in ticker_splits]
+            # The denominators left are made of factors 2 and 5, so the divisions are exact
+            self._factors[ticker] = [Decimal((ratio * scale).numerator) / Decimal((ratio * scale).denominator) for ratio in ratios]
+            self._scales[ticker] = Decimal(scale)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._dates
+
+    def ticker_factors(self, ticker: str) -> list[tuple[date, Decimal]]:
+        """
+        Returns (split date, factor) for each split of the ticker, oldest first:
+        quantities of operations before the split date and on or after the previous one are multiplied by the factor.
+        Quantities of operations after the last split are multiplied by the `scale` of the ticker.
+        """
+        return list(zip(self._dates.get(ticker, []), self._factors.get(ticker, [])))
+
+    def scale(self, ticker: str) -> Decimal:
+        """
+        Returns the number of units of the adjusted quantities of the ticker per share, 1 unless a factor is not a finite decimal.
+        """
+        return self._scales.get(ticker, Decimal(1))
+
+    def factor(self, ticker: str, day: date) -> Decimal:
+        """
+        Returns the product of the splits of the ticker after the given day, multiplied by the scale of the ticker.
+        """
+        dates = self._dates.get(ticker)
+        if not dates:
+            return Decimal(1)
+        return self._factors[ticker][bisect_right(dates, day)]
+
+    def adjust(self, ticker: str, operation: OperationDTO) -> OperationDTO:
+        """
+        Returns the operation with quantity and price in the units after the last split of the ticker (or fractions of them, see `scale`),
+        so the amount does not change. Operations not affected by any split are returned as they are.
+        """
+        factor = self.factor(ticker, operation.date.date())
+        if factor == 1:
+            return operation
+
+        return OperationDTO(
+            type=operation.type,
+            date=operation.date,
+            quantity=operation.quantity * factor,
+            currency=operation.currency,
+            price_avg=operation.price_avg / factor)
@@ -0,0 +1,151 @@
+"""
+Async versions of the `AccountViewSet` reports, for ASGI deployments (see `portfolio.asgi`).
+DRF views are synchronous, so these are Django views: while a report waits for the database the worker serves other requests.
+They run the same DRF authentication, permissions and throttles as the `AccountViewSet` (see `_check_request`).
+Responses have the same content as the `AccountViewSet` ones.
+"""
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
+
+from profits.models import Account
+from profits.services.profit_service import ProfitService
+from profits.utils import datetime_utils, csv_utils
+from profits.views.account_view import ProfitServiceFactory
+
+import logging
+logger = logging.getLogger(__name__)
+
+profit_service_factory = ProfitServiceFactory()
+
+
+class _ReportView(APIView):
+    """
+    DRF view with the default authentication, permission and throttle classes, as the `AccountViewSet`.
+    Only used to check the requests of the async views.
+    """
+
+def _error(message: str, status: int) -> JsonResponse:
+    return JsonResponse({"error": message}, status=status)
+
+@sync_to_async
+def _check_request(request) -> Optional[JsonResponse]:
+    """
+    Authenticates, checks permissions and throttles the request as a DRF view does, returning the DRF error response if any.
+    The throttles share their cache keys with the sync views, so both count towards the same rates.
+    """
+    view = _ReportView()
+    view.args, view.kwargs, view.headers = (), {}, {}
+    view.request = view.initialize_request(request)
+    try:
+        view.initial(view.request)
+    except APIException as exc:
+        response = view.handle_exception(exc)
+        headers = {name: value for name, value in response.headers.items() if name in ('Retry-After', 'WWW-Authenticate')}
+        return JsonResponse(response.data, status=response.status_code, headers=headers)
+    # Authentication from DRF (e.g. basic) is not set in the Django request
+    request.user = view.request.user
+    return None
+
+async def _get_account_and_service(
+        request,
+        pk) -> Tuple[Optional[Account], Optional[datetime], Optional[datetime], Union[ProfitService, JsonResponse]]:
+    """
+    Same as `AccountViewSet._get_account_and_service`.
+    """
+    error_response = await _check_request(request)
+    if error_response is not None:
+        return None, None, None, error_response
+
+    try:
+        account = await Account.objects.aget(pk=pk)
+    except Account.DoesNotExist:
+        logger.error(f"AccountId {pk} not found.")
+        return None, None, None, _error("Account not found.", 404)
+
+    date_start = request.GET.get('date_start')
+    date_end = request.GET.get('date_end')
+
+    try:
+        date_start = datetime_utils.parse_flexible_date(date_start)
+        date_end = datetime_utils.parse_flexible_date(date_end)
+    except ValueError:
+        logger.exception(f"Invalid date format `{date_start}` or `{date_end}`.")
+        return None, None, None, _error(f"Invalid date format `{date_start}` or `{date_end}`.", 400)
+
+    matching_method = request.GET.get('matching_method', 'fifo')
+    if matching_method not in profit_service_factory.MATCHING_METHODS:
+        return None, None, None, _error(
+            f"Invalid matching method `{matching_method}`, expected one of {', '.join(profit_service_factory.MATCHING_METHODS)}.", 400)
+
+    try:
+        profit_service = profit_service_factory.create(date_end, matching_method)
+    except Exception:
+        logger.exception("Error initializing profit service.")
+        return None, None, None, _error("Error initializing profit service.", 400)
+
+    return account, date_start, date_end, profit_service
+
+@require_GET
+async def total(request, pk):
+    """
+    Async version of `AccountViewSet.total`.
+    http://127.0.0.1:8000/profits/account/1/total-async/?date_start=2023-01-01&date_end=2023-12-31
+    """
+    account, date_start, date_end, profit_service_or_response = await _get_account_and_service(request, pk)
+    if isinstance(profit_service_or_response, JsonResponse):
+        return profit_service_or_response
+
+    # Avoid Pylance complaining about account 'None'
+    if account is None:
+        raise ValueError("`account` cannot be None")
+
+    try:
+        profit_total = await profit_service_or_response.aget_total(account, date_start, date_end)
+    except Exception:
+        logger.exception(f"Error calculating total amount for accountId {pk} between dates `{date_start}` or `{date_end}`.")
+        return _error(f"Error calculating total amount for accountId {pk} between dates `{date_start}` or `{date_end}`.", 400)
+
+    params = {
+        'id': account.id,   # type: ignore
+        'date_start': date_start,
+        'date_end': date_end,
+        'profit_total': profit_total
+    }
+    return JsonResponse(params, encoder=JSONEncoder)
+
+@require_GET
+async def total_details(request, pk):
+    """
+    Async version of `AccountViewSet.total_details`, streaming the CSV as the tickers are calculated.
+    http://127.0.0.1:8000/profits/account/1/total-details-async/?date_start=2023-01-01&date_end=2023-12-31
+    """
+    account, date_start, date_end, profit_service_or_response = await _get_account_and_service(request, pk)
+    if isinstance(profit_service_or_response, JsonResponse):
+        return profit_service_or_response
+
+    # Avoid Pylance complaining about account 'None'
+    if account is None:
+        raise ValueError("`account` cannot be None")
+
+    # Calculates the first ticker before streaming, so errors loading operations or in the first ticker still return an error response
+    tickers_profit = profit_service_or_response.aiter_total_details(account, date_start, date_end)
+    try:
+        ticker_profit_first = await anext(tickers_profit, None)
+    except Exception:
+        logger.exception(f"Error calculating total details for accountId {pk} between dates `{date_start}` or `{date_end}`.")
+        return _error(f"Error calculating total details for accountId {pk} between dates `{date_start}` or `{date_end}`.", 400)
+
+    async def tickers_profit_all():
+        if ticker_profit_first:
+            yield ticker_profit_first
+        async for ticker_profit in tickers_profit:
+            yield ticker_profit
+
+    return csv_utils.astream_total_details_csv(tickers_profit_all(), account.id, date_start, date_end)   # type: ignore
@@ -1,5 +1,10 @@
+from dataclasses import asdict
 from datetime import datetime
+from decimal import Decimal
+import itertools
 from typing import Optional, Tuple, Union
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status
@@ -7,28 +12,75 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from profits.interfaces.dtos.operation_dto import OperationDTO
 from profits.models import Account
 from profits.permissions import IsAdminOrReadOnly
-from profits.serializers import AccountSerializer
+from profits.serializers import AccountSerializer, SimulationSerializer
 from profits.services.currency_service import CurrencyService
+from profits.services.exceptions import ServiceException
 from profits.repositories.currency_repository import CurrencyRepository
+from profits.repositories.lot_checkpoint_repository import LotCheckpointRepository
+from profits.repositories.open_lot_cache_repository import OpenLotCacheRepository
 from profits.repositories.operation_repository import OperationRepository
+from profits.repositories.realized_gain_repository import RealizedGainRepository
+from profits.repositories.split_repository import SplitRepository
+from profits.services.lot_checkpoint_service import LotCheckpointService
 from profits.services.profit_calculator import ProfitCalculator
+from profits.services.fixed_point_profit_calculator import FixedPointProfitCalculator
+from profits.services.hmrc_profit_calculator import HmrcProfitCalculator
+from profits.services.section104_profit_calculator import Section104ProfitCalculator
 from profits.services.profit_exchanger import ProfitExchanger
 from profits.utils import datetime_utils, csv_utils
+from profits.services.position_history_service import PositionHistoryService
 from profits.services.profit_service import ProfitService
+from profits.services.realized_gain_profit_service import RealizedGainProfitService
 
 import logging
 logger = logging.getLogger(__name__)
 
 class ProfitServiceFactory:
-    def create(self, date_end):
+    # Values of the `matching_method` parameter: FIFO, HMRC same day and bed and breakfast rules before the Section 104 pool, 
+    # or only the Section 104 pool (average cost)
+    MATCHING_METHODS = ('fifo', 'hmrc', 'section104')
+
+    def create(self, date_end, matching_method='fifo'):
         # Using 'None' as should take currencies before the data as posibility operation 
         # was in a bank holiday and need to take a previous conversion
-        currency_service = CurrencyService(CurrencyRepository(), None, date_end)
-        operation_repository= OperationRepository()
-        profit_calculator= ProfitCalculator(ProfitExchanger(currency_service))
-        return ProfitService(operation_repository, currency_service, profit_calculator)
+        operation_repository= OperationRepository(SplitRepository() if settings.PROFITS_SPLIT_ADJUSTMENT else None)
+        if matching_method == 'hmrc':
+            # Operations after `date_end` are matched too, so their rates are needed
+            currency_service = CurrencyService(CurrencyRepository(), None, None)
+            return ProfitService(
+                operation_repository, currency_service, HmrcProfitCalculator(ProfitExchanger(currency_service)), settings.PROFITS_PARALLEL_WORKERS)
+        if matching_method == 'section104':
+            # Lots checkpointed, persisted or loaded open are FIFO ones, so the pool is always replayed from the first operation
+            currency_service = CurrencyService(CurrencyRepository(), None, date_end)
+            return ProfitService(
+                operation_repository, currency_service, Section104ProfitCalculator(ProfitExchanger(currency_service)), settings.PROFITS_PARALLEL_WORKERS)
+
+        currency_service = CurrencyService(CurrencyRepository(), None, None if settings.PROFITS_REALIZED_GAINS else date_end)
+        if settings.PROFITS_FIXED_POINT_ARITHMETIC:
+            profit_calculator= FixedPointProfitCalculator(ProfitExchanger(currency_service))
+        else:
+            profit_calculator= ProfitCalculator(
+                ProfitExchanger(currency_service), settings.PROFITS_VECTORIZED_THRESHOLD, 
+                settings.PROFITS_COALESCE_LOTS, settings.PROFITS_COALESCE_LOTS_PRESERVE_DETAILS)
+        open_lot_cache_repository= OpenLotCacheRepository(settings.PROFITS_OPEN_LOTS_CACHE_TIMEOUT)
+        if settings.PROFITS_REALIZED_GAINS:
+            return RealizedGainProfitService(
+                operation_repository, currency_service, profit_calculator, RealizedGainRepository(), open_lot_cache_repository)
+
+        lot_checkpoint_service= None
+        if settings.PROFITS_LOT_CHECKPOINTS:
+            lot_checkpoint_service= LotCheckpointService(LotCheckpointRepository(), *settings.PROFITS_LOT_CHECKPOINT_BOUNDARY)
+        return ProfitService(
+            operation_repository, currency_service, profit_calculator, settings.PROFITS_PARALLEL_WORKERS, lot_checkpoint_service, 
+            settings.PROFITS_LOAD_OPEN_LOTS_ONLY, open_lot_cache_repository, 
+            settings.PROFITS_PIPELINE_CHUNK_SIZE, settings.PROFITS_PIPELINE_PREFETCH_CHUNKS)
+
+    def create_position_history(self, date_end):
+        operation_repository= OperationRepository(SplitRepository() if settings.PROFITS_SPLIT_ADJUSTMENT else None)
+        return PositionHistoryService(operation_repository, CurrencyService(CurrencyRepository(), None, date_end))
 
 class AccountViewSet(ModelViewSet):
     queryset = Account.objects.all()
@@ -41,10 +93,15 @@ class AccountViewSet(ModelViewSet):
         super().__init__(*args, **kwargs)
         self.profit_service_factory = ProfitServiceFactory()
 
-    def _get_account_and_service(self, request, pk) -> Tuple[Optional[Account], Optional[datetime], Optional[datetime], Union[ProfitService, Response]]:
+    def _get_account_and_service(
+            self, 
+            request, 
+            pk, 
+            matching_method_allowed: bool = True) -> Tuple[Optional[Account], Optional[datetime], Optional[datetime], Union[ProfitService, Response]]:
     
         """
         Common function to retrieve account, parse dates, and initialize profit service.
+        The profit service uses the `matching_method` query parameter if allowed, FIFO otherwise.
         """
         # Retrieve account object
         try:
@@ -64,8 +121,14 @@ class AccountViewSet(ModelViewSet):
             logger.exception(f"Invalid date format `{date_start}` or `{date_end}`.")
             return None, None, None, Response({"error": f"Invalid date format `{date_start}` or `{date_end}`."}, status=400)
 
+        matching_method = request.query_params.get('matching_method', 'fifo') if matching_method_allowed else 'fifo'
+        if matching_method not in self.profit_service_factory.MATCHING_METHODS:
+            return None, None, None, Response(
+                {"error": f"Invalid matching method `{matching_method}`, expected one of {', '.join(self.profit_service_factory.MATCHING_METHODS)}."}, 
+                status=400)
+
         try:
-            profit_service = self.profit_service_factory.create(date_end)
+            profit_service = self.profit_service_factory.create(date_end, matching_method)
         except Exception as e:
             logger.exception("Error initializing profit service.")
             return None, None, None, Response({"error": "Error initializing profit service."}, status=400)
@@ -87,7 +150,7 @@ class AccountViewSet(ModelViewSet):
     def total(self, request, pk=None):
         """
         Get profits total number.
-        http://127.0.0.1:8000/profits/account/1/total?date_start=2023-01-01&date_end=2023-12-31
+        http://127.0.0.1:8000/profits/account/1/total?date_start=2023-01-01&date_end=2023-12-31&matching_method=hmrc
 
         """
         account, date_start, date_end, profit_service_or_response = self._get_account_and_service(request, pk)
@@ -127,10 +190,232 @@ class AccountViewSet(ModelViewSet):
         if account is None: 
             raise ValueError("`account` cannot be None")
                 
+        # Calculates the first ticker before streaming, so errors loading operations or in the first ticker still return an error response
+        tickers_profit = profit_service_or_response.iter_total_details(account, date_start, date_end)
         try:
-            tickers_profit = profit_service_or_response.get_total_details(account, date_start, date_end)
+            ticker_profit_first = next(tickers_profit, None)
         except Exception:
             logger.exception("Error calculating total amount for accountId {pk} between dates `{date_start}` or `{date_end}`.")
             return Response({"error": f"Error calculating total details for account {account} between dates `{date_start}` or `{date_end}`."}, status=400)
 
-        return csv_utils.generate_total_details_csv(tickers_profit, account.id, date_start, date_end)
\ No newline at end of file
+        tickers_profit = itertools.chain([ticker_profit_first] if ticker_profit_first else [], tickers_profit)
+        return csv_utils.stream_total_details_csv(tickers_profit, account.id, date_start, date_end)
+
+    @action(detail=True, methods=["get"], url_path='period-totals')
+    def period_totals(self, request, pk=None):
+        """
+        Get profits total of each year (UK tax years by default, or years starting on `year_start` month-day) between the dates.
+        Without dates covers from the year of the first sell to the year of the last one.
+        http://127.0.0.1:8000/profits/account/1/period-totals?date_start=2020-04-06&date_end=2024-04-05&year_start=04-06
+        """
+        account, date_start, date_end, profit_service_or_response = self._get_account_and_service(request, pk)
+        if isinstance(profit_service_or_response, Response):
+            return profit_service_or_response
+
+        # Avoid Pylance complaining about account 'None'
+        if account is None: 
+            raise ValueError("`account` cannot be None")
+
+        year_start_param = request.query_params.get('year_start')
+        year_start = settings.PROFITS_REPORT_YEAR_START
+        try:
+            datetime_utils.check_year_start(*year_start)
+        except ValueError as e:
+            raise ImproperlyConfigured(f"PROFITS_REPORT_YEAR_START: {e}") from e
+        if year_start_param:
+            try:
+                # Leap year, so 02-29 is parsed and rejected as not in every year
+                year_start_date = datetime.strptime(f'2000-{year_start_param}', '%Y-%m-%d')
+            except ValueError:
+                logger.exception(f"Invalid year start `{year_start_param}`.")
+                return Response({"error": f"Invalid year start `{year_start_param}`, expected format MM-DD."}, status=400)
+            year_start = (year_start_date.month, year_start_date.day)
+            try:
+                datetime_utils.check_year_start(*year_start)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+
+        try:
+            period_totals = profit_service_or_response.get_period_totals(account, date_start, date_end, year_start)
+        except Exception:
+            logger.exception(f"Error calculating period totals for accountId {pk} between dates `{date_start}` or `{date_end}`.")
+            return Response({"error": f"Error calculating period totals for accountId {pk} between dates `{date_start}` or `{date_end}`."}, status=400)
+
+        params = {
+            'id': account.id,
+            'date_start': date_start,
+            'date_end': date_end,
+            'period_totals': period_totals
+        }
+        return Response(params)
+
+    @action(detail=True, methods=["get"], url_path='positions')
+    def positions(self, request, pk=None):
+        """
+        Get positions open at `date_end` (quantity, average cost and cost basis in GBP per ticker), 
+        with the profits total between the dates calculated in the same replay.
+        http://127.0.0.1:8000/profits/account/1/positions?date_start=2023-01-01&date_end=2023-12-31
+        Lots open are the ones left by FIFO, so `matching_method` is not used.
+        """
+        account, date_start, date_end, profit_service_or_response = self._get_account_and_service(request, pk, matching_method_allowed=False)
+        if isinstance(profit_service_or_response, Response):
+            return profit_service_or_response
+
+        # Avoid Pylance complaining about account 'None'
+        if account is None: 
+            raise ValueError("`account` cannot be None")
+
+        try:
+            total_positions = profit_service_or_response.get_total_positions(account, date_start, date_end)
+        except Exception:
+            logger.exception(f"Error calculating positions for accountId {pk} between dates `{date_start}` or `{date_end}`.")
+            return Response({"error": f"Error calculating positions for accountId {pk} between dates `{date_start}` or `{date_end}`."}, status=400)
+
+        params = {
+            'id': account.id,
+            'date_start': date_start,
+            'date_end': date_end,
+            'profit_total': total_positions['profit_total'],
+            'positions': total_positions['positions']
+        }
+        return Response(params)
+
+    @action(detail=True, methods=["get"], url_path='position-history')
+    def position_history(self, request, pk=None):
+        """
+        Get quantity held of each ticker at the end of each day (`frequency=weekly` for every 7 days) between the dates, 
+        and with `valued=true` its value in GBP at the price of the last operation.
+        http://127.0.0.1:8000/profits/account/1/position-history?date_start=2023-01-01&date_end=2023-12-31&frequency=weekly&valued=true
+        """
+        account, date_start, date_end, profit_service_or_response = self._get_account_and_service(request, pk, matching_method_allowed=False)
+        if isinstance(profit_service_or_response, Response):
+            return profit_service_or_response
+
+        # Avoid Pylance complaining about account 'None'
+        if account is None: 
+            raise ValueError("`account` cannot be None")
+
+        frequency = request.query_params.get('frequency', 'daily')
+        if frequency not in PositionHistoryService.FREQUENCIES:
+            return Response(
+                {"error": f"Invalid frequency `{frequency}`, expected one of {', '.join(PositionHistoryService.FREQUENCIES)}."}, status=400)
+        valued = request.query_params.get('valued', 'false').lower() == 'true'
+
+        try:
+            position_history = self.profit_service_factory.create_position_history(date_end) \
+                .get_position_history(account, date_start, date_end, frequency, valued)
+        except Exception:
+            logger.exception(f"Error calculating position history for accountId {pk} between dates `{date_start}` or `{date_end}`.")
+            return Response(
+                {"error": f"Error calculating position history for accountId {pk} between dates `{date_start}` or `{date_end}`."}, status=400)
+
+        params = {
+            'id': account.id,
+            'date_start': date_start,
+            'date_end': date_end,
+            'dates': position_history['dates'],
+            'positions': position_history['positions']
+        }
+        return Response(params)
+
+    @action(detail=True, methods=["post"], url_path='simulate')
+    def simulate(self, request, pk=None):
+        """
+        Get profits of hypothetical operations of a ticker done after its last operation, without saving them.
+        Only the hypothetical operations are matched, with the lots left open by the account operations (cached between requests).
+        curl -X POST 127.0.0.1:8000/profits/account/1/simulate/ \
+             -H "Content-Type: application/json" \
+             -d '{"ticker": "MSFT", "operations": [{"type": "SELL", "date": "2024-05-01T10:00:00Z", "quantity": 10, "price": 400, "currency": "USD"}]}'
+        """
+        account, _, _, profit_service_or_response = self._get_account_and_service(request, pk, matching_method_allowed=False)
+        if isinstance(profit_service_or_response, Response):
+            return profit_service_or_response
+
+        # Avoid Pylance complaining about account 'None'
+        if account is None: 
+            raise ValueError("`account` cannot be None")
+
+        serializer = SimulationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=400)
+
+        ticker = serializer.validated_data['ticker']
+        operations = [
+            OperationDTO(
+                type=operation['type'], 
+                date=operation['date'], 
+                quantity=operation['quantity'], 
+                currency=operation['currency'], 
+                price_avg=operation['price'])
+            for operation in serializer.validated_data['operations']
+        ]
+        try:
+            profits = profit_service_or_response.simulate_ticker_operations(account, ticker, operations)
+        except ServiceException as e:
+            # Operations not after the saved ones, selling more than open or without rates, their message tells which
+            logger.exception(f"Invalid operations to simulate of {ticker} for accountId {pk}.")
+            return Response({"error": f"Invalid operations to simulate of {ticker} for accountId {pk}: {e}"}, status=400)
+        except Exception:
+            logger.exception(f"Error simulating operations of {ticker} for accountId {pk}.")
+            return Response({"error": f"Error simulating operations of {ticker} for accountId {pk}."}, status=400)
+
+        params = {
+            'id': account.id,
+            'ticker': ticker,
+            'profit_total': sum((profit.profit_exchange for profit in profits), Decimal(0)),
+            'profit_details': [asdict(profit) for profit in profits]
+        }
+        return Response(params)
+
+    @action(detail=False, methods=["post"], url_path='totals')
+    def totals(self, request):
+        """
+        Get profits total of several accounts in the same period.
+        Accounts are calculated together sharing the loading of operations and exchange rates.
+        curl -X POST 127.0.0.1:8000/profits/account/totals/ \
+             -H "Content-Type: application/json" \
+             -d '{"account_ids": [1, 2], "date_start": "2023-01-01", "date_end": "2023-12-31", "matching_method": "section104"}'
+        """
+        account_ids = request.data.get('account_ids')
+        if not isinstance(account_ids, list) or not all(isinstance(account_id, int) for account_id in account_ids):
+            return Response({"error": "`account_ids` must be a list of account ids."}, status=400)
+
+        date_start = request.data.get('date_start')
+        date_end = request.data.get('date_end')
+        try:
+            date_start = datetime_utils.parse_flexible_date(date_start)
+            date_end = datetime_utils.parse_flexible_date(date_end)
+        except ValueError:
+            logger.exception(f"Invalid date format `{date_start}` or `{date_end}`.")
+            return Response({"error": f"Invalid date format `{date_start}` or `{date_end}`."}, status=400)
+
+        matching_method = request.data.get('matching_method', 'fifo')
+        if matching_method not in self.profit_service_factory.MATCHING_METHODS:
+            return Response(
+                {"error": f"Invalid matching method `{matching_method}`, expected one of {', '.join(self.profit_service_factory.MATCHING_METHODS)}."}, 
+                status=400)
+
+        try:
+            profit_service = self.profit_service_factory.create(date_end, matching_method)
+        except Exception:
+            logger.exception("Error initializing profit service.")
+            return Response({"error": "Error initializing profit service."}, status=400)
+
+        accounts = list(Account.objects.filter(id__in=account_ids))
+        try:
+            accounts_total = {
+                account_total['id']: account_total for account_total in profit_service.get_accounts_totals(accounts, date_start, date_end)
+            }
+        except Exception:
+            logger.exception(f"Error calculating totals for accounts between dates `{date_start}` or `{date_end}`.")
+            return Response({"error": f"Error calculating totals for accounts between dates `{date_start}` or `{date_end}`."}, status=400)
+
+        params = {
+            'date_start': date_start,
+            'date_end': date_end,
+            'totals': [
+                accounts_total.get(account_id, {'id': account_id, 'profit_total': None, 'error': 'Account not found.'})
+                for account_id in account_ids
+            ]
+        }
+        return Response(params)